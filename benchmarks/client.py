@@ -0,0 +1,311 @@
+"""
+Benchmark the registry client's throughput against a live registry.
+
+Run with ``python benchmarks/client.py REGISTRY_URL`` once the package is installed. Each
+scenario is repeated for the given number of iterations, and reports latency percentiles,
+requests per second, bytes transferred and the number of auth token requests. Results can also
+be written as JSON with ``--json``, so that runs with different settings can be compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests_toolbelt.sessions import BaseUrlSession
+
+import dreg_client
+from dreg_client import Client, DockerTokenAuthService, Registry
+from dreg_client._concurrency import bounded_map
+from dreg_client._types import RequestsAuth
+from dreg_client.manifest import LegacyManifest, Manifest
+from dreg_client.store import ContentStore
+
+
+RESULTS_VERSION = 1
+
+SCENARIOS = ("catalog", "tags", "head", "get", "config", "image")
+
+
+class Recorder:
+    """
+    Records the latency and size of every response, grouped by the scenario running at the time.
+    """
+
+    def __init__(self) -> None:
+        self.scenario = ""
+        self.latencies: Dict[str, List[float]] = {}
+        self.bytes: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.token_requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def start(self, scenario: str) -> None:
+        self.scenario = scenario
+        self.latencies.setdefault(scenario, [])
+        self.bytes.setdefault(scenario, 0)
+        self.errors.setdefault(scenario, 0)
+        self.token_requests.setdefault(scenario, 0)
+
+    def on_response(self, response: Response, *args: Any, **kwargs: Any) -> None:
+        # None of the scenarios stream responses, so reading the body here (which the client
+        # would do next anyway) gives the bytes transferred, even for chunked responses.
+        size = len(response.content)
+        with self._lock:
+            self.latencies[self.scenario].append(response.elapsed.total_seconds())
+            self.bytes[self.scenario] += size
+            if response.status_code >= 400 and response.status_code != 404:
+                self.errors[self.scenario] += 1
+
+    def on_token_response(self, response: Response, *args: Any, **kwargs: Any) -> None:
+        with self._lock:
+            self.token_requests[self.scenario] += 1
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    if len(values) == 1:
+        cuts = [values[0]] * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "mean": statistics.fmean(values) * 1000,
+        "max": max(values) * 1000,
+    }
+
+
+def make_session(base_url: str, pool_size: int) -> BaseUrlSession:
+    session = BaseUrlSession(base_url)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def build_registry(args: argparse.Namespace, recorder: Recorder) -> Registry:
+    basic_auth: RequestsAuth = None
+    if args.username and args.password:
+        basic_auth = HTTPBasicAuth(args.username, args.password)
+
+    auth_service: Optional[DockerTokenAuthService] = None
+    if args.auth_token_url and args.auth_service:
+        token_session = make_session(args.auth_token_url, args.pool_size)
+        token_session.params["service"] = args.auth_service
+        token_session.auth = basic_auth
+        token_session.hooks["response"].append(recorder.on_token_response)
+        auth_service = DockerTokenAuthService(token_session)
+        basic_auth = None
+
+    session = make_session(args.registry, args.pool_size)
+    session.auth = basic_auth
+    session.verify = args.verify_ssl
+    session.hooks["response"].append(recorder.on_response)
+    # The default store only holds objects while something else refers to them, which would
+    # leave nothing cached between iterations. A strong store keeps everything fetched.
+    return Registry(Client(session, auth_service=auth_service), store=ContentStore(weak=False))
+
+
+class Workload:
+    """
+    Runs each scenario, feeding what one finds (repositories, tags, digests) into the next.
+    """
+
+    def __init__(self, registry: Registry, args: argparse.Namespace) -> None:
+        self.registry = registry
+        self.client = registry.client
+        self.args = args
+        self.repositories: List[str] = list(args.repository or ())
+        self.tags: List[Tuple[str, str]] = []
+        self.digests: List[Tuple[str, str]] = []
+        self.configs: List[Tuple[str, str]] = []
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Tuple[Any, Any]]:
+        return list(bounded_map(fn, items, max_concurrency=self.args.jobs))
+
+    def list_catalog(self) -> int:
+        repositories = []
+        for name in self.client.iter_catalog(page_size=self.args.page_size):
+            repositories.append(name)
+            if len(repositories) >= self.args.repositories:
+                break
+        if not self.args.repository:
+            self.repositories = repositories
+        return len(repositories)
+
+    def list_tags(self) -> int:
+        self.tags = []
+        for name, response in self.map(self.client.get_repository_tags, self.repositories):
+            tags = response["tags"] or ()
+            self.tags.extend((name, tag) for tag in tags[: self.args.tags])
+        return len(self.tags)
+
+    def check_manifests(self) -> int:
+        results = self.map(lambda item: self.client.check_manifest(*item), self.tags)
+        self.digests = sorted({(name, digest) for (name, _), digest in results if digest})
+        return len(results)
+
+    def get_manifests(self) -> int:
+        results = self.map(lambda item: self.client.get_manifest(*item), self.digests)
+        configs = set()
+        for (name, _), manifest in results:
+            if isinstance(manifest, Manifest):
+                configs.add((name, manifest.config.digest))
+        self.configs = sorted(configs)
+        return len(results)
+
+    def get_configs(self) -> int:
+        lazy = self.args.lazy_config
+        return len(
+            self.map(lambda item: self.client.get_image_config_blob(*item, lazy=lazy), self.configs)
+        )
+
+    def resolve_images(self) -> int:
+        def resolve(item: Tuple[str, str]) -> int:
+            name, tag = item
+            repository = self.registry.repository(name)
+            image = repository.get_image(tag, raise_on_legacy=False)
+            if isinstance(image, LegacyManifest):
+                return 0
+            return len(tuple(image.get_platform_images()))
+
+        if not self.args.cache:
+            # Start from an empty store, so every manifest and config is fetched again.
+            self.registry = Registry(self.client, store=ContentStore(weak=False))
+        return len(self.map(resolve, self.tags))
+
+    def run(self, scenario: str) -> int:
+        scenarios: Dict[str, Callable[[], int]] = {
+            "catalog": self.list_catalog,
+            "tags": self.list_tags,
+            "head": self.check_manifests,
+            "get": self.get_manifests,
+            "config": self.get_configs,
+            "image": self.resolve_images,
+        }
+        return scenarios[scenario]()
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    recorder = Recorder()
+    registry = build_registry(args, recorder)
+    workload = Workload(registry, args)
+
+    results: Dict[str, Any] = {}
+    for scenario in args.scenario or SCENARIOS:
+        recorder.start(scenario)
+        operations = 0
+        elapsed = 0.0
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            operations += workload.run(scenario)
+            elapsed += time.perf_counter() - start
+
+        latencies = recorder.latencies[scenario]
+        results[scenario] = {
+            "operations": operations,
+            "requests": len(latencies),
+            "errors": recorder.errors[scenario],
+            "seconds": elapsed,
+            "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+            "bytes": recorder.bytes[scenario],
+            "token_requests": recorder.token_requests[scenario],
+            "latency_ms": percentiles(latencies),
+        }
+
+    return {
+        "version": RESULTS_VERSION,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {
+            "registry": args.registry,
+            "jobs": args.jobs,
+            "pool_size": args.pool_size,
+            "iterations": args.iterations,
+            "page_size": args.page_size,
+            "repositories": args.repositories,
+            "tags": args.tags,
+            "cache": args.cache,
+            "lazy_config": args.lazy_config,
+            # There's no choice of JSON library, but the one in use is recorded so that results
+            # stay comparable if that changes.
+            "json_backend": json.__name__,
+            "dreg_client": dreg_client.__version__,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(
+        f"{'scenario':<10}{'ops':>8}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'bytes':>14}{'tokens':>8}{'errors':>8}"
+    )
+    for scenario, result in results["scenarios"].items():
+        latency = result["latency_ms"]
+        print(
+            f"{scenario:<10}{result['operations']:>8}{result['requests']:>8}"
+            f"{result['requests_per_second']:>10.1f}{latency.get('p50', 0):>10.1f}"
+            f"{latency.get('p95', 0):>10.1f}{latency.get('p99', 0):>10.1f}"
+            f"{result['bytes']:>14}{result['token_requests']:>8}{result['errors']:>8}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("registry", metavar="REGISTRY_URL", help="registry URL (including scheme)")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="scenario to run, which can be repeated (default: all of them, in order)",
+    )
+    parser.add_argument(
+        "--repository",
+        action="append",
+        help="repository to benchmark, rather than the first repositories in the catalog",
+    )
+    parser.add_argument("--repositories", type=int, default=20)
+    parser.add_argument("--tags", type=int, default=20, help="maximum tags per repository")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument(
+        "--no-cache",
+        dest="cache",
+        action="store_false",
+        help="resolve images with an empty content store on every iteration",
+    )
+    parser.add_argument("--lazy-config", action="store_true")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to PATH as JSON")
+    parser.add_argument("--verify-ssl", dest="verify_ssl", action="store_true")
+    parser.add_argument("--no-verify-ssl", dest="verify_ssl", action="store_false")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--auth-token-url")
+    parser.add_argument("--auth-service")
+    parser.set_defaults(verify_ssl=True)
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as results_file:
+            json.dump(results, results_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark the retention policy engine against a synthetic repository.
+
+Run with ``python benchmarks/retention.py`` once the package is installed. The registry is
+simulated in memory, so this measures the overhead of tag resolution, rule evaluation and
+planning, rather than network time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from dreg_client.manifest import (
+    ImageConfig,
+    ImageConfigRef,
+    ImageLayerRef,
+    Manifest,
+    Platform,
+)
+from dreg_client.repository import Repository
+from dreg_client.retention import (
+    DeleteOlderThan,
+    KeepLatest,
+    KeepNewerThan,
+    RetentionEngine,
+    RetentionPolicy,
+)
+from dreg_client.schemas import schema_2
+
+
+NOW = datetime(2022, 6, 1, tzinfo=timezone.utc)
+
+
+class FakeClient:
+    def __init__(self, tag_count: int, tags_per_digest: int) -> None:
+        platform = Platform.from_name("linux/amd64")
+        self.tags: Dict[str, str] = {}
+        self.manifests: Dict[str, Manifest] = {}
+        self.configs: Dict[str, ImageConfig] = {}
+
+        for index in range(tag_count):
+            build = index // tags_per_digest
+            digest = f"sha256:{build:064x}"
+            prefix = "release" if build % 10 == 0 else "ci"
+            self.tags[f"{prefix}-{index}"] = digest
+            if digest in self.manifests:
+                continue
+
+            config_digest = f"sha256:c{build:063x}"
+            created_at = NOW - timedelta(minutes=tag_count - index)
+            self.configs[config_digest] = ImageConfig(
+                digest=config_digest,
+                content_length=1024,
+                created_at=created_at.isoformat().replace("+00:00", "Z"),
+                config={},
+                history=(),
+                rootfs={},
+                platform=platform,
+            )
+            self.manifests[digest] = Manifest(
+                digest,
+                schema_2,
+                512,
+                ImageConfigRef(config_digest, "", 1024),
+                (
+                    ImageLayerRef("sha256:base", "", 50_000_000),
+                    ImageLayerRef(f"sha256:l{build:063x}", "", 1_000_000),
+                ),
+            )
+
+    def get_repository_tags(self, name: str) -> Dict[str, Any]:
+        return {"name": name, "tags": list(self.tags)}
+
+    def check_manifest(self, name: str, reference: str) -> Optional[str]:
+        return self.tags.get(reference)
+
+    def get_manifest(self, name: str, reference: str, **kwargs: Any) -> Manifest:
+        return self.manifests[reference]
+
+    def get_image_config_blob(self, name: str, digest: str, **kwargs: Any) -> ImageConfig:
+        return self.configs[digest]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tags", type=int, default=100_000)
+    parser.add_argument("--tags-per-digest", type=int, default=2)
+    parser.add_argument("--jobs", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    policy = RetentionPolicy(
+        (
+            KeepLatest("^release-", 20),
+            KeepNewerThan("^ci-", timedelta(days=1)),
+            DeleteOlderThan("^ci-", timedelta(days=14)),
+        )
+    )
+    client = FakeClient(args.tags, args.tags_per_digest)
+    repository = Repository(client, "benchmark")  # type: ignore[arg-type]
+    engine = RetentionEngine(policy, max_concurrency=args.jobs)
+
+    start = time.perf_counter()
+    resolution = repository.resolve_tags(max_concurrency=args.jobs, fetch_manifests=True)
+    resolved = time.perf_counter()
+    created = engine.creation_times(repository, resolution)
+    fetched = time.perf_counter()
+    decision = policy.evaluate(created, now=NOW)
+    evaluated = time.perf_counter()
+    plan = engine.plan(repository, now=NOW)[1]
+    planned = time.perf_counter()
+
+    print(f"tags:            {len(resolution.digests)}")
+    print(f"digests:         {len(resolution.tags_by_digest)}")
+    print(f"tags to delete:  {len(decision.delete)}")
+    print(f"blobs to delete: {len(plan.blobs)}")
+    print(f"resolve tags:    {resolved - start:.3f}s")
+    print(f"creation times:  {fetched - resolved:.3f}s")
+    print(f"evaluate policy: {evaluated - fetched:.3f}s")
+    print(f"full plan:       {planned - evaluated:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
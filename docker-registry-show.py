@@ -22,14 +22,19 @@ import json
 import logging
 import sys
 from argparse import ArgumentParser
-from typing import Optional
+from typing import IO, TYPE_CHECKING, Any, Callable, Iterable, Iterator, Mapping, Optional
 
-import requests
-from requests.auth import HTTPBasicAuth
-from requests_toolbelt.sessions import BaseUrlSession
 
-from dreg_client import AuthService, DockerTokenAuthService, Registry
-from dreg_client._types import RequestsAuth
+# Most imports are deferred until they're needed, so that parsing arguments (and printing help)
+# doesn't have to wait for requests and the rest of dreg_client to load.
+if TYPE_CHECKING:
+    from dreg_client import AuthService, Registry
+    from dreg_client._types import RequestsAuth
+
+
+OUTPUT_TEXT = "text"
+OUTPUT_JSON = "json"
+OUTPUT_NDJSON = "ndjson"
 
 
 def make_parser() -> ArgumentParser:
@@ -58,6 +63,39 @@ def make_parser() -> ArgumentParser:
         help="Authorisation service",
     )
 
+    parser.add_argument(
+        "-o",
+        "--output",
+        choices=(OUTPUT_TEXT, OUTPUT_JSON, OUTPUT_NDJSON),
+        default=OUTPUT_TEXT,
+        help="output format (default: text)",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="list the tags in every repository, along with the digest of each tag",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        type=int,
+        default=8,
+        help="number of requests to make at once when listing recursively (default: 8)",
+    )
+
+    parser.add_argument(
+        "--resolve",
+        metavar="FILE",
+        help="resolve each image reference listed in FILE (or - for stdin) to a digest",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="with --resolve, write each result as soon as it's available, not in input order",
+    )
+
     parser.add_argument("registry", metavar="REGISTRY_URL", help="registry URL (including scheme)")
     parser.add_argument(
         "repository", metavar="REPOSITORY", nargs="?", help="repository (including namespace)"
@@ -71,6 +109,10 @@ def make_parser() -> ArgumentParser:
 
 def run(parser: ArgumentParser) -> None:
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.resolve and args.repository:
+        parser.error("--resolve can't be combined with a repository")
 
     basic_config_args = {}
     if args.verbose:
@@ -80,6 +122,11 @@ def run(parser: ArgumentParser) -> None:
 
     logging.basicConfig(**basic_config_args)
 
+    from requests.auth import HTTPBasicAuth
+    from requests_toolbelt.sessions import BaseUrlSession
+
+    from dreg_client import DockerTokenAuthService, Registry
+
     basic_auth: RequestsAuth = None
     if args.username and args.password:
         basic_auth = HTTPBasicAuth(args.username, args.password)
@@ -97,56 +144,210 @@ def run(parser: ArgumentParser) -> None:
 
     registry = Registry.build_with_client(session, auth_service=auth_service)
 
-    if args.repository:
+    if args.resolve:
+        if args.resolve == "-":
+            ok = resolve(
+                registry, sys.stdin, output=args.output, jobs=args.jobs, ordered=not args.unordered
+            )
+        else:
+            with open(args.resolve, "r", encoding="utf-8") as references_file:
+                ok = resolve(
+                    registry,
+                    references_file,
+                    output=args.output,
+                    jobs=args.jobs,
+                    ordered=not args.unordered,
+                )
+        if not ok:
+            sys.exit(1)
+    elif args.repository:
         if args.ref:
-            show_manifest(registry, args.repository, args.ref)
+            show_manifest(registry, args.repository, args.ref, output=args.output)
         else:
-            show_tags(registry, args.repository)
+            show_tags(
+                registry,
+                args.repository,
+                output=args.output,
+                recursive=args.recursive,
+                jobs=args.jobs,
+            )
     else:
-        show_repositories(registry)
+        show_repositories(registry, output=args.output, recursive=args.recursive, jobs=args.jobs)
+
+
+def write_records(
+    records: Iterable[Mapping[str, Any]],
+    output: str,
+    *,
+    header: str,
+    format_text: Callable[[Mapping[str, Any]], str],
+) -> None:
+    # Each record is written and flushed as soon as it's available, so that output can be
+    # consumed by other tools while the registry is still being read. JSON output is written as
+    # an array, one element at a time.
+    first = True
+    for record in records:
+        if output == OUTPUT_NDJSON:
+            sys.stdout.write(json.dumps(record) + "\n")
+        elif output == OUTPUT_JSON:
+            sys.stdout.write(("[\n  " if first else ",\n  ") + json.dumps(record))
+        else:
+            if first:
+                sys.stdout.write(header + "\n")
+            sys.stdout.write(f"  - {format_text(record)}\n")
+        sys.stdout.flush()
+        first = False
+
+    if output == OUTPUT_JSON:
+        sys.stdout.write("[]\n" if first else "\n]\n")
+    elif output == OUTPUT_TEXT and first:
+        sys.stdout.write(header + "\n")
+
+
+def crawl_tags(
+    registry: Registry, repositories: Optional[Iterable[str]], jobs: int
+) -> Iterator[Mapping[str, Any]]:
+    from dreg_client.crawl import RegistryCrawler, RepositoryRecord, TagRecord
+
+    crawler = RegistryCrawler(
+        registry, tag_concurrency=jobs, head_concurrency=jobs, fetch_images=False
+    )
+    for record in crawler.crawl(repositories):
+        if isinstance(record, TagRecord):
+            yield {"repository": record.repository, "tag": record.tag, "digest": record.digest}
+        elif isinstance(record, RepositoryRecord) and not record.tags:
+            yield {"repository": record.repository, "tag": None, "digest": None}
 
 
-def show_repositories(registry: Registry) -> None:
+def format_tag(record: Mapping[str, Any]) -> str:
+    if record["tag"] is None:
+        return record["repository"]
+    return f"{record['repository']}:{record['tag']} {record['digest']}"
+
+
+def show_repositories(registry: Registry, *, output: str, recursive: bool, jobs: int) -> None:
+    import requests
+
+    catalog = registry.client.iter_catalog()
     try:
-        repositories = registry.repositories()
+        # Fetch the first page up front, to find out whether the catalog is available at all.
+        first_page = [next(catalog)]
+    except StopIteration:
+        first_page = []
     except requests.HTTPError as e:
         if e.response.status_code != requests.codes.not_found:
             raise
         print("Catalog/Search not supported", file=sys.stderr)
         return
 
-    print("Repositories:")
-    for repository in repositories.keys():
-        print(f"  - {repository}")
+    def names() -> Iterator[str]:
+        yield from first_page
+        yield from catalog
 
+    if recursive:
+        write_records(
+            crawl_tags(registry, names(), jobs),
+            output,
+            header="Tags:",
+            format_text=format_tag,
+        )
+    else:
+        write_records(
+            ({"repository": name} for name in names()),
+            output,
+            header="Repositories:",
+            format_text=lambda record: record["repository"],
+        )
 
-def show_tags(registry: Registry, repository: str) -> None:
+
+def show_tags(
+    registry: Registry, repository: str, *, output: str, recursive: bool, jobs: int
+) -> None:
+    import requests
+
+    repo = registry.repository(repository)
     try:
-        repo = registry.repository(repository)
+        tags = repo.tags()
     except requests.HTTPError as e:
         if e.response.status_code != requests.codes.not_found:
             raise
         print("Repository {0} not found".format(repository), file=sys.stderr)
         return
 
-    print(f"Tags in repository {repository}:")
-    for tag in repo.tags():
-        print(f"  - {tag}")
+    if recursive:
+        write_records(
+            crawl_tags(registry, [repo.name], jobs),
+            output,
+            header=f"Tags in repository {repository}:",
+            format_text=format_tag,
+        )
+    else:
+        write_records(
+            ({"repository": repo.name, "tag": tag} for tag in tags),
+            output,
+            header=f"Tags in repository {repository}:",
+            format_text=lambda record: record["tag"],
+        )
+
+
+def read_references(lines: IO[str]) -> Iterator[str]:
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
 
+def resolve(registry: Registry, lines: IO[str], *, output: str, jobs: int, ordered: bool) -> bool:
+    from dreg_client.references import resolve_references
+
+    # Every reference shares one registry client, and so one session and token cache.
+    results = resolve_references(
+        registry, read_references(lines), max_concurrency=jobs, ordered=ordered
+    )
+    failed = False
+
+    def records() -> Iterator[Mapping[str, Any]]:
+        nonlocal failed
+        for result in results:
+            if result.error is not None:
+                print(f"Failed to resolve {result.reference}: {result.error}", file=sys.stderr)
+            elif result.digest is None:
+                print(f"Image {result.reference} not found", file=sys.stderr)
+            failed = failed or result.digest is None
+            yield {"reference": result.reference, "digest": result.digest}
+
+    if output == OUTPUT_TEXT:
+        for record in records():
+            if record["digest"] is not None:
+                sys.stdout.write(f"{record['reference']}\t{record['digest']}\n")
+                sys.stdout.flush()
+    else:
+        write_records(records(), output, header="", format_text=str)
+    return not failed
 
-def show_manifest(registry: Registry, repository: str, ref: str) -> None:
+
+def show_manifest(registry: Registry, repository: str, ref: str, *, output: str) -> None:
+    import requests
+
+    from dreg_client.serialisation import to_data
+
+    repo = registry.repository(repository)
     try:
-        repo = registry.repository(repository)
+        manifest = repo.get_manifest(ref)
     except requests.HTTPError as e:
         if e.response.status_code != requests.codes.not_found:
             raise
-        print("Repository {0} not found".format(repository), file=sys.stderr)
+        print("Manifest {0} not found in repository {1}".format(ref, repository), file=sys.stderr)
         return
 
-    manifest = repo.get_manifest(ref)
-    print(f"Digest: {manifest.digest}")
-    print("Manifest:")
-    print(json.dumps(manifest, indent=2, sort_keys=True))
+    if output == OUTPUT_TEXT:
+        print(f"Digest: {manifest.digest}")
+        print("Manifest:")
+        print(json.dumps(to_data(manifest), indent=2, sort_keys=True))
+    elif output == OUTPUT_JSON:
+        print(json.dumps(to_data(manifest), indent=2))
+    else:
+        print(json.dumps(to_data(manifest)))
 
 
 if __name__ == "__main__":
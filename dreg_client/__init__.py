@@ -1,32 +1,91 @@
 from __future__ import annotations
 
-from .auth_service import AuthService, AuthServiceFailure, DockerTokenAuthService
-from .client import Client
-from .image import Image, PlatformImage, UnavailableImagePlatformError, UnexpectedImageManifestError
-from .manifest import (
-    ImageConfig,
-    ImageHistoryItem,
-    InvalidPlatformNameError,
-    LegacyManifest,
-    Manifest,
-    ManifestList,
-    Platform,
-    UnusableImageConfigBlobPayloadError,
-    UnusableImageConfigBlobResponseError,
-    UnusableManifestPayloadError,
-    UnusableManifestResponseError,
-)
-from .registry import Registry
-from .repository import LegacyImageRequestError, Repository
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+
+if TYPE_CHECKING:
+    from .auth_service import AuthService, AuthServiceFailure, DockerTokenAuthService
+    from .client import Client
+    from .image import (
+        Image,
+        PlatformImage,
+        UnavailableImagePlatformError,
+        UnexpectedImageManifestError,
+    )
+    from .manifest import (
+        ImageConfig,
+        ImageHistoryItem,
+        InvalidPlatformNameError,
+        LegacyManifest,
+        Manifest,
+        ManifestDigestMismatchError,
+        ManifestList,
+        Platform,
+        UnusableImageConfigBlobPayloadError,
+        UnusableImageConfigBlobResponseError,
+        UnusableManifestPayloadError,
+        UnusableManifestResponseError,
+    )
+    from .registry import Registry
+    from .repository import LegacyImageRequestError, Repository, TagResolution
+    from .store import ContentStore
 
 
 __version__ = "1.2.0"
 
 
+# Submodules are only imported when one of their names is first used, so that importing the
+# package (and with it, requests) doesn't slow down programs that only need part of it.
+_LAZY_ATTRIBUTES = {
+    "AuthService": ".auth_service",
+    "AuthServiceFailure": ".auth_service",
+    "DockerTokenAuthService": ".auth_service",
+    "Client": ".client",
+    "Image": ".image",
+    "PlatformImage": ".image",
+    "UnavailableImagePlatformError": ".image",
+    "UnexpectedImageManifestError": ".image",
+    "ImageConfig": ".manifest",
+    "ImageHistoryItem": ".manifest",
+    "InvalidPlatformNameError": ".manifest",
+    "LegacyManifest": ".manifest",
+    "Manifest": ".manifest",
+    "ManifestDigestMismatchError": ".manifest",
+    "ManifestList": ".manifest",
+    "Platform": ".manifest",
+    "UnusableImageConfigBlobPayloadError": ".manifest",
+    "UnusableImageConfigBlobResponseError": ".manifest",
+    "UnusableManifestPayloadError": ".manifest",
+    "UnusableManifestResponseError": ".manifest",
+    "Registry": ".registry",
+    "LegacyImageRequestError": ".repository",
+    "Repository": ".repository",
+    "TagResolution": ".repository",
+    "ContentStore": ".store",
+}
+
+
+def __getattr__(name: str) -> Any:
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache the value, so that this is only called once for each name.
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
 __all__ = (
     "AuthService",
     "AuthServiceFailure",
     "Client",
+    "ContentStore",
     "DockerTokenAuthService",
     "Image",
     "ImageConfig",
@@ -35,11 +94,13 @@ __all__ = (
     "LegacyManifest",
     "LegacyImageRequestError",
     "Manifest",
+    "ManifestDigestMismatchError",
     "ManifestList",
     "Platform",
     "PlatformImage",
     "Registry",
     "Repository",
+    "TagResolution",
     "UnavailableImagePlatformError",
     "UnexpectedImageManifestError",
     "UnusableImageConfigBlobResponseError",
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterable, Iterator, Tuple, TypeVar
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def bounded_map(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    /,
+    *,
+    max_concurrency: int,
+    ordered: bool = False,
+) -> Iterator[Tuple[T, R]]:
+    """
+    Call fn for each item using a pool of threads, yielding (item, result) pairs.
+
+    Items are consumed lazily, and no more than max_concurrency calls are ever in flight at
+    once. Results are yielded as soon as they're available, unless ordered is set, in which
+    case they're yielded in the same order as the items. Exceptions raised by fn are re-raised
+    when the corresponding result is reached.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1.")
+
+    if max_concurrency == 1:
+        for item in items:
+            yield item, fn(item)
+        return
+
+    item_iter = iter(items)
+    pending: Dict[Future[R], T] = {}
+    submitted: Deque[Future[R]] = deque()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+
+        def submit_next() -> None:
+            for item in item_iter:
+                future = executor.submit(fn, item)
+                pending[future] = item
+                if ordered:
+                    submitted.append(future)
+                return
+
+        try:
+            for _ in range(max_concurrency):
+                submit_next()
+
+            while pending:
+                done: Iterable[Future[R]]
+                if ordered:
+                    done = (submitted.popleft(),)
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item = pending.pop(future)
+                    yield item, future.result()
+                    submit_next()
+        finally:
+            for future in pending:
+                future.cancel()
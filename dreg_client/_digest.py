@@ -0,0 +1,17 @@
+import hashlib
+
+
+def is_digest(reference: str) -> bool:
+    # Tags can't contain colons, whereas digests always do.
+    return ":" in reference
+
+
+def compute_digest(content: bytes, algorithm: str = "sha256") -> str:
+    digest_hash = hashlib.new(algorithm)
+    digest_hash.update(content)
+    return f"{algorithm}:{digest_hash.hexdigest()}"
+
+
+def digest_algorithm(digest: str) -> str:
+    algorithm, _, _ = digest.partition(":")
+    return algorithm
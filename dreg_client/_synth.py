@@ -1,20 +1,26 @@
 import json
 from collections import OrderedDict
-from hashlib import sha256
 from typing import Any, Dict
 
+from ._digest import compute_digest
 from .manifest import ImageConfig, Manifest, ManifestList, ManifestRef
-from .schemas import schema_2_list
+from .schemas import oci_index, oci_manifest, schema_2_list
 
 
 def synth_manifest_list_from_manifest(
     manifest: Manifest, image_config: ImageConfig
 ) -> ManifestList:
+    # Keep the synthesised list in the same family of formats as the manifest it wraps.
+    if manifest.content_type == oci_manifest:
+        content_type = oci_index
+    else:
+        content_type = schema_2_list
+
     manifest_ref_platform: Dict[str, Any] = OrderedDict()
     manifest_ref_platform["architecture"] = image_config.platform.architecture
     manifest_ref_platform["os"] = image_config.platform.os
     if image_config.platform.variant:
-        manifest_ref_platform["manifests"] = image_config.platform.variant
+        manifest_ref_platform["variant"] = image_config.platform.variant
 
     manifest_ref_data: Dict[str, Any] = OrderedDict()
     manifest_ref_data["mediaType"] = manifest.content_type
@@ -23,14 +29,12 @@ def synth_manifest_list_from_manifest(
     manifest_ref_data["platform"] = manifest_ref_platform
 
     manifest_list_data: Dict[str, Any] = OrderedDict()
-    manifest_list_data["mediaType"] = schema_2_list
+    manifest_list_data["mediaType"] = content_type
     manifest_list_data["schemaVersion"] = 2
     manifest_list_data["manifests"] = [manifest_ref_data]
 
-    manifest_list_json = json.dumps(manifest_list_data, indent=3)
-    digest_hash = sha256()
-    digest_hash.update(manifest_list_json.encode())
-    digest = digest_hash.hexdigest()
+    manifest_list_json = json.dumps(manifest_list_data, indent=3).encode()
+    digest = compute_digest(manifest_list_json)
     content_length = len(manifest_list_json)
 
     manifest_ref = ManifestRef(
@@ -41,9 +45,10 @@ def synth_manifest_list_from_manifest(
     )
     manifest_list = ManifestList(
         digest=digest,
-        content_type=schema_2_list,
+        content_type=content_type,
         content_length=content_length,
         manifests={manifest_ref},
+        raw_content=manifest_list_json,
     )
 
     return manifest_list
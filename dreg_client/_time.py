@@ -0,0 +1,34 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+
+TIMESTAMP_PATTERN = re.compile(
+    r"^(?P<base>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(?P<fraction>\d+))?"
+    r"(?P<offset>Z|[+-]\d{2}:\d{2})$"
+)
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse an RFC 3339 timestamp, as found in image configs, into an aware datetime.
+
+    Image configs commonly include nanoseconds, which datetime can't represent, so anything
+    beyond microseconds is truncated.
+    """
+    match = TIMESTAMP_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid timestamp '{value}' supplied.")
+
+    parsed = datetime.strptime(match["base"], "%Y-%m-%dT%H:%M:%S")
+    fraction = match["fraction"]
+    if fraction:
+        parsed = parsed.replace(microsecond=int(fraction[:6].ljust(6, "0")))
+
+    offset = match["offset"]
+    if offset == "Z":
+        return parsed.replace(tzinfo=timezone.utc)
+
+    delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+    if offset[0] == "-":
+        delta = -delta
+    return parsed.replace(tzinfo=timezone(delta))
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import dataclasses
 import logging
+import threading
 import time
 from typing import TYPE_CHECKING, Protocol, runtime_checkable
 
@@ -17,6 +18,11 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+# Several scopes can be requested for one token by joining them with this separator, as in the
+# scope parameter of a token challenge.
+SCOPE_SEPARATOR = " "
+
+
 def make_expires_at(validity_duration: int) -> int:
     return int(time.time()) + max(validity_duration - 5, 55)
 
@@ -39,6 +45,12 @@ class AuthServiceFailure(Exception):  # noqa: N818
 @runtime_checkable
 class AuthService(Protocol):
     def request_token(self, scope: str) -> str:
+        """
+        Return a token for the given scope.
+
+        The scope may be several scopes joined with SCOPE_SEPARATOR, in which case the token has
+        to cover all of them.
+        """
         ...
 
 
@@ -46,6 +58,8 @@ class DockerTokenAuthService(AuthService):
     def __init__(self, session: BaseUrlSession, /):
         self._session: BaseUrlSession = session
         self._saved_tokens: Dict[str, AuthToken] = {}
+        self._lock = threading.Lock()
+        self._scope_locks: Dict[str, threading.Lock] = {}
 
     @classmethod
     def build_with_session(
@@ -57,6 +71,17 @@ class DockerTokenAuthService(AuthService):
         return DockerTokenAuthService(session)
 
     def request_token(self, scope: str, /) -> str:
+        # Each of several scopes is sent as its own scope parameter, as the token specification
+        # requires.
+        #
+        # Only one thread fetches a token for each scope at a time, so that many concurrent
+        # requests sharing a scope result in a single request to the auth service.
+        with self._lock:
+            scope_lock = self._scope_locks.setdefault(scope, threading.Lock())
+        with scope_lock:
+            return self._request_token(scope)
+
+    def _request_token(self, scope: str) -> str:
         saved_token = self._saved_tokens.get(scope)
         if saved_token:
             if saved_token.has_expired:
@@ -64,7 +89,7 @@ class DockerTokenAuthService(AuthService):
             else:
                 return saved_token.token
 
-        response = self._session.get("", params={"scope": scope})
+        response = self._session.get("", params={"scope": scope.split(SCOPE_SEPARATOR)})
         try:
             response.raise_for_status()
         except Exception as exc:
@@ -90,4 +115,4 @@ class DockerTokenAuthService(AuthService):
         return token.token
 
 
-__all__ = ("AuthService", "AuthServiceFailure", "DockerTokenAuthService")
+__all__ = ("SCOPE_SEPARATOR", "AuthService", "AuthServiceFailure", "DockerTokenAuthService")
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from requests import HTTPError
+
+from ._concurrency import bounded_map
+from .manifest import LegacyManifest, Manifest, ManifestList, ManifestParseOutput
+from .repository import DEFAULT_MAX_CONCURRENCY, Repository, TagResolution
+
+
+logger = logging.getLogger(__name__)
+
+
+JOURNAL_KIND_MANIFEST = "manifest"
+JOURNAL_KIND_BLOB = "blob"
+
+
+def manifest_blobs(manifest: ManifestParseOutput) -> Mapping[str, int]:
+    """
+    Return the digests and sizes of every blob directly referenced by a manifest.
+
+    Legacy manifests don't record the sizes of their layers, so they're all reported as zero.
+    """
+    if isinstance(manifest, Manifest):
+        blobs = {manifest.config.digest: manifest.config.size}
+        for layer in manifest.layers:
+            blobs[layer.digest] = layer.size
+        return blobs
+    if isinstance(manifest, LegacyManifest):
+        return {layer["blobSum"]: 0 for layer in manifest.content.get("fsLayers", ())}
+    return {}
+
+
+@dataclass(frozen=True)
+class DeletionPlan:
+    repository: str
+    tags: Sequence[str]
+    undeletable_tags: Sequence[str]
+    manifests: Sequence[str]
+    blobs: Mapping[str, int] = field(repr=False)
+    # The manifest lists among the manifests, grouped so that a group only refers to lists in
+    # later groups. Each group is deleted before anything it refers to.
+    manifest_lists: Sequence[Sequence[str]] = ()
+
+    @property
+    def estimated_bytes_freed(self) -> int:
+        return sum(self.blobs.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "repository": self.repository,
+            "tags": list(self.tags),
+            "undeletable_tags": list(self.undeletable_tags),
+            "manifests": list(self.manifests),
+            "blobs": dict(self.blobs),
+            "manifest_lists": [list(group) for group in self.manifest_lists],
+            "estimated_bytes_freed": self.estimated_bytes_freed,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any], /) -> DeletionPlan:
+        return cls(
+            repository=data["repository"],
+            tags=tuple(data["tags"]),
+            undeletable_tags=tuple(data["undeletable_tags"]),
+            manifests=tuple(data["manifests"]),
+            blobs=dict(data["blobs"]),
+            manifest_lists=tuple(tuple(group) for group in data.get("manifest_lists", ())),
+        )
+
+
+class CleanupPlanner:
+    """
+    Works out which manifests and blobs in a repository can be deleted.
+
+    The planner builds a reference graph running from tags to manifest lists to manifests to
+    config and layer blobs, following nested manifest lists to any depth. Anything only
+    reachable from tags being deleted (or from candidate digests that no tag refers to) is
+    included in the plan. Anything still reachable from a remaining tag or a protected digest is
+    kept, and so is every blob referred to by a manifest that is kept.
+
+    The registry API has no way of listing untagged manifests, so the planner can't see them
+    unless they are passed in. Untagged manifests that should survive the cleanup, and keep their
+    blobs, have to be given as protected digests.
+    """
+
+    def __init__(
+        self, repository: Repository, /, *, max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> None:
+        self._repository = repository
+        self._max_concurrency = max_concurrency
+
+    def _fetch_manifest(self, digest: str) -> Optional[ManifestParseOutput]:
+        try:
+            return self._repository.get_manifest(digest)
+        except HTTPError as exc:
+            if exc.response is not None and exc.response.status_code == 404:
+                logger.debug("Manifest %s no longer exists in %s", digest, self._repository.name)
+                return None
+            raise
+
+    def _fetch_manifests(
+        self, digests: Iterable[str], manifests: Dict[str, ManifestParseOutput]
+    ) -> None:
+        to_fetch = [digest for digest in digests if digest not in manifests]
+        for digest, manifest in bounded_map(
+            self._fetch_manifest, to_fetch, max_concurrency=self._max_concurrency
+        ):
+            if manifest is not None:
+                manifests[digest] = manifest
+
+    def _reachable(
+        self, roots: Iterable[str], manifests: Dict[str, ManifestParseOutput]
+    ) -> List[str]:
+        # Walks the reference graph one level at a time, fetching each level concurrently.
+        reachable: Dict[str, None] = {}
+        pending = list(dict.fromkeys(roots))
+        while pending:
+            self._fetch_manifests(pending, manifests)
+            children: List[str] = []
+            for digest in pending:
+                if digest in reachable or digest not in manifests:
+                    continue
+                reachable[digest] = None
+                manifest = manifests[digest]
+                if isinstance(manifest, ManifestList):
+                    children.extend(manifest.referenced_digests)
+            pending = [digest for digest in dict.fromkeys(children) if digest not in reachable]
+        return list(reachable)
+
+    @staticmethod
+    def _depths(
+        digests: Sequence[str], manifests: Mapping[str, ManifestParseOutput]
+    ) -> Dict[str, int]:
+        # The length of the longest chain of manifest lists leading to each digest, counting only
+        # the given digests.
+        depths = dict.fromkeys(digests, 0)
+        changed = True
+        while changed:
+            changed = False
+            for digest in digests:
+                manifest = manifests[digest]
+                if not isinstance(manifest, ManifestList):
+                    continue
+                for child in manifest.referenced_digests:
+                    if child in depths and depths[child] <= depths[digest]:
+                        depths[child] = depths[digest] + 1
+                        changed = True
+        return depths
+
+    def plan(
+        self,
+        delete_tags: Iterable[str],
+        /,
+        *,
+        candidate_digests: Iterable[str] = (),
+        protected_digests: Iterable[str] = (),
+        resolution: Optional[TagResolution] = None,
+    ) -> DeletionPlan:
+        """
+        Build a deletion plan for the given tags.
+
+        Candidate digests are untagged manifests to delete, and protected digests are untagged
+        manifests to keep. A resolution of every tag in the repository can be supplied if one is
+        already at hand, to avoid resolving all of the tags a second time.
+        """
+        delete_tag_set = frozenset(delete_tags)
+        if resolution is None:
+            resolution = self._repository.resolve_tags(
+                max_concurrency=self._max_concurrency, fetch_manifests=True
+            )
+        manifests: Dict[str, ManifestParseOutput] = dict(resolution.manifests)
+
+        # Whatever a kept tag points at has to be kept, so that has to be known.
+        unknown_kept_tags = [tag for tag in resolution.unresolved_tags if tag not in delete_tag_set]
+        if unknown_kept_tags:
+            raise ValueError(f"Unable to resolve tags being kept: {', '.join(unknown_kept_tags)}")
+
+        kept_roots = {
+            digest for tag, digest in resolution.digests.items() if tag not in delete_tag_set
+        }
+        kept_roots.update(protected_digests)
+        deleted_roots = [
+            digest
+            for digest in (*resolution.tags_by_digest, *candidate_digests)
+            if digest not in kept_roots
+        ]
+
+        kept_manifests = set(self._reachable(kept_roots, manifests))
+        deleted = [
+            digest
+            for digest in self._reachable(deleted_roots, manifests)
+            if digest not in kept_manifests
+        ]
+        depths = self._depths(deleted, manifests)
+        deleted_manifests = sorted(deleted, key=depths.__getitem__)
+
+        # Every manifest seen that isn't being deleted keeps its blobs, whether or not a remaining
+        # tag reaches it.
+        kept_blobs: Set[str] = set()
+        for digest, manifest in manifests.items():
+            if digest not in depths:
+                kept_blobs.update(manifest_blobs(manifest))
+        deleted_blobs: Dict[str, int] = {}
+        for digest in deleted_manifests:
+            for blob_digest, size in manifest_blobs(manifests[digest]).items():
+                if blob_digest not in kept_blobs:
+                    deleted_blobs[blob_digest] = size
+
+        manifest_lists: Dict[int, List[str]] = {}
+        for digest in deleted_manifests:
+            if isinstance(manifests[digest], ManifestList):
+                manifest_lists.setdefault(depths[digest], []).append(digest)
+
+        deleted_tags: List[str] = []
+        undeletable_tags: List[str] = []
+        for tag in sorted(delete_tag_set & resolution.digests.keys()):
+            if resolution.digests[tag] in kept_manifests:
+                # Manifests can only be deleted by digest, which removes every tag pointing at
+                # it. This tag shares a digest with a manifest that is being kept.
+                undeletable_tags.append(tag)
+            else:
+                deleted_tags.append(tag)
+        # Tags whose digest is unknown can't be deleted, as manifests are deleted by digest.
+        undeletable_tags.extend(sorted(delete_tag_set.intersection(resolution.unresolved_tags)))
+
+        return DeletionPlan(
+            repository=self._repository.name,
+            tags=tuple(deleted_tags),
+            undeletable_tags=tuple(undeletable_tags),
+            manifests=tuple(deleted_manifests),
+            blobs=deleted_blobs,
+            manifest_lists=tuple(tuple(group) for _, group in sorted(manifest_lists.items())),
+        )
+
+
+@dataclass(frozen=True)
+class CleanupProgress:
+    kind: str
+    digest: str
+    succeeded: bool
+    completed: int
+    total: int
+
+
+@dataclass(frozen=True)
+class CleanupResult:
+    deleted_manifests: Sequence[str]
+    deleted_blobs: Sequence[str]
+    bytes_freed: int
+    failures: Mapping[str, Exception] = field(repr=False)
+
+
+def _read_journal(journal_path: Path) -> Set[Tuple[str, str]]:
+    if not journal_path.exists():
+        return set()
+
+    completed: Set[Tuple[str, str]] = set()
+    with journal_path.open("r", encoding="utf-8") as journal:
+        for line in journal:
+            kind, _, digest = line.strip().partition(" ")
+            if digest:
+                completed.add((kind, digest))
+    return completed
+
+
+def execute_plan(
+    repository: Repository,
+    plan: DeletionPlan,
+    /,
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    journal_path: Union[None, str, Path] = None,
+    progress: Optional[Callable[[CleanupProgress], None]] = None,
+) -> CleanupResult:
+    """
+    Carry out a deletion plan, deleting manifests first and blobs afterwards.
+
+    Manifest lists are deleted before the manifests they refer to, so that an interrupted run
+    never leaves a list behind that refers to a deleted manifest.
+
+    When a journal path is supplied, every successful deletion is recorded in it as it happens.
+    Running the same plan again with the same journal skips everything already deleted, which
+    makes it possible to resume an interrupted run. Deletions that fail are collected in the
+    result rather than aborting the run, and things that no longer exist count as deleted.
+    """
+    journal: Optional[Path] = Path(journal_path) if journal_path is not None else None
+    completed = _read_journal(journal) if journal is not None else set()
+
+    list_digests = {digest for group in plan.manifest_lists for digest in group}
+    steps: List[Tuple[str, Sequence[str], Callable[[str], object]]] = [
+        *(
+            (JOURNAL_KIND_MANIFEST, group, repository.delete_manifest)
+            for group in plan.manifest_lists
+        ),
+        (
+            JOURNAL_KIND_MANIFEST,
+            [digest for digest in plan.manifests if digest not in list_digests],
+            repository.delete_manifest,
+        ),
+        (JOURNAL_KIND_BLOB, tuple(plan.blobs), repository.delete_blob),
+    ]
+    total = sum(len(digests) for _, digests, _ in steps)
+    done_count = 0
+    deleted: Dict[str, List[str]] = {JOURNAL_KIND_MANIFEST: [], JOURNAL_KIND_BLOB: []}
+    failures: Dict[str, Exception] = {}
+
+    def attempt(delete: Callable[[str], object], digest: str) -> Optional[Exception]:
+        try:
+            delete(digest)
+        except HTTPError as exc:
+            if exc.response is not None and exc.response.status_code == 404:
+                return None
+            return exc
+        return None
+
+    journal_file = journal.open("a", encoding="utf-8") if journal is not None else None
+    try:
+        for kind, digests, delete in steps:
+            pending = [digest for digest in digests if (kind, digest) not in completed]
+            done_count += len(digests) - len(pending)
+
+            for digest, error in bounded_map(
+                partial(attempt, delete), pending, max_concurrency=max_concurrency
+            ):
+                done_count += 1
+                if error is not None:
+                    logger.warning("Failed to delete %s %s: %s", kind, digest, error)
+                    failures[digest] = error
+                else:
+                    deleted[kind].append(digest)
+                    if journal_file is not None:
+                        journal_file.write(f"{kind} {digest}\n")
+                        journal_file.flush()
+
+                if progress is not None:
+                    progress(CleanupProgress(kind, digest, error is None, done_count, total))
+    finally:
+        if journal_file is not None:
+            journal_file.close()
+
+    return CleanupResult(
+        deleted_manifests=tuple(deleted[JOURNAL_KIND_MANIFEST]),
+        deleted_blobs=tuple(deleted[JOURNAL_KIND_BLOB]),
+        bytes_freed=sum(plan.blobs[digest] for digest in deleted[JOURNAL_KIND_BLOB]),
+        failures=failures,
+    )
+
+
+__all__ = (
+    "CleanupPlanner",
+    "CleanupProgress",
+    "CleanupResult",
+    "DeletionPlan",
+    "execute_plan",
+    "manifest_blobs",
+)
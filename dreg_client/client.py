@@ -1,18 +1,33 @@
 from __future__ import annotations
 
 import logging
-from typing import TYPE_CHECKING, Callable, Dict, Optional, Sequence, TypedDict, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    TypedDict,
+    Union,
+    cast,
+)
 
 from requests import HTTPError, RequestException, Response
 from requests_toolbelt.sessions import BaseUrlSession
 
+from ._digest import compute_digest, is_digest
+from .auth_service import SCOPE_SEPARATOR
 from .manifest import (
     ImageConfig,
     ManifestParseOutput,
+    UnusableManifestResponseError,
     parse_image_config_blob_response,
     parse_manifest_response,
 )
-from .schemas import schema_2, schema_2_list
+from .schemas import manifest_accept_content_types
 
 
 if TYPE_CHECKING:
@@ -27,6 +42,7 @@ HEADERS = Dict[str, str]
 
 scope_catalog = "registry:catalog:*"
 scope_repo: Callable[[str], str] = lambda repo: f"repository:{repo}:*"
+scope_repo_pull: Callable[[str], str] = lambda repo: f"repository:{repo}:pull"
 
 
 class CatalogResponse(TypedDict):
@@ -65,7 +81,14 @@ class Client:
             session.auth = auth
         return Client(session, auth_service=auth_service)
 
-    def _head(self, url_path: str, scope: str, headers: Optional[HEADERS] = None) -> Response:
+    def _request(
+        self,
+        method: str,
+        url_path: str,
+        scope: str,
+        headers: Optional[HEADERS] = None,
+        **kwargs: Any,
+    ) -> Response:
         if not headers:
             headers = {}
 
@@ -73,33 +96,49 @@ class Client:
             token = self._auth_service.request_token(scope)
             headers["Authorization"] = f"Bearer {token}"
 
-        response = cast(Response, self._session.head(url_path, headers=headers))
+        response = cast(
+            Response, self._session.request(method, url_path, headers=headers, **kwargs)
+        )
         response.raise_for_status()
         return response
 
-    def _get(self, url_path: str, scope: str, headers: Optional[HEADERS] = None) -> Response:
-        if not headers:
-            headers = {}
-
-        if self._auth_service:
-            token = self._auth_service.request_token(scope)
-            headers["Authorization"] = f"Bearer {token}"
+    def _head(self, url_path: str, scope: str, headers: Optional[HEADERS] = None) -> Response:
+        return self._request("HEAD", url_path, scope, headers, allow_redirects=False)
 
-        response = cast(Response, self._session.get(url_path, headers=headers))
-        response.raise_for_status()
-        return response
+    def _get(
+        self,
+        url_path: str,
+        scope: str,
+        headers: Optional[HEADERS] = None,
+        *,
+        params: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> Response:
+        return self._request("GET", url_path, scope, headers, params=params, stream=stream)
+
+    def _post(
+        self,
+        url_path: str,
+        scope: str,
+        headers: Optional[HEADERS] = None,
+        *,
+        params: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        return self._request("POST", url_path, scope, headers, params=params)
+
+    def _put(
+        self,
+        url_path: str,
+        scope: str,
+        headers: Optional[HEADERS] = None,
+        *,
+        params: Optional[Dict[str, str]] = None,
+        data: Union[None, bytes, Iterable[bytes]] = None,
+    ) -> Response:
+        return self._request("PUT", url_path, scope, headers, params=params, data=data)
 
     def _delete(self, url_path: str, scope: str, headers: Optional[HEADERS] = None) -> Response:
-        if not headers:
-            headers = {}
-
-        if self._auth_service:
-            token = self._auth_service.request_token(scope)
-            headers["Authorization"] = f"Bearer {token}"
-
-        response = cast(Response, self._session.delete(url_path, headers=headers))
-        response.raise_for_status()
-        return response
+        return self._request("DELETE", url_path, scope, headers)
 
     def check_status(self) -> bool:
         try:
@@ -114,13 +153,38 @@ class Client:
         response = self._get("_catalog", scope_catalog)
         return cast(CatalogResponse, response.json())
 
+    def iter_catalog(self, *, page_size: Optional[int] = None) -> Iterator[str]:
+        """
+        Iterate over the names of every repository in the registry.
+
+        Unlike catalog(), which only returns the first page of results, this follows the links
+        to each subsequent page. Pages are only fetched as they're needed.
+        """
+        url_path: Optional[str] = "_catalog"
+        params = {"n": str(page_size)} if page_size is not None else None
+        while url_path is not None:
+            response = self._get(url_path, scope_catalog, params=params)
+            yield from cast(CatalogResponse, response.json())["repositories"] or ()
+            url_path = response.links.get("next", {}).get("url")
+            # The link to the next page already includes every query parameter needed.
+            params = None
+
     def get_repository_tags(self, name: str) -> TagsResponse:
         response = self._get(f"{name}/tags/list", scope_repo(name))
         return cast(TagsResponse, response.json())
 
-    def check_manifest(self, name: str, reference: str) -> Optional[str]:
+    def check_manifest(
+        self, name: str, reference: str, *, require_digest: bool = False
+    ) -> Optional[str]:
+        """
+        Return the digest of a manifest, or None if it doesn't exist.
+
+        Some registries leave the digest out of the response headers, in which case None is also
+        returned. When require_digest is set, an UnusableManifestResponseError is raised instead,
+        so that a missing digest can be told apart from a missing manifest.
+        """
         headers: HEADERS = {
-            "Accept": ",".join((schema_2, schema_2_list)),
+            "Accept": ",".join(manifest_accept_content_types),
         }
         try:
             response = self._head(
@@ -131,28 +195,122 @@ class Client:
                 return None
             raise
 
-        return response.headers.get("Docker-Content-Digest", None)
+        digest = response.headers.get("Docker-Content-Digest", None)
+        if digest is None and require_digest:
+            raise UnusableManifestResponseError(
+                response, "No digest specified in response headers."
+            )
+        return digest
 
-    def get_manifest(self, name: str, reference: str) -> ManifestParseOutput:
+    def get_manifest(
+        self,
+        name: str,
+        reference: str,
+        *,
+        verify_digest: bool = False,
+        retain_content: bool = False,
+    ) -> ManifestParseOutput:
         headers: HEADERS = {
-            "Accept": ",".join((schema_2, schema_2_list)),
+            "Accept": ",".join(manifest_accept_content_types),
         }
         response = self._get(f"{name}/manifests/{reference}", scope_repo(name), headers=headers)
 
-        return parse_manifest_response(response)
+        expected_digest = reference if verify_digest and is_digest(reference) else None
+        return parse_manifest_response(
+            response,
+            verify_digest=verify_digest,
+            expected_digest=expected_digest,
+            retain_content=retain_content,
+        )
 
     def delete_manifest(self, name: str, digest: str) -> Response:
         response = self._delete(f"{name}/manifests/{digest}", scope_repo(name))
         return response
 
-    def get_image_config_blob(self, name: str, digest: str) -> ImageConfig:
+    def get_image_config_blob(self, name: str, digest: str, *, lazy: bool = False) -> ImageConfig:
         response = self.get_blob(name, digest)
-        return parse_image_config_blob_response(response)
+        return parse_image_config_blob_response(response, lazy=lazy)
 
-    def get_blob(self, name: str, digest: str) -> Response:
-        response = self._get(f"{name}/blobs/{digest}", scope_repo(name))
+    def put_manifest(self, name: str, reference: str, content: bytes, content_type: str) -> str:
+        """
+        Upload a manifest, returning its digest.
+
+        The content is sent exactly as supplied, so that the digest of the manifest is preserved.
+        """
+        headers: HEADERS = {
+            "Content-Type": content_type,
+        }
+        response = self._put(
+            f"{name}/manifests/{reference}", scope_repo(name), headers=headers, data=content
+        )
+        return response.headers.get("Docker-Content-Digest") or compute_digest(content)
+
+    def check_blob(self, name: str, digest: str) -> Optional[int]:
+        """
+        Check whether a blob exists, returning its size if it does.
+        """
+        try:
+            response = self._head(f"{name}/blobs/{digest}", scope_repo(name))
+        except HTTPError as exc:
+            if exc.response.status_code == 404:
+                return None
+            raise
+
+        return int(response.headers.get("Content-Length", 0))
+
+    def get_blob(self, name: str, digest: str, *, stream: bool = False) -> Response:
+        """
+        Fetch a blob. When stream is set, the content is only downloaded as it's read from the
+        response, and the response must be closed once it's no longer needed.
+        """
+        response = self._get(f"{name}/blobs/{digest}", scope_repo(name), stream=stream)
         return response
 
+    def mount_blob(self, name: str, digest: str, from_name: str) -> Optional[str]:
+        """
+        Attempt to mount a blob from another repository in the same registry.
+
+        Returns None if the blob was mounted. Otherwise, the registry will have started a regular
+        upload instead, and the location of that upload is returned for use with upload_blob().
+        Registries only mount blobs if the credentials used can also pull from the other
+        repository.
+        """
+        # The token has to cover pulling from the other repository, as well as pushing to this one.
+        response = self._post(
+            f"{name}/blobs/uploads/",
+            SCOPE_SEPARATOR.join((scope_repo(name), scope_repo_pull(from_name))),
+            params={"mount": digest, "from": from_name},
+        )
+        if response.status_code == 201:
+            return None
+        return response.headers["Location"]
+
+    def upload_blob(
+        self,
+        name: str,
+        digest: str,
+        data: Union[bytes, Iterable[bytes]],
+        *,
+        location: Optional[str] = None,
+    ) -> Response:
+        """
+        Upload a blob in a single request.
+
+        The data may be an iterable of chunks, such as the output of iter_content() on a streamed
+        response, in which case it's sent as it's read rather than being held in memory. An upload
+        location previously returned by mount_blob() can be supplied to reuse that upload.
+        """
+        if location is None:
+            response = self._post(f"{name}/blobs/uploads/", scope_repo(name))
+            location = response.headers["Location"]
+
+        headers: HEADERS = {
+            "Content-Type": "application/octet-stream",
+        }
+        return self._put(
+            location, scope_repo(name), headers=headers, params={"digest": digest}, data=data
+        )
+
     def delete_blob(self, name: str, digest: str) -> Response:
         response = self._delete(f"{name}/blobs/{digest}", scope_repo(name))
         return response
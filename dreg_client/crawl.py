@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+)
+
+from .image import Image, PlatformImage
+from .manifest import ManifestParseOutput
+from .registry import Registry
+from .repository import Repository
+
+
+logger = logging.getLogger(__name__)
+
+
+CHECKPOINT_VERSION = 1
+
+STAGE_TAGS = "tags"
+STAGE_HEADS = "heads"
+STAGE_IMAGES = "images"
+
+
+@dataclass(frozen=True)
+class RepositoryRecord:
+    repository: str
+    tags: Sequence[str]
+
+
+@dataclass(frozen=True)
+class TagRecord:
+    repository: str
+    tag: str
+    digest: str
+
+
+@dataclass(frozen=True)
+class ImageRecord:
+    repository: str
+    digest: str
+    manifest: ManifestParseOutput = field(repr=False)
+    platform_images: Sequence[PlatformImage] = field(repr=False)
+
+
+@dataclass(frozen=True)
+class CrawlFailure:
+    stage: str
+    repository: str
+    reference: Optional[str]
+    error: Exception = field(compare=False, repr=False)
+
+
+CrawlRecord = Union[RepositoryRecord, TagRecord, ImageRecord, CrawlFailure]
+
+
+@dataclass(frozen=True)
+class CrawlCheckpoint:
+    completed_repositories: Set[str]
+    seen_digests: Set[str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": CHECKPOINT_VERSION,
+            "completed_repositories": sorted(self.completed_repositories),
+            "seen_digests": sorted(self.seen_digests),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], /) -> CrawlCheckpoint:
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError("Unsupported crawl checkpoint version.")
+        return cls(
+            completed_repositories=set(data["completed_repositories"]),
+            seen_digests=set(data["seen_digests"]),
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path], /) -> CrawlCheckpoint:
+        with open(path, "r", encoding="utf-8") as checkpoint_file:
+            return cls.from_dict(json.load(checkpoint_file))
+
+    def save(self, path: Union[str, Path], /) -> None:
+        # Write to a temporary file first, so that an interruption never leaves a partially
+        # written checkpoint behind.
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".checkpoint-", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as checkpoint_file:
+                json.dump(self.to_dict(), checkpoint_file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def _fetch_image(repository: Repository, digest: str) -> ImageRecord:
+    image = repository.get_image(digest, raise_on_legacy=False)
+    if isinstance(image, Image):
+        return ImageRecord(
+            repository=repository.name,
+            digest=digest,
+            manifest=repository.get_manifest(digest),
+            platform_images=tuple(image.get_platform_images()),
+        )
+    return ImageRecord(
+        repository=repository.name, digest=digest, manifest=image, platform_images=()
+    )
+
+
+class _Task:
+    __slots__ = ("stage", "repository", "reference")
+
+    def __init__(self, stage: str, repository: Repository, reference: Optional[str]) -> None:
+        self.stage = stage
+        self.repository = repository
+        self.reference = reference
+
+
+class RegistryCrawler:
+    """
+    Crawls every repository, tag and image in a registry.
+
+    The crawl is split into three stages, each with its own pool of threads and concurrency
+    limit: listing the tags in each repository, resolving each tag to a digest with a HEAD
+    request, and fetching the manifests and image configs for each digest. A single coordinator
+    feeds the results of each stage into the next, and yields records as they become available.
+
+    Images are only fetched once for each distinct digest, even when several tags or repositories
+    refer to the same digest. Digests that are already known can be supplied up front, in which
+    case they're never fetched at all. Similarly, a select_tags function can be supplied to choose
+    which of the tags listed in a repository should be resolved, and fetch_images can be turned
+    off to stop after resolving tags to digests.
+
+    When a checkpoint path is supplied, the set of fully crawled repositories and the digests of
+    every image already yielded are saved to it periodically. Crawling again with the same
+    checkpoint skips all of them. Repositories that were only partially crawled are crawled again
+    from the start, so records for them may be yielded more than once.
+    """
+
+    def __init__(
+        self,
+        registry: Registry,
+        /,
+        *,
+        tag_concurrency: int = 4,
+        head_concurrency: int = 16,
+        image_concurrency: int = 8,
+        known_digests: Iterable[str] = (),
+        select_tags: Optional[Callable[[str, Sequence[str]], Iterable[str]]] = None,
+        fetch_images: bool = True,
+        checkpoint_path: Union[None, str, Path] = None,
+        checkpoint_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if min(tag_concurrency, head_concurrency, image_concurrency) < 1:
+            raise ValueError("Concurrency limits must be at least 1.")
+
+        self._registry = registry
+        self._concurrency = {
+            STAGE_TAGS: tag_concurrency,
+            STAGE_HEADS: head_concurrency,
+            STAGE_IMAGES: image_concurrency,
+        }
+        self._known_digests = frozenset(known_digests)
+        self._select_tags = select_tags
+        self._fetch_images = fetch_images
+        self._checkpoint_path = checkpoint_path
+        self._checkpoint_interval = checkpoint_interval
+        self._clock = clock
+
+    def _load_checkpoint(self) -> CrawlCheckpoint:
+        if self._checkpoint_path is None or not os.path.exists(self._checkpoint_path):
+            return CrawlCheckpoint(completed_repositories=set(), seen_digests=set())
+        return CrawlCheckpoint.load(self._checkpoint_path)
+
+    def crawl(self, repositories: Optional[Iterable[str]] = None, /) -> Iterator[CrawlRecord]:
+        """
+        Crawl the given repositories, or every repository in the registry's catalog.
+        """
+        checkpoint = self._load_checkpoint()
+        completed = checkpoint.completed_repositories
+        # Digests of images that have been yielded, and so can be skipped after resuming.
+        emitted = checkpoint.seen_digests
+        # Digests of images that have been yielded, or are currently being fetched.
+        claimed = set(emitted) | self._known_digests
+
+        if repositories is None:
+            repositories = self._registry.client.iter_catalog()
+        names = (name for name in repositories if name not in completed)
+
+        executors = {
+            stage: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"crawl-{stage}")
+            for stage, limit in self._concurrency.items()
+        }
+        pending: Dict[Future[Any], _Task] = {}
+        outstanding: Dict[str, int] = {}
+        failed: Set[str] = set()
+        listing = 0
+        names_exhausted = False
+        last_checkpoint = self._clock()
+
+        def submit(
+            stage: str, repository: Repository, reference: Optional[str], fn: Callable[[], Any]
+        ) -> None:
+            future = executors[stage].submit(fn)
+            pending[future] = _Task(stage, repository, reference)
+            outstanding[repository.name] = outstanding.get(repository.name, 0) + 1
+
+        def save_checkpoint() -> None:
+            if self._checkpoint_path is not None:
+                CrawlCheckpoint(completed, emitted).save(self._checkpoint_path)
+
+        try:
+            while True:
+                # Only list a few repositories ahead, so that the catalog is read lazily.
+                while not names_exhausted and listing < self._concurrency[STAGE_TAGS] * 2:
+                    try:
+                        name = next(names)
+                    except StopIteration:
+                        names_exhausted = True
+                        break
+                    repository = self._registry.repository(name)
+                    submit(STAGE_TAGS, repository, None, repository.tags)
+                    listing += 1
+
+                if not pending:
+                    break
+
+                done, _ = wait(tuple(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = pending.pop(future)
+                    repo_name = task.repository.name
+                    if task.stage == STAGE_TAGS:
+                        listing -= 1
+
+                    error = future.exception()
+                    if error is not None and not isinstance(error, Exception):
+                        raise error
+                    if error is not None:
+                        logger.warning(
+                            "Crawl of %s failed at stage %s: %s", repo_name, task.stage, error
+                        )
+                        failed.add(repo_name)
+                        if task.stage == STAGE_IMAGES and task.reference is not None:
+                            # Let another repository with the same digest try again.
+                            claimed.discard(task.reference)
+                        yield CrawlFailure(task.stage, repo_name, task.reference, error)
+                    elif task.stage == STAGE_TAGS:
+                        tags: Sequence[str] = future.result()
+                        yield RepositoryRecord(repo_name, tags)
+                        if self._select_tags is not None:
+                            tags = tuple(self._select_tags(repo_name, tags))
+                        for tag in tags:
+                            submit(
+                                STAGE_HEADS,
+                                task.repository,
+                                tag,
+                                partial(task.repository.check_manifest, tag),
+                            )
+                    elif task.stage == STAGE_HEADS:
+                        digest: Optional[str] = future.result()
+                        if digest is not None and task.reference is not None:
+                            yield TagRecord(repo_name, task.reference, digest)
+                            if self._fetch_images and digest not in claimed:
+                                claimed.add(digest)
+                                submit(
+                                    STAGE_IMAGES,
+                                    task.repository,
+                                    digest,
+                                    partial(_fetch_image, task.repository, digest),
+                                )
+                    else:
+                        record: ImageRecord = future.result()
+                        emitted.add(record.digest)
+                        yield record
+
+                    outstanding[repo_name] -= 1
+                    if not outstanding[repo_name]:
+                        del outstanding[repo_name]
+                        if repo_name in failed:
+                            failed.discard(repo_name)
+                        else:
+                            completed.add(repo_name)
+
+                now = self._clock()
+                if now - last_checkpoint >= self._checkpoint_interval:
+                    save_checkpoint()
+                    last_checkpoint = now
+
+            save_checkpoint()
+        except GeneratorExit:
+            # Everything yielded so far has been seen by the consumer, so it's safe to record.
+            save_checkpoint()
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+
+__all__ = (
+    "CrawlCheckpoint",
+    "CrawlFailure",
+    "CrawlRecord",
+    "ImageRecord",
+    "RegistryCrawler",
+    "RepositoryRecord",
+    "TagRecord",
+)
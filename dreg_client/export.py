@@ -0,0 +1,421 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+from array import array
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, TextIO, Tuple, Type, Union
+
+from .crawl import CrawlRecord, ImageRecord, RepositoryRecord, TagRecord
+from .manifest import ImageLayerRef, LegacyManifest, Manifest, ManifestList
+
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+SCHEMA_VERSION = 1
+
+FORMAT_PARQUET = "parquet"
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+
+TYPE_STRING = "string"
+TYPE_INT64 = "int64"
+TYPE_BOOL = "bool"
+
+DEFAULT_BATCH_SIZE = 65536
+
+TABLES: Dict[str, Sequence[Tuple[str, str]]] = {
+    "repositories": (
+        ("repository", TYPE_STRING),
+        ("tag_count", TYPE_INT64),
+    ),
+    "tags": (
+        ("repository", TYPE_STRING),
+        ("tag", TYPE_STRING),
+        ("digest", TYPE_STRING),
+    ),
+    "manifests": (
+        ("digest", TYPE_STRING),
+        ("repository", TYPE_STRING),
+        ("content_type", TYPE_STRING),
+        ("content_length", TYPE_INT64),
+        # The manifest list a platform specific manifest belongs to.
+        ("parent_digest", TYPE_STRING),
+        ("platform", TYPE_STRING),
+        ("config_digest", TYPE_STRING),
+    ),
+    "layers": (
+        ("manifest_digest", TYPE_STRING),
+        ("position", TYPE_INT64),
+        ("digest", TYPE_STRING),
+        ("content_type", TYPE_STRING),
+        ("size", TYPE_INT64),
+    ),
+    "history": (
+        ("config_digest", TYPE_STRING),
+        ("position", TYPE_INT64),
+        ("created_at", TYPE_STRING),
+        ("created_by", TYPE_STRING),
+        ("empty_layer", TYPE_BOOL),
+        ("comment", TYPE_STRING),
+    ),
+}
+
+_EXTENSIONS = {
+    FORMAT_PARQUET: ".parquet",
+    FORMAT_CSV: ".csv",
+    FORMAT_NDJSON: ".ndjson",
+}
+
+
+def default_format() -> str:
+    """
+    Return the best export format available: Parquet when pyarrow is installed, otherwise CSV.
+    """
+    return FORMAT_PARQUET if pyarrow is not None else FORMAT_CSV
+
+
+def _new_column(column_type: str) -> Union[List[Optional[str]], array[int]]:
+    # Numbers are kept in typed arrays rather than lists of Python objects, which keeps batches
+    # compact and lets pyarrow use the memory directly.
+    if column_type == TYPE_INT64:
+        return array("q")
+    if column_type == TYPE_BOOL:
+        return array("b")
+    return []
+
+
+class _TableWriter:
+    def __init__(self, directory: Path, name: str, export_format: str) -> None:
+        self.columns = TABLES[name]
+        self.path = directory / (name + _EXTENSIONS[export_format])
+        self._file: Optional[TextIO] = None
+        self._csv_writer: Any = None
+        self._parquet_writer: Any = None
+
+        if export_format == FORMAT_PARQUET:
+            self._arrow_schema = pyarrow.schema(
+                [(column, _arrow_type(column_type)) for column, column_type in self.columns]
+            )
+            self._parquet_writer = pyarrow.parquet.ParquetWriter(self.path, self._arrow_schema)
+        else:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            if export_format == FORMAT_CSV:
+                self._csv_writer = csv.writer(self._file, lineterminator="\n")
+                self._csv_writer.writerow(column for column, _ in self.columns)
+
+    def write(self, batch: Sequence[Union[List[Optional[str]], array[int]]], rows: int) -> None:
+        if self._parquet_writer is not None:
+            arrays = [
+                _to_arrow(values, column_type, rows)
+                for values, (_, column_type) in zip(batch, self.columns)
+            ]
+            table = pyarrow.Table.from_arrays(arrays, schema=self._arrow_schema)
+            self._parquet_writer.write_table(table)
+            return
+        if self._file is None:
+            raise RuntimeError(f"The writer for {self.path.name} is closed.")
+
+        columns: List[Sequence[Any]] = list(batch)
+        for index, (_, column_type) in enumerate(self.columns):
+            if column_type == TYPE_BOOL:
+                if self._csv_writer is not None:
+                    columns[index] = ["true" if value else "false" for value in batch[index]]
+                else:
+                    columns[index] = [bool(value) for value in batch[index]]
+
+        if self._csv_writer is not None:
+            self._csv_writer.writerows(zip(*columns))
+            return
+        names = [column for column, _ in self.columns]
+        for row in zip(*columns):
+            self._file.write(json.dumps(dict(zip(names, row)), separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _arrow_type(column_type: str) -> Any:
+    if column_type == TYPE_INT64:
+        return pyarrow.int64()
+    if column_type == TYPE_BOOL:
+        return pyarrow.bool_()
+    return pyarrow.string()
+
+
+def _to_arrow(values: Union[List[Optional[str]], array[int]], column_type: str, rows: int) -> Any:
+    if column_type == TYPE_STRING:
+        return pyarrow.array(values, type=pyarrow.string())
+    # Wraps the array's own memory, rather than converting each value separately.
+    numbers = pyarrow.Array.from_buffers(
+        pyarrow.int64() if column_type == TYPE_INT64 else pyarrow.int8(),
+        rows,
+        [None, pyarrow.py_buffer(values)],
+    )
+    return numbers if column_type == TYPE_INT64 else numbers.cast(pyarrow.bool_())
+
+
+class CrawlExporter:
+    """
+    Exports the records of a crawl as a set of typed tables, for loading into analytics tools.
+
+    One file is written to the output directory for each of the repositories, tags, manifests,
+    layers and history tables, along with a ``schema.json`` file describing the schema version,
+    format and column types of every table.
+
+    Tables are written as Parquet files when pyarrow is installed, and otherwise as CSV files
+    (or newline delimited JSON). Rows are buffered into column oriented batches, with numbers
+    held in typed arrays, and each batch is written out as soon as it's full.
+
+    The schema file is only written once the export is complete, so a directory without one holds
+    an export that failed or is still in progress.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        /,
+        *,
+        export_format: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        if export_format is None:
+            export_format = default_format()
+        if export_format not in _EXTENSIONS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if export_format == FORMAT_PARQUET and pyarrow is None:
+            raise RuntimeError("Exporting to Parquet requires pyarrow to be installed.")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        # The tables of any earlier export are about to be replaced.
+        schema_path = self._directory / "schema.json"
+        if schema_path.exists():
+            schema_path.unlink()
+        self._format = export_format
+        self._batch_size = batch_size
+        self._writers = {
+            name: _TableWriter(self._directory, name, export_format) for name in TABLES
+        }
+        self._batches = {name: self._new_batch(name) for name in TABLES}
+        self._pending = dict.fromkeys(TABLES, 0)
+        self._row_counts = dict.fromkeys(TABLES, 0)
+        self._seen_configs: Set[str] = set()
+        self._closed = False
+
+    @property
+    def export_format(self) -> str:
+        return self._format
+
+    @property
+    def row_counts(self) -> Dict[str, int]:
+        return dict(self._row_counts)
+
+    @staticmethod
+    def _new_batch(name: str) -> List[Union[List[Optional[str]], array[int]]]:
+        return [_new_column(column_type) for _, column_type in TABLES[name]]
+
+    def _append(self, name: str, *values: Any) -> None:
+        batch = self._batches[name]
+        for column, value in zip(batch, values):
+            column.append(value)
+        self._pending[name] += 1
+        self._row_counts[name] += 1
+        if self._pending[name] >= self._batch_size:
+            self._flush(name)
+
+    def _flush(self, name: str) -> None:
+        if self._pending[name]:
+            self._writers[name].write(self._batches[name], self._pending[name])
+            self._batches[name] = self._new_batch(name)
+            self._pending[name] = 0
+
+    def _add_layers(self, manifest_digest: str, layers: Sequence[ImageLayerRef]) -> None:
+        for position, layer in enumerate(layers):
+            self._append(
+                "layers", manifest_digest, position, layer.digest, layer.content_type, layer.size
+            )
+
+    def _add_image(self, record: ImageRecord) -> None:
+        manifest = record.manifest
+        platform_images = {image.digest: image for image in record.platform_images}
+
+        if isinstance(manifest, ManifestList):
+            self._append(
+                "manifests",
+                manifest.digest,
+                record.repository,
+                manifest.content_type,
+                manifest.content_length,
+                None,
+                None,
+                None,
+            )
+            for ref in sorted(manifest.manifests, key=lambda ref: ref.platform_name):
+                image = platform_images.get(ref.digest)
+                self._append(
+                    "manifests",
+                    ref.digest,
+                    record.repository,
+                    ref.content_type,
+                    ref.size,
+                    manifest.digest,
+                    ref.platform_name,
+                    image.config.digest if image is not None else None,
+                )
+                if image is not None:
+                    self._add_layers(ref.digest, image.layers)
+            for artifact in sorted(manifest.artifacts, key=lambda ref: ref.digest):
+                self._append(
+                    "manifests",
+                    artifact.digest,
+                    record.repository,
+                    artifact.content_type,
+                    artifact.size,
+                    manifest.digest,
+                    None,
+                    None,
+                )
+        elif isinstance(manifest, Manifest):
+            image = platform_images.get(manifest.digest)
+            self._append(
+                "manifests",
+                manifest.digest,
+                record.repository,
+                manifest.content_type,
+                manifest.content_length,
+                None,
+                image.platform_name if image is not None else None,
+                manifest.config.digest,
+            )
+            self._add_layers(manifest.digest, manifest.layers)
+        elif isinstance(manifest, LegacyManifest):
+            self._append(
+                "manifests",
+                manifest.digest,
+                record.repository,
+                manifest.content_type,
+                manifest.content_length,
+                None,
+                None,
+                None,
+            )
+
+        for image in record.platform_images:
+            config = image.config
+            if config.digest in self._seen_configs:
+                continue
+            self._seen_configs.add(config.digest)
+            for position, item in enumerate(config.history):
+                self._append(
+                    "history",
+                    config.digest,
+                    position,
+                    item.created_at,
+                    item.created_by,
+                    item.empty_layer,
+                    item.comment,
+                )
+
+    def add_record(self, record: CrawlRecord, /) -> None:
+        if isinstance(record, RepositoryRecord):
+            self._append("repositories", record.repository, len(record.tags))
+        elif isinstance(record, TagRecord):
+            self._append("tags", record.repository, record.tag, record.digest)
+        elif isinstance(record, ImageRecord):
+            self._add_image(record)
+
+    def add_records(self, records: Iterable[CrawlRecord], /) -> None:
+        for record in records:
+            self.add_record(record)
+
+    def close(self) -> None:
+        """
+        Write out any remaining rows, along with the schema file, and close every table.
+        """
+        self._close(write_schema=True)
+
+    def _close(self, *, write_schema: bool) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            for name in TABLES:
+                self._flush(name)
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+        if not write_schema:
+            return
+
+        schema = {
+            "version": SCHEMA_VERSION,
+            "format": self._format,
+            "tables": {
+                name: {
+                    "file": self._writers[name].path.name,
+                    "rows": self._row_counts[name],
+                    "columns": [{"name": column, "type": type_} for column, type_ in columns],
+                }
+                for name, columns in TABLES.items()
+            },
+        }
+        schema_path = self._directory / "schema.json"
+        tmp_path = schema_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as schema_file:
+            json.dump(schema, schema_file, indent=2)
+        os.replace(tmp_path, schema_path)
+
+    def __enter__(self) -> CrawlExporter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        # An export that raised part-way through doesn't get a schema file.
+        self._close(write_schema=exc_type is None)
+
+
+def export_crawl(
+    records: Iterable[CrawlRecord],
+    directory: Union[str, Path],
+    /,
+    *,
+    export_format: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Export the records of a crawl to a directory, returning the number of rows in each table.
+    """
+    with CrawlExporter(directory, export_format=export_format, batch_size=batch_size) as exporter:
+        exporter.add_records(records)
+    return exporter.row_counts
+
+
+__all__ = (
+    "CrawlExporter",
+    "FORMAT_CSV",
+    "FORMAT_NDJSON",
+    "FORMAT_PARQUET",
+    "SCHEMA_VERSION",
+    "TABLES",
+    "default_format",
+    "export_crawl",
+)
@@ -3,15 +3,16 @@ from __future__ import annotations
 import dataclasses
 from typing import TYPE_CHECKING, AbstractSet, Iterable, Optional, Sequence
 
+from ._synth import synth_manifest_list_from_manifest
 from .manifest import (
     DigestMixin,
     ImageConfig,
     ImageLayerRef,
     Manifest,
     ManifestList,
-    ManifestRef,
     Platform,
 )
+from .store import ContentStore
 
 
 if TYPE_CHECKING:
@@ -46,11 +47,45 @@ class PlatformImage(DigestMixin):
 
 
 class Image:
-    def __init__(self, client: Client, repo: str, tag: str, manifest_list: ManifestList):
+    def __init__(
+        self,
+        client: Client,
+        repo: str,
+        tag: str,
+        manifest_list: Optional[ManifestList] = None,
+        *,
+        manifest: Optional[Manifest] = None,
+        store: Optional[ContentStore] = None,
+    ):
+        if (manifest_list is None) == (manifest is None):
+            raise ValueError("Must supply exactly one of manifest_list and manifest.")
+
         self._client: Client = client
         self._repo: str = repo
         self._tag: str = tag
-        self._manifest_list: ManifestList = manifest_list
+        self._manifest_list: Optional[ManifestList] = manifest_list
+        self._manifest: Optional[Manifest] = manifest
+        self._image_config: Optional[ImageConfig] = None
+        self._store: ContentStore = store if store is not None else ContentStore()
+
+    @classmethod
+    def from_manifest(
+        cls,
+        client: Client,
+        repo: str,
+        tag: str,
+        manifest: Manifest,
+        /,
+        *,
+        store: Optional[ContentStore] = None,
+    ) -> Image:
+        """
+        Build an image from a single platform manifest.
+
+        The manifest list for the image is only synthesised once something asks for it, as
+        doing so requires fetching the image config blob to learn which platform it's for.
+        """
+        return cls(client, repo, tag, manifest=manifest, store=store)
 
     @property
     def repo(self) -> str:
@@ -60,22 +95,38 @@ class Image:
     def tag(self) -> str:
         return self._tag
 
+    @property
+    def digest(self) -> str:
+        # The digest the tag actually points at. For single platform images, this is the digest
+        # of the manifest, rather than that of the synthesised manifest list.
+        if self._manifest is not None:
+            return self._manifest.digest
+        return self.manifest_list.digest
+
     @property
     def manifest_list(self) -> ManifestList:
+        if self._manifest_list is None:
+            if self._manifest is None:  # pragma: no cover
+                raise TypeError("Synthesising manifest list failed.")
+            image_config = self._get_image_config(self._manifest.config.digest)
+            self._manifest_list = synth_manifest_list_from_manifest(self._manifest, image_config)
+            # Keeps the config alive in the store, as it's almost always needed again.
+            self._image_config = image_config
+
         return self._manifest_list
 
     @property
     def platforms(self) -> AbstractSet[Platform]:
-        return frozenset(
-            map(
-                lambda manifest_ref: manifest_ref.platform,
-                self._manifest_list.manifests,
-            )
+        return self.manifest_list.platforms
+
+    def _get_image_config(self, digest: str) -> ImageConfig:
+        return self._store.image_config(
+            digest, lambda: self._client.get_image_config_blob(self._repo, digest)
         )
 
     def get_platform_image(self, platform: Platform, /) -> PlatformImage:
         manifest = self.fetch_manifest_by_platform(platform)
-        config = self._client.get_image_config_blob(self._repo, manifest.config.digest)
+        config = self._get_image_config(manifest.config.digest)
         return PlatformImage(
             digest=manifest.digest,
             config=config,
@@ -87,19 +138,19 @@ class Image:
             yield self.get_platform_image(platform)
 
     def _fetch_manifest(self, digest: str, errmsg: str) -> Manifest:
-        manifest = self._client.get_manifest(self._repo, digest)
+        if self._manifest is not None and self._manifest.digest == digest:
+            return self._manifest
+
+        manifest = self._store.manifest(
+            digest, lambda: self._client.get_manifest(self._repo, digest), repository=self._repo
+        )
         if not isinstance(manifest, Manifest):
             raise UnexpectedImageManifestError(digest, errmsg)
 
         return manifest
 
     def fetch_manifest_by_platform_name(self, platform_name: str, /) -> Manifest:
-        matching_manifest_ref: Optional[ManifestRef] = None
-        for manifest_ref in self._manifest_list.manifests:
-            if manifest_ref.platform_name == platform_name:
-                matching_manifest_ref = manifest_ref
-                break
-
+        matching_manifest_ref = self.manifest_list.find_by_platform_name(platform_name)
         if matching_manifest_ref is None:
             raise UnavailableImagePlatformError(
                 Platform.from_name(platform_name),
@@ -112,12 +163,7 @@ class Image:
         )
 
     def fetch_manifest_by_platform(self, platform: Platform, /) -> Manifest:
-        matching_manifest_ref: Optional[ManifestRef] = None
-        for manifest_ref in self._manifest_list.manifests:
-            if manifest_ref.platform == platform:
-                matching_manifest_ref = manifest_ref
-                break
-
+        matching_manifest_ref = self.manifest_list.find_by_platform(platform)
         if matching_manifest_ref is None:
             raise UnavailableImagePlatformError(
                 platform,
@@ -0,0 +1,527 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from .crawl import (
+    STAGE_HEADS,
+    CrawlFailure,
+    ImageRecord,
+    RegistryCrawler,
+    RepositoryRecord,
+    TagRecord,
+)
+from .manifest import LegacyManifest, ManifestList
+from .registry import Registry
+
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    name TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tags (
+    repository TEXT NOT NULL REFERENCES repositories (name) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (repository, tag)
+);
+CREATE INDEX IF NOT EXISTS tags_digest ON tags (digest);
+CREATE TABLE IF NOT EXISTS manifests (
+    digest TEXT PRIMARY KEY,
+    content_type TEXT NOT NULL,
+    content_length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS manifest_list_entries (
+    list_digest TEXT NOT NULL REFERENCES manifests (digest) ON DELETE CASCADE,
+    platform TEXT NOT NULL,
+    manifest_digest TEXT NOT NULL,
+    PRIMARY KEY (list_digest, platform)
+);
+CREATE INDEX IF NOT EXISTS manifest_list_entries_manifest
+    ON manifest_list_entries (manifest_digest);
+CREATE TABLE IF NOT EXISTS images (
+    manifest_digest TEXT PRIMARY KEY,
+    config_digest TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    image_size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_config ON images (config_digest);
+CREATE INDEX IF NOT EXISTS images_platform ON images (platform);
+CREATE TABLE IF NOT EXISTS layers (
+    manifest_digest TEXT NOT NULL REFERENCES images (manifest_digest) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (manifest_digest, position)
+);
+CREATE INDEX IF NOT EXISTS layers_digest ON layers (digest);
+CREATE TABLE IF NOT EXISTS config_attributes (
+    config_digest TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (config_digest, kind, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS config_attributes_key_value
+    ON config_attributes (kind, key, value);
+"""
+
+# Scripts upgrading the schema from each older version to the next.
+_MIGRATIONS = {
+    # Version 1 didn't index image config attributes. Forgetting the manifests and images makes
+    # the next sync fetch them again, indexing their configs. Tags are kept.
+    1: """
+    DELETE FROM images;
+    DELETE FROM manifests;
+    """,
+}
+
+ATTRIBUTE_LABEL = "label"
+ATTRIBUTE_ENV = "env"
+ATTRIBUTE_ENTRYPOINT = "entrypoint"
+
+
+def _config_attributes(config: Mapping[str, Any]) -> Iterator[Tuple[str, str, str]]:
+    # Extracts the searchable (kind, key, value) attributes from the config section of an
+    # image config blob.
+    for name, value in (config.get("Labels") or {}).items():
+        yield ATTRIBUTE_LABEL, name, str(value)
+    for variable in config.get("Env") or ():
+        name, _, value = variable.partition("=")
+        yield ATTRIBUTE_ENV, name, value
+    entrypoint = config.get("Entrypoint")
+    if entrypoint:
+        yield ATTRIBUTE_ENTRYPOINT, "", " ".join(entrypoint)
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    # The smallest string greater than every string starting with the prefix.
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+@dataclass(frozen=True)
+class ImageReference:
+    repository: str
+    tag: str
+    platform: str
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    repositories: int
+    removed_repositories: int
+    checked_tags: int
+    removed_tags: int
+    new_images: int
+    failures: Sequence[CrawlFailure] = field(repr=False)
+
+
+class Inventory:
+    """
+    A local SQLite database of the repositories, tags and images in a registry.
+
+    The database records which digest each tag points at, the manifest of each digest, and the
+    platform, creation time, config and layers of each platform specific image. The labels,
+    environment variables and entrypoint of each image config are indexed for searching.
+    """
+
+    def __init__(self, path: Union[str, Path], /) -> None:
+        self._connection = sqlite3.connect(str(path))
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError("Unsupported inventory schema version.")
+        # A new database (version 0) gets the latest schema without any migrations. Everything
+        # runs in one transaction, so a failed upgrade leaves the database as it was.
+        migrations = [
+            _MIGRATIONS[from_version]
+            for from_version in range(version or SCHEMA_VERSION, SCHEMA_VERSION)
+        ]
+        if migrations:
+            logger.info("Upgrading inventory schema from version %d", version)
+        self._connection.executescript(
+            "BEGIN;"
+            + _SCHEMA
+            + "".join(migrations)
+            + f"PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;"
+        )
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._connection
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> Inventory:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def repositories(self) -> Sequence[str]:
+        rows = self._connection.execute("SELECT name FROM repositories ORDER BY name")
+        return tuple(name for (name,) in rows)
+
+    def tags(self, repository: str, /) -> Mapping[str, str]:
+        rows = self._connection.execute(
+            "SELECT tag, digest FROM tags WHERE repository = ? ORDER BY tag", (repository,)
+        )
+        return dict(rows.fetchall())
+
+    def known_digests(self) -> Set[str]:
+        return {digest for (digest,) in self._connection.execute("SELECT digest FROM manifests")}
+
+    def platforms(self, digest: str, /) -> Sequence[str]:
+        """
+        Return the platforms available for the image with the given digest.
+        """
+        rows = self._connection.execute(
+            """
+            SELECT platform FROM manifest_list_entries WHERE list_digest = ?
+            UNION
+            SELECT platform FROM images WHERE manifest_digest = ?
+            ORDER BY platform
+            """,
+            (digest, digest),
+        )
+        return tuple(platform for (platform,) in rows)
+
+    def layers(self, manifest_digest: str, /) -> Sequence[Tuple[str, int]]:
+        rows = self._connection.execute(
+            "SELECT digest, size FROM layers WHERE manifest_digest = ? ORDER BY position",
+            (manifest_digest,),
+        )
+        return tuple(rows.fetchall())
+
+    def _find_tagged(self, containing: str, params: Mapping[str, str]) -> Sequence[ImageReference]:
+        # The containing query selects the digests of platform specific manifests, which are
+        # matched to tags either directly or through the manifest lists they're in.
+        rows = self._connection.execute(
+            f"""
+            WITH containing (manifest_digest) AS ({containing})
+            SELECT tags.repository, tags.tag, images.platform
+            FROM containing
+            JOIN images ON images.manifest_digest = containing.manifest_digest
+            JOIN tags ON tags.digest = containing.manifest_digest
+            UNION
+            SELECT tags.repository, tags.tag, entries.platform
+            FROM containing
+            JOIN manifest_list_entries AS entries
+                ON entries.manifest_digest = containing.manifest_digest
+            JOIN tags ON tags.digest = entries.list_digest
+            ORDER BY 1, 2, 3
+            """,
+            params,
+        )
+        return tuple(ImageReference(*row) for row in rows)
+
+    def find_blob(self, digest: str, /) -> Sequence[ImageReference]:
+        """
+        Find every tag with an image containing the given layer or config blob.
+
+        Tags pointing at manifest lists are matched through each of the manifests in the list,
+        and each match includes the platform of the image containing the blob.
+        """
+        return self._find_tagged(
+            """
+            SELECT manifest_digest FROM layers WHERE digest = :digest
+            UNION
+            SELECT manifest_digest FROM images WHERE config_digest = :digest
+            """,
+            {"digest": digest},
+        )
+
+    def _find_by_attribute(
+        self, kind: str, key: str, value: Optional[str], prefix: bool
+    ) -> Sequence[ImageReference]:
+        params = {"kind": kind, "key": key}
+        if value is None:
+            condition = ""
+        elif prefix and value:
+            condition = "AND value >= :value AND value < :upper"
+            params["value"] = value
+            params["upper"] = _prefix_upper_bound(value)
+        elif prefix:
+            condition = ""
+        else:
+            condition = "AND value = :value"
+            params["value"] = value
+
+        return self._find_tagged(
+            f"""
+            SELECT images.manifest_digest FROM config_attributes
+            JOIN images ON images.config_digest = config_attributes.config_digest
+            WHERE kind = :kind AND key = :key {condition}
+            """,
+            params,
+        )
+
+    def find_by_label(
+        self, name: str, value: Optional[str] = None, /, *, prefix: bool = False
+    ) -> Sequence[ImageReference]:
+        """
+        Find every tag with an image that has the given label.
+
+        When a value is supplied, only images where the label has that value are matched, or
+        where the label's value starts with it if prefix is set.
+        """
+        return self._find_by_attribute(ATTRIBUTE_LABEL, name, value, prefix)
+
+    def find_by_env(
+        self, name: str, value: Optional[str] = None, /, *, prefix: bool = False
+    ) -> Sequence[ImageReference]:
+        """
+        Find every tag with an image that sets the given environment variable, optionally
+        matching its value in the same way as find_by_label().
+        """
+        return self._find_by_attribute(ATTRIBUTE_ENV, name, value, prefix)
+
+    def find_by_entrypoint(
+        self, entrypoint: str, /, *, prefix: bool = False
+    ) -> Sequence[ImageReference]:
+        """
+        Find every tag with an image using the given entrypoint, with its arguments separated by
+        spaces. If prefix is set, entrypoints starting with the given value are also matched.
+        """
+        return self._find_by_attribute(ATTRIBUTE_ENTRYPOINT, "", entrypoint, prefix)
+
+    def prune(self) -> int:
+        """
+        Remove manifests and images that no tag refers to any more, returning how many manifests
+        were removed.
+        """
+        with self._connection:
+            removed = self._connection.execute(
+                "DELETE FROM manifests WHERE digest NOT IN (SELECT digest FROM tags)"
+            ).rowcount
+            self._connection.execute(
+                """
+                DELETE FROM images WHERE manifest_digest NOT IN (
+                    SELECT digest FROM tags
+                    UNION
+                    SELECT manifest_digest FROM manifest_list_entries
+                )
+                """
+            )
+            self._connection.execute(
+                "DELETE FROM config_attributes "
+                "WHERE config_digest NOT IN (SELECT config_digest FROM images)"
+            )
+        return removed
+
+    def _record_repository(
+        self, record: RepositoryRecord, existing_tags: Mapping[str, str], synced_at: float
+    ) -> int:
+        self._connection.execute(
+            "INSERT INTO repositories (name, synced_at) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET synced_at = excluded.synced_at",
+            (record.repository, synced_at),
+        )
+        listed = set(record.tags)
+        removed = [tag for tag in existing_tags if tag not in listed]
+        self._connection.executemany(
+            "DELETE FROM tags WHERE repository = ? AND tag = ?",
+            ((record.repository, tag) for tag in removed),
+        )
+        return len(removed)
+
+    def _record_tag(self, record: TagRecord) -> None:
+        self._connection.execute(
+            "INSERT INTO tags (repository, tag, digest) VALUES (?, ?, ?) "
+            "ON CONFLICT (repository, tag) DO UPDATE SET digest = excluded.digest",
+            (record.repository, record.tag, record.digest),
+        )
+
+    def _record_image(self, record: ImageRecord) -> None:
+        manifest = record.manifest
+        self._connection.execute(
+            "INSERT OR REPLACE INTO manifests (digest, content_type, content_length) "
+            "VALUES (?, ?, ?)",
+            (manifest.digest, manifest.content_type, manifest.content_length),
+        )
+        if isinstance(manifest, ManifestList):
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO manifest_list_entries "
+                "(list_digest, platform, manifest_digest) VALUES (?, ?, ?)",
+                ((manifest.digest, ref.platform_name, ref.digest) for ref in manifest.manifests),
+            )
+        elif isinstance(manifest, LegacyManifest):
+            return
+
+        for image in record.platform_images:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO images "
+                "(manifest_digest, config_digest, platform, created_at, image_size) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    image.digest,
+                    image.config.digest,
+                    image.platform_name,
+                    image.config.created_at,
+                    image.image_size,
+                ),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO layers (manifest_digest, position, digest, size) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (image.digest, position, layer.digest, layer.size)
+                    for position, layer in enumerate(image.layers)
+                ),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO config_attributes (config_digest, kind, key, value) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    (image.config.digest, kind, key, value)
+                    for kind, key, value in _config_attributes(image.config.config)
+                ),
+            )
+
+    def sync(
+        self,
+        registry: Registry,
+        /,
+        *,
+        repositories: Optional[Iterable[str]] = None,
+        skip_known_tags: bool = False,
+        commit_interval: int = 1000,
+        tag_concurrency: int = 4,
+        head_concurrency: int = 16,
+        image_concurrency: int = 8,
+    ) -> SyncResult:
+        """
+        Bring the inventory up to date with a registry.
+
+        The tags of every repository are listed and resolved to digests with HEAD requests, so
+        that tags that have moved are updated. Manifests and image configs are only fetched for
+        digests that aren't already in the inventory. When skip_known_tags is set, tags already in
+        the inventory aren't resolved again, which makes syncs cheaper but misses moved tags.
+        Tags that are listed but no longer resolve to a digest are removed from the inventory.
+
+        When no repositories are specified, the registry's full catalog is synced, and any
+        repositories no longer in the catalog are removed from the inventory.
+        """
+        known_digests = self.known_digests()
+        # The tags of each repository as they were before it was listed.
+        existing_tags: Dict[str, Mapping[str, str]] = {}
+        # Tags already in the inventory that are being resolved again, and haven't been yet.
+        unresolved: Dict[str, Set[str]] = {}
+
+        def select_tags(repository: str, tags: Sequence[str]) -> Iterable[str]:
+            known = existing_tags.pop(repository, {})
+            # Tags pointing at digests that couldn't be fetched last time are resolved again.
+            selected = [tag for tag in tags if known.get(tag) not in known_digests]
+            unresolved[repository].intersection_update(selected)
+            return selected
+
+        crawler = RegistryCrawler(
+            registry,
+            tag_concurrency=tag_concurrency,
+            head_concurrency=head_concurrency,
+            image_concurrency=image_concurrency,
+            known_digests=known_digests,
+            select_tags=select_tags if skip_known_tags else None,
+        )
+
+        if repositories is None:
+            names: List[str] = list(registry.client.iter_catalog())
+        else:
+            names = list(repositories)
+
+        synced_at = time.time()
+        seen_repositories: Set[str] = set()
+        failures: List[CrawlFailure] = []
+        checked_tags = removed_tags = new_images = 0
+        uncommitted = 0
+        try:
+            for record in crawler.crawl(names):
+                if isinstance(record, RepositoryRecord):
+                    seen_repositories.add(record.repository)
+                    tags = self.tags(record.repository)
+                    if skip_known_tags:
+                        existing_tags[record.repository] = tags
+                    removed_tags += self._record_repository(record, tags, synced_at)
+                    unresolved[record.repository] = set(tags).intersection(record.tags)
+                elif isinstance(record, TagRecord):
+                    checked_tags += 1
+                    unresolved[record.repository].discard(record.tag)
+                    self._record_tag(record)
+                elif isinstance(record, ImageRecord):
+                    new_images += 1
+                    self._record_image(record)
+                else:
+                    if record.stage == STAGE_HEADS and record.reference is not None:
+                        # The tag may still exist, so it's left as it was.
+                        unresolved[record.repository].discard(record.reference)
+                    failures.append(record)
+
+                uncommitted += 1
+                if uncommitted >= commit_interval:
+                    self._connection.commit()
+                    uncommitted = 0
+
+            # These tags were deleted after being listed, or no longer report a digest.
+            self._connection.executemany(
+                "DELETE FROM tags WHERE repository = ? AND tag = ?",
+                ((name, tag) for name, gone in unresolved.items() for tag in gone),
+            )
+            removed_tags += sum(map(len, unresolved.values()))
+
+            removed_repositories = 0
+            if repositories is None:
+                listed = set(names)
+                removed = [name for name in self.repositories() if name not in listed]
+                self._connection.executemany(
+                    "DELETE FROM repositories WHERE name = ?", ((name,) for name in removed)
+                )
+                removed_repositories = len(removed)
+        finally:
+            self._connection.commit()
+
+        logger.info(
+            "Synced %d repositories, resolving %d tags and fetching %d images",
+            len(seen_repositories),
+            checked_tags,
+            new_images,
+        )
+        return SyncResult(
+            repositories=len(seen_repositories),
+            removed_repositories=removed_repositories,
+            checked_tags=checked_tags,
+            removed_tags=removed_tags,
+            new_images=new_images,
+            failures=tuple(failures),
+        )
+
+
+__all__ = (
+    "ImageReference",
+    "Inventory",
+    "SyncResult",
+)
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass, field
 from typing import (
     TYPE_CHECKING,
     AbstractSet,
     Any,
+    Dict,
     Iterable,
     List,
     Mapping,
@@ -12,14 +14,18 @@ from typing import (
     Protocol,
     Sequence,
     Set,
+    Tuple,
     Union,
+    overload,
 )
 
+from ._digest import compute_digest, digest_algorithm
 from .schemas import (
+    image_manifest_content_types,
     known_manifest_content_types,
     legacy_manifest_content_types,
-    schema_2,
-    schema_2_list,
+    manifest_list_content_types,
+    oci_content_types,
 )
 
 
@@ -50,6 +56,21 @@ class DigestMixin:
         return self.digest[7:19]
 
 
+class HasRawContentProtocol(Protocol):
+    @property
+    def raw_content(self) -> Optional[bytes]:
+        ...
+
+
+class RawContentMixin:
+    @property
+    def raw_content_view(self: HasRawContentProtocol) -> Optional[memoryview]:
+        # Gives access to the original payload without copying it, when it was retained.
+        if self.raw_content is None:
+            return None
+        return memoryview(self.raw_content)
+
+
 @dataclass(frozen=True)
 class Platform:
     os: str
@@ -158,7 +179,72 @@ class UnusableImageConfigBlobPayloadError(Exception):
         self.payload = payload
 
 
-def parse_image_config_blob_response(response: Response) -> ImageConfig:
+def _parse_image_history(history_data: Iterable[Mapping[str, Any]]) -> Tuple[ImageHistoryItem, ...]:
+    history_items: List[ImageHistoryItem] = []
+    for history_item_data in history_data:
+        empty_layer = history_item_data.get("empty_layer", False)
+        comment = history_item_data.get("comment", "")
+
+        history_items.append(
+            ImageHistoryItem(
+                created_at=history_item_data["created"],
+                created_by=history_item_data["created_by"],
+                empty_layer=empty_layer,
+                comment=comment,
+            )
+        )
+
+    return tuple(history_items)
+
+
+class _LazyImageHistory(Sequence[ImageHistoryItem]):
+    # Holds the decoded history of an image config, and only builds the history items the
+    # first time they're needed.
+    def __init__(self, history_data: Iterable[Mapping[str, Any]]):
+        self._history_data: Iterable[Mapping[str, Any]] = history_data
+        self._history: Optional[Tuple[ImageHistoryItem, ...]] = None
+
+    @property
+    def _items(self) -> Tuple[ImageHistoryItem, ...]:
+        if self._history is None:
+            self._history = _parse_image_history(self._history_data)
+        return self._history
+
+    @overload
+    def __getitem__(self, index: int) -> ImageHistoryItem:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> Sequence[ImageHistoryItem]:
+        ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[ImageHistoryItem, Sequence[ImageHistoryItem]]:
+        return self._items[index]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _LazyImageHistory):
+            return self._items == other._items
+        if isinstance(other, tuple):
+            return self._items == other
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+def parse_image_config_blob_response(response: Response, *, lazy: bool = False) -> ImageConfig:
+    """
+    Parse an image config blob response into an ImageConfig object.
+
+    In lazy mode, the history items are only built the first time the history is accessed, which
+    saves most of the parsing work for callers that only need the creation time or platform. The
+    payload is decoded the same way in both modes, as the creation time and platform are needed
+    straight away, and config and rootfs are the decoded mappings themselves.
+    """
     digest = response.headers.get("Docker-Content-Digest")
     if not digest:
         raise UnusableImageConfigBlobResponseError(
@@ -183,26 +269,18 @@ def parse_image_config_blob_response(response: Response) -> ImageConfig:
             response, data, "Non-dictionary payload returned."
         )
 
-    history_items: List[ImageHistoryItem] = []
-    for history_item_data in data["history"]:
-        empty_layer = history_item_data.get("empty_layer", False)
-        comment = history_item_data.get("comment", "")
-
-        history_items.append(
-            ImageHistoryItem(
-                created_at=history_item_data["created"],
-                created_by=history_item_data["created_by"],
-                empty_layer=empty_layer,
-                comment=comment,
-            )
-        )
+    history: Sequence[ImageHistoryItem]
+    if lazy:
+        history = _LazyImageHistory(data["history"])
+    else:
+        history = _parse_image_history(data["history"])
 
     return ImageConfig(
         digest=digest,
         content_length=content_length,
         created_at=data["created"],
         config=data["config"],
-        history=tuple(history_items),
+        history=history,
         rootfs=data["rootfs"],
         platform=Platform.extract(data),
     )
@@ -223,12 +301,13 @@ class ImageConfigRef(DigestMixin):
 
 
 @dataclass(frozen=True)
-class Manifest(DigestMixin):
+class Manifest(DigestMixin, RawContentMixin):
     digest: str
     content_type: str
     content_length: int
     config: ImageConfigRef = field(compare=False, repr=False)
     layers: Sequence[ImageLayerRef] = field(compare=False, repr=False)
+    raw_content: Optional[bytes] = field(default=None, compare=False, repr=False)
 
     @property
     def image_size(self) -> int:
@@ -248,19 +327,66 @@ class ManifestRef(DigestMixin):
 
 
 @dataclass(frozen=True)
-class ManifestList(DigestMixin):
+class ArtifactRef(DigestMixin):
+    # An entry in an OCI index that doesn't declare a platform, such as an attestation, another
+    # artifact or a nested index.
+    digest: str
+    content_type: str
+    size: int
+
+
+@dataclass(frozen=True)
+class ManifestList(DigestMixin, RawContentMixin):
     digest: str
     content_type: str
     content_length: int
     manifests: AbstractSet[ManifestRef] = field(compare=False, repr=False)
+    raw_content: Optional[bytes] = field(default=None, compare=False, repr=False)
+    artifacts: AbstractSet[ArtifactRef] = field(default=frozenset(), compare=False, repr=False)
+    _refs_by_platform: Mapping[Platform, ManifestRef] = field(init=False, compare=False, repr=False)
+    _refs_by_platform_name: Mapping[str, ManifestRef] = field(init=False, compare=False, repr=False)
+    _platforms: AbstractSet[Platform] = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Index the manifest references once up front, so that platform lookups don't
+        # need to scan the full set of references every time.
+        refs_by_platform: Dict[Platform, ManifestRef] = {}
+        refs_by_platform_name: Dict[str, ManifestRef] = {}
+        for manifest_ref in self.manifests:
+            refs_by_platform.setdefault(manifest_ref.platform, manifest_ref)
+            refs_by_platform_name.setdefault(manifest_ref.platform_name, manifest_ref)
+
+        object.__setattr__(self, "_refs_by_platform", refs_by_platform)
+        object.__setattr__(self, "_refs_by_platform_name", refs_by_platform_name)
+        object.__setattr__(self, "_platforms", frozenset(refs_by_platform))
+
+    @property
+    def platforms(self) -> AbstractSet[Platform]:
+        return self._platforms
+
+    def find_by_platform(self, platform: Platform, /) -> Optional[ManifestRef]:
+        return self._refs_by_platform.get(platform)
+
+    def find_by_platform_name(self, platform_name: str, /) -> Optional[ManifestRef]:
+        return self._refs_by_platform_name.get(platform_name)
+
+    @property
+    def referenced_digests(self) -> Sequence[str]:
+        """
+        The digests of everything the list refers to, platform specific or not, in a stable order.
+        """
+        return tuple(sorted(ref.digest for ref in self.manifests)) + tuple(
+            sorted(ref.digest for ref in self.artifacts)
+        )
 
 
 @dataclass(frozen=True)
-class LegacyManifest(DigestMixin):
+class LegacyManifest(DigestMixin, RawContentMixin):
     digest: str
     content_type: str
     content_length: int
     content: Mapping[str, Any] = field(compare=False, repr=False)
+    raw_content: Optional[bytes] = field(default=None, compare=False, repr=False)
 
 
 class UnusableManifestResponseError(Exception):
@@ -276,10 +402,51 @@ class UnusableManifestPayloadError(Exception):
         self.payload = payload
 
 
+class ManifestDigestMismatchError(UnusableManifestResponseError):
+    def __init__(self, response: Response, expected_digest: str, actual_digest: str, message: str):
+        super().__init__(response, message)
+        self.expected_digest = expected_digest
+        self.actual_digest = actual_digest
+
+
 ManifestParseOutput = Union[ManifestList, Manifest, LegacyManifest]
 
 
-def parse_manifest_response(response: Response) -> ManifestParseOutput:
+def _verify_manifest_digest(response: Response, content: bytes, expected_digest: str) -> None:
+    algorithm = digest_algorithm(expected_digest)
+    try:
+        actual_digest = compute_digest(content, algorithm)
+    except ValueError as exc:
+        raise UnusableManifestResponseError(
+            response, "Unsupported digest algorithm specified."
+        ) from exc
+
+    if actual_digest != expected_digest:
+        raise ManifestDigestMismatchError(
+            response,
+            expected_digest,
+            actual_digest,
+            "Digest of payload does not match the expected digest.",
+        )
+
+
+def parse_manifest_response(
+    response: Response,
+    *,
+    verify_digest: bool = False,
+    expected_digest: Optional[str] = None,
+    retain_content: bool = False,
+) -> ManifestParseOutput:
+    """
+    Parse a manifest response into a manifest object.
+
+    When verify_digest is set, the raw payload is hashed and compared against the digest in the
+    response headers. Supplying expected_digest also verifies the payload, comparing it against
+    both digests. The same bytes are then decoded, so the payload is only ever read once.
+
+    When retain_content is set, the raw payload is kept on the returned object as-is, so that it
+    can be stored or pushed elsewhere without changing its digest.
+    """
     content_type = response.headers.get("Content-Type")
     if content_type not in known_manifest_content_types:
         raise UnusableManifestResponseError(response, "Unknown Content-Type header in response.")
@@ -299,7 +466,19 @@ def parse_manifest_response(response: Response) -> ManifestParseOutput:
             "Invalid content length specified in response headers.",
         ) from exc
 
-    data = response.json()
+    verify_digest = verify_digest or expected_digest is not None
+    raw_content: Optional[bytes] = None
+    if verify_digest or retain_content:
+        content = response.content
+        if verify_digest:
+            _verify_manifest_digest(response, content, digest)
+            if expected_digest is not None and expected_digest != digest:
+                _verify_manifest_digest(response, content, expected_digest)
+        if retain_content:
+            raw_content = content
+        data = json.loads(content)
+    else:
+        data = response.json()
     if not isinstance(data, dict):
         raise UnusableManifestPayloadError(response, data, "Non-dictionary payload returned.")
 
@@ -309,17 +488,22 @@ def parse_manifest_response(response: Response) -> ManifestParseOutput:
             content_type=content_type,
             content_length=content_length,
             content=data,
+            raw_content=raw_content,
         )
 
     if data.get("schemaVersion") != 2:
         raise UnusableManifestPayloadError(response, data, "Unknown schema version in payload.")
 
-    if content_type == schema_2:
-        if data.get("mediaType") != content_type:
-            raise UnusableManifestPayloadError(
-                response, data, "Mismatched media type between headers and payload."
-            )
+    # The mediaType property is optional for OCI manifests and indexes.
+    payload_media_type = data.get("mediaType")
+    if payload_media_type is None and content_type in oci_content_types:
+        payload_media_type = content_type
+    if payload_media_type != content_type:
+        raise UnusableManifestPayloadError(
+            response, data, "Mismatched media type between headers and payload."
+        )
 
+    if content_type in image_manifest_content_types:
         config_data = data["config"]
         layers_data = data["layers"]
 
@@ -345,24 +529,34 @@ def parse_manifest_response(response: Response) -> ManifestParseOutput:
             content_length=content_length,
             config=config,
             layers=tuple(layers),
+            raw_content=raw_content,
         )
 
-    if content_type == schema_2_list:
-        if data.get("mediaType") != content_type:
-            raise UnusableManifestPayloadError(
-                response, data, "Mismatched media type between headers and payload."
-            )
-
+    if content_type in manifest_list_content_types:
         manifests_data = data["manifests"]
 
         manifests: Set[ManifestRef] = set()
+        artifacts: Set[ArtifactRef] = set()
         for manifest_data in manifests_data:
+            # OCI indexes can reference things other than platform-specific images (such as
+            # nested indexes or artifacts), which don't need to declare a platform.
+            platform_data = manifest_data.get("platform")
+            if platform_data is None:
+                artifacts.add(
+                    ArtifactRef(
+                        digest=manifest_data["digest"],
+                        content_type=manifest_data["mediaType"],
+                        size=manifest_data["size"],
+                    )
+                )
+                continue
+
             manifests.add(
                 ManifestRef(
                     digest=manifest_data["digest"],
                     content_type=manifest_data["mediaType"],
                     size=manifest_data["size"],
-                    platform=Platform.extract(manifest_data["platform"]),
+                    platform=Platform.extract(platform_data),
                 )
             )
 
@@ -371,6 +565,8 @@ def parse_manifest_response(response: Response) -> ManifestParseOutput:
             content_type=content_type,
             content_length=content_length,
             manifests=frozenset(manifests),
+            raw_content=raw_content,
+            artifacts=frozenset(artifacts),
         )
 
     raise UnusableManifestResponseError(
@@ -379,6 +575,7 @@ def parse_manifest_response(response: Response) -> ManifestParseOutput:
 
 
 __all__ = (
+    "ArtifactRef",
     "ImageConfig",
     "ImageConfigRef",
     "ImageHistoryItem",
@@ -386,6 +583,7 @@ __all__ = (
     "InvalidPlatformNameError",
     "LegacyManifest",
     "Manifest",
+    "ManifestDigestMismatchError",
     "ManifestList",
     "ManifestRef",
     "Platform",
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+import requests
+
+from ._concurrency import bounded_map
+from .auth_service import AuthServiceFailure
+from .registry import Registry
+from .repository import DEFAULT_MAX_CONCURRENCY
+
+
+DEFAULT_TAG = "latest"
+
+
+@dataclass(frozen=True)
+class ParsedReference:
+    # The registry host, when the reference included one.
+    host: Optional[str]
+    repository: str
+    tag: Optional[str]
+    digest: Optional[str]
+
+    @property
+    def reference(self) -> str:
+        # A digest identifies an image more precisely than a tag, so it takes precedence.
+        return self.digest or self.tag or DEFAULT_TAG
+
+
+@dataclass(frozen=True)
+class ReferenceResolution:
+    reference: str
+    digest: Optional[str]
+    error: Optional[Exception] = field(default=None, compare=False)
+
+
+def parse_reference(reference: str, /) -> ParsedReference:
+    """
+    Parse an image reference, such as ``registry.example.com/ns/app:1.0`` or ``app@sha256:...``.
+
+    The first path component is treated as a registry host when it contains a dot or a colon,
+    or is ``localhost``, following the same rules as Docker.
+    """
+    name, _, digest = reference.strip().partition("@")
+    tag: Optional[str] = None
+    head, sep, tail = name.rpartition(":")
+    if sep and "/" not in tail:
+        name, tag = head, tail
+
+    host: Optional[str] = None
+    first, sep, rest = name.partition("/")
+    if sep and ("." in first or ":" in first or first == "localhost"):
+        host, name = first, rest
+
+    if not name or tag == "" or (sep and not rest):
+        raise ValueError(f"Invalid image reference: {reference}")
+    return ParsedReference(host=host, repository=name, tag=tag, digest=digest or None)
+
+
+def resolve_references(
+    registry: Registry,
+    references: Iterable[str],
+    /,
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ordered: bool = True,
+) -> Iterator[ReferenceResolution]:
+    """
+    Resolve many image references to digests, using concurrent HEAD requests.
+
+    Every reference is resolved against the given registry, ignoring any registry host it
+    includes. References are read lazily, so that a long stream of them can be resolved while
+    it's still being produced. Results are yielded in the same order as the references, unless
+    ordered is turned off, in which case they're yielded as soon as they're available.
+
+    Problems with individual references, such as references that don't parse or requests
+    that fail, are reported in their result rather than raised. The digest is None when the
+    reference doesn't exist.
+    """
+
+    def resolve(reference: str) -> ReferenceResolution:
+        try:
+            parsed = parse_reference(reference)
+            repository = registry.repository(parsed.repository)
+            digest = repository.check_manifest(parsed.reference)
+        except (ValueError, requests.RequestException, AuthServiceFailure) as exc:
+            return ReferenceResolution(reference, None, exc)
+        return ReferenceResolution(reference, digest)
+
+    for _, resolution in bounded_map(
+        resolve, references, max_concurrency=max_concurrency, ordered=ordered
+    ):
+        yield resolution
+
+
+__all__ = (
+    "ParsedReference",
+    "ReferenceResolution",
+    "parse_reference",
+    "resolve_references",
+)
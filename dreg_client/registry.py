@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING, Dict, Mapping, Optional, Sequence
 
 from .client import Client
 from .repository import Repository
+from .store import ContentStore
 
 
 if TYPE_CHECKING:
@@ -14,8 +15,9 @@ if TYPE_CHECKING:
 
 
 class Registry:
-    def __init__(self, client: Client, /) -> None:
+    def __init__(self, client: Client, /, *, store: Optional[ContentStore] = None) -> None:
         self._client: Client = client
+        self._store: ContentStore = store if store is not None else ContentStore()
         self._repositories: Dict[str, Repository] = {}
         self._repositories_by_namespace: Dict[str, Dict[str, Repository]] = {}
 
@@ -36,6 +38,14 @@ class Registry:
     ) -> Registry:
         return cls(Client.build_with_session(base_url, auth=auth, auth_service=auth_service))
 
+    @property
+    def client(self) -> Client:
+        return self._client
+
+    @property
+    def store(self) -> ContentStore:
+        return self._store
+
     def namespaces(self) -> Sequence[str]:
         if not self._repositories:
             self.refresh()
@@ -56,7 +66,7 @@ class Registry:
         try:
             return self._repositories[name]
         except KeyError:
-            return Repository(self._client, repository, namespace=namespace)
+            return Repository(self._client, repository, namespace=namespace, store=self._store)
 
     def repositories(self, namespace: Optional[str] = None) -> Mapping[str, Repository]:
         if not self._repositories:
@@ -78,7 +88,7 @@ class Registry:
                 ns = None
                 repo = name
 
-            r = Repository(self._client, repo, namespace=ns)
+            r = Repository(self._client, repo, namespace=ns, store=self._store)
 
             if ns is None:
                 ns = "library"
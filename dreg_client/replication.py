@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import AbstractSet, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from ._concurrency import bounded_map
+from .cleanup import manifest_blobs
+from .manifest import LegacyManifest, Manifest, ManifestParseOutput, Platform
+from .repository import DEFAULT_MAX_CONCURRENCY, LegacyImageRequestError, Repository
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ReplicationResult:
+    digest: str
+    pushed_manifests: Sequence[str]
+    existing_blobs: Sequence[str]
+    mounted_blobs: Sequence[str]
+    copied_blobs: Mapping[str, int] = field(repr=False)
+
+    @property
+    def bytes_copied(self) -> int:
+        return sum(self.copied_blobs.values())
+
+
+def _platform_name(platform: Union[str, Platform]) -> str:
+    return platform if isinstance(platform, str) else platform.name
+
+
+def _select_manifests(
+    src_repo: Repository,
+    top: ManifestParseOutput,
+    platform_names: Optional[AbstractSet[str]],
+) -> Tuple[ManifestParseOutput, List[str]]:
+    # Returns the manifest to tag in the destination, along with the digests of the platform
+    # specific manifests it refers to.
+    if isinstance(top, LegacyManifest):
+        raise LegacyImageRequestError()
+
+    if isinstance(top, Manifest):
+        if platform_names is not None:
+            config = src_repo.get_image_config(top.config.digest)
+            if config.platform_name not in platform_names:
+                raise ValueError("None of the selected platforms are available in this image.")
+        return top, []
+
+    refs = sorted(top.manifests, key=lambda ref: ref.platform_name)
+    if platform_names is None:
+        return top, list(top.referenced_digests)
+
+    selected = [ref for ref in refs if ref.platform_name in platform_names]
+    if not selected:
+        raise ValueError("None of the selected platforms are available in this image.")
+    if len(selected) == len(refs):
+        # Entries without a platform, such as attestations, are copied along with the list.
+        return top, list(top.referenced_digests)
+    if len(selected) == 1:
+        # The tag will point straight at the platform specific manifest.
+        return src_repo.get_manifest(selected[0].digest, retain_content=True), []
+
+    raise ValueError(
+        "Replicating a subset of the platforms in a manifest list would change its digest."
+    )
+
+
+def replicate_image(
+    src_repo: Repository,
+    tag: str,
+    dst_repo: Repository,
+    platforms: Optional[Iterable[Union[str, Platform]]] = None,
+    /,
+    *,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ReplicationResult:
+    """
+    Copy an image from one repository to another, transferring only what the destination lacks.
+
+    Blobs already present in the destination are skipped. Missing blobs are mounted from the
+    source repository when both repositories share a client (and so a registry), and are
+    otherwise streamed from the source straight to the destination, without being written to
+    disk. Manifests are pushed last, using their original payloads so that digests don't change.
+
+    When platforms are selected and an image has several, either all of them or exactly one of
+    them must be selected, as the manifest list can't be altered without changing its digest.
+    In the latter case, the tag in the destination points straight at the selected platform.
+    """
+    platform_names = frozenset(map(_platform_name, platforms)) if platforms is not None else None
+    top = src_repo.get_manifest(tag, retain_content=True)
+    top, child_digests = _select_manifests(src_repo, top, platform_names)
+
+    manifests: Dict[str, ManifestParseOutput] = {top.digest: top}
+    for digest, manifest in bounded_map(
+        lambda digest: src_repo.get_manifest(digest, retain_content=True),
+        child_digests,
+        max_concurrency=max_concurrency,
+    ):
+        manifests[digest] = manifest
+
+    blobs: Dict[str, int] = {}
+    for manifest in manifests.values():
+        blobs.update(manifest_blobs(manifest))
+
+    existing_blobs: List[str] = []
+    missing_blobs: List[str] = []
+    for digest, size in bounded_map(
+        dst_repo.check_blob, blobs, max_concurrency=max_concurrency, ordered=True
+    ):
+        if size is None:
+            missing_blobs.append(digest)
+        else:
+            existing_blobs.append(digest)
+
+    can_mount = src_repo.client is dst_repo.client and src_repo.name != dst_repo.name
+
+    def transfer(digest: str) -> bool:
+        location: Optional[str] = None
+        if can_mount:
+            location = dst_repo.mount_blob(digest, src_repo.name)
+            if location is None:
+                return True
+
+        response = src_repo.get_blob(digest, stream=True)
+        try:
+            dst_repo.upload_blob(
+                digest, response.iter_content(chunk_size=chunk_size), location=location
+            )
+        finally:
+            response.close()
+        return False
+
+    mounted_blobs: List[str] = []
+    copied_blobs: Dict[str, int] = {}
+    for digest, mounted in bounded_map(transfer, missing_blobs, max_concurrency=max_concurrency):
+        if mounted:
+            mounted_blobs.append(digest)
+        else:
+            copied_blobs[digest] = blobs[digest]
+
+    def push(manifest: ManifestParseOutput, reference: str) -> Optional[str]:
+        if reference == manifest.digest and dst_repo.check_manifest(reference) == reference:
+            return None
+        if manifest.raw_content is None:  # pragma: no cover
+            raise TypeError("Original manifest payload unavailable.")
+        dst_repo.put_manifest(reference, manifest.raw_content, manifest.content_type)
+        return reference
+
+    # Platform specific manifests have to exist before a manifest list can refer to them.
+    pushed_manifests: List[str] = []
+    for digest, pushed in bounded_map(
+        lambda digest: push(manifests[digest], digest),
+        child_digests,
+        max_concurrency=max_concurrency,
+    ):
+        if pushed is not None:
+            pushed_manifests.append(digest)
+    push(top, tag)
+    pushed_manifests.append(top.digest)
+
+    logger.debug(
+        "Replicated %s:%s to %s, copying %d blobs and mounting %d",
+        src_repo.name,
+        tag,
+        dst_repo.name,
+        len(copied_blobs),
+        len(mounted_blobs),
+    )
+    return ReplicationResult(
+        digest=top.digest,
+        pushed_manifests=tuple(pushed_manifests),
+        existing_blobs=tuple(existing_blobs),
+        mounted_blobs=tuple(mounted_blobs),
+        copied_blobs=copied_blobs,
+    )
+
+
+__all__ = (
+    "ReplicationResult",
+    "replicate_image",
+)
@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Optional, Sequence, Union
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Sequence, Union
 
-from ._synth import synth_manifest_list_from_manifest
+from ._concurrency import bounded_map
+from ._digest import is_digest
 from .client import Client
 from .image import Image
-from .manifest import LegacyManifest, ManifestList, ManifestParseOutput
+from .manifest import (
+    ImageConfig,
+    LegacyManifest,
+    ManifestList,
+    ManifestParseOutput,
+    UnusableManifestResponseError,
+)
+from .store import ContentStore
 
 
 if TYPE_CHECKING:
@@ -16,14 +25,39 @@ class LegacyImageRequestError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class TagResolution:
+    digests: Mapping[str, str]
+    tags_by_digest: Mapping[str, Sequence[str]]
+    missing_tags: Sequence[str]
+    manifests: Mapping[str, ManifestParseOutput] = field(repr=False)
+    # Tags that exist, but whose digest the registry didn't report.
+    unresolved_tags: Sequence[str] = ()
+
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
 class Repository:
-    def __init__(self, client: Client, repository: str, namespace: Optional[str] = None):
+    def __init__(
+        self,
+        client: Client,
+        repository: str,
+        namespace: Optional[str] = None,
+        *,
+        store: Optional[ContentStore] = None,
+    ):
         self._client: Client = client
         self.repository: str = repository
         self.namespace: Optional[str] = namespace
+        self._store: ContentStore = store if store is not None else ContentStore()
 
         self._tags: Optional[Sequence[str]] = None
 
+    @property
+    def client(self) -> Client:
+        return self._client
+
     @property
     def name(self) -> str:
         if self.namespace:
@@ -48,30 +82,123 @@ class Repository:
                 raise LegacyImageRequestError()
             return manifest
         if isinstance(manifest, ManifestList):
-            return Image(self._client, self.name, tag, manifest)
-
-        # We need to synthesise a manifest list for this image
-        image_config = self._client.get_image_config_blob(self.name, manifest.config.digest)
+            return Image(self._client, self.name, tag, manifest, store=self._store)
 
-        manifest_list = synth_manifest_list_from_manifest(manifest, image_config)
+        # A manifest list will be synthesised for this image if it's needed
+        return Image.from_manifest(self._client, self.name, tag, manifest, store=self._store)
 
-        return Image(self._client, self.name, tag, manifest_list)
-
-    def check_manifest(self, reference: str, /) -> Optional[str]:
+    def check_manifest(self, reference: str, /, *, require_digest: bool = False) -> Optional[str]:
+        if require_digest:
+            return self._client.check_manifest(self.name, reference, require_digest=True)
         return self._client.check_manifest(self.name, reference)
 
-    def get_manifest(self, reference: str) -> ManifestParseOutput:
+    def resolve_tags(
+        self,
+        tags: Optional[Iterable[str]] = None,
+        /,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        fetch_manifests: bool = False,
+    ) -> TagResolution:
+        """
+        Resolve tags to the digests they point at, using concurrent HEAD requests.
+
+        All tags in the repository are resolved if no tags are specified, and each tag is only
+        resolved once. When fetch_manifests is set, one manifest is fetched for each distinct
+        digest, rather than one for each tag.
+        """
+        if tags is None:
+            tags = self.tags()
+
+        def resolve(tag: str) -> Union[None, str, UnusableManifestResponseError]:
+            try:
+                return self.check_manifest(tag, require_digest=True)
+            except UnusableManifestResponseError as exc:
+                return exc
+
+        digests: Dict[str, str] = {}
+        tags_by_digest: Dict[str, List[str]] = {}
+        missing_tags: List[str] = []
+        unresolved_tags: List[str] = []
+        for tag, digest in bounded_map(
+            resolve, dict.fromkeys(tags), max_concurrency=max_concurrency, ordered=True
+        ):
+            if digest is None:
+                missing_tags.append(tag)
+            elif isinstance(digest, UnusableManifestResponseError):
+                unresolved_tags.append(tag)
+            else:
+                digests[tag] = digest
+                tags_by_digest.setdefault(digest, []).append(tag)
+
+        manifests: Dict[str, ManifestParseOutput] = {}
+        if fetch_manifests:
+            for digest, manifest in bounded_map(
+                self.get_manifest, tags_by_digest, max_concurrency=max_concurrency
+            ):
+                manifests[digest] = manifest
+
+        return TagResolution(
+            digests=digests,
+            tags_by_digest={digest: tuple(tags) for digest, tags in tags_by_digest.items()},
+            missing_tags=tuple(missing_tags),
+            manifests=manifests,
+            unresolved_tags=tuple(unresolved_tags),
+        )
+
+    def get_manifest(
+        self, reference: str, *, verify_digest: bool = False, retain_content: bool = False
+    ) -> ManifestParseOutput:
         """
         Return a manifest for a given reference (a tag or a digest)
         """
-        return self._client.get_manifest(self.name, reference)
+        if is_digest(reference) and not verify_digest:
+            cached = self._store.get_manifest(reference, repository=self.name)
+            if cached is not None and (not retain_content or cached.raw_content is not None):
+                return cached
+
+        # Only options that are set are passed on, so that clients predating them still work.
+        options: Dict[str, bool] = {}
+        if verify_digest:
+            options["verify_digest"] = True
+        if retain_content:
+            options["retain_content"] = True
+        manifest = self._client.get_manifest(self.name, reference, **options)
+        # Make sure a copy of the manifest with its payload replaces one without it.
+        return self._store.put_manifest(manifest, repository=self.name, replace=retain_content)
+
+    def get_image_config(self, digest: str, /, *, lazy: bool = False) -> ImageConfig:
+        return self._store.image_config(
+            digest, lambda: self._client.get_image_config_blob(self.name, digest, lazy=lazy)
+        )
+
+    def put_manifest(self, reference: str, content: bytes, content_type: str, /) -> str:
+        return self._client.put_manifest(self.name, reference, content, content_type)
 
     def delete_manifest(self, digest: str, /) -> Response:
         return self._client.delete_manifest(self.name, digest)
 
-    def get_blob(self, digest: str, /) -> Response:
+    def check_blob(self, digest: str, /) -> Optional[int]:
+        return self._client.check_blob(self.name, digest)
+
+    def get_blob(self, digest: str, /, *, stream: bool = False) -> Response:
+        if stream:
+            return self._client.get_blob(self.name, digest, stream=True)
         return self._client.get_blob(self.name, digest)
 
+    def mount_blob(self, digest: str, from_repository: str, /) -> Optional[str]:
+        return self._client.mount_blob(self.name, digest, from_repository)
+
+    def upload_blob(
+        self,
+        digest: str,
+        data: Union[bytes, Iterable[bytes]],
+        /,
+        *,
+        location: Optional[str] = None,
+    ) -> Response:
+        return self._client.upload_blob(self.name, digest, data, location=location)
+
     def delete_blob(self, digest: str, /) -> Response:
         return self._client.delete_blob(self.name, digest)
 
@@ -89,4 +216,5 @@ class Repository:
 __all__ = (
     "LegacyImageRequestError",
     "Repository",
+    "TagResolution",
 )
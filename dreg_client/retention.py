@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import logging
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import (
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from ._concurrency import bounded_map
+from ._time import parse_timestamp
+from .cleanup import CleanupPlanner, CleanupProgress, CleanupResult, DeletionPlan, execute_plan
+from .manifest import Manifest, ManifestList, ManifestParseOutput
+from .repository import DEFAULT_MAX_CONCURRENCY, Repository, TagResolution
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetentionRule(ABC):
+    """
+    Base class for retention rules.
+
+    Every rule only considers tags matching its regular expression pattern. Rules either mark
+    tags as ones to keep, or as ones to delete.
+    """
+
+    keeps: ClassVar[bool]
+
+    pattern: str
+    _regex: Pattern[str] = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_regex", re.compile(self.pattern))
+
+    def matches(self, tag: str, /) -> bool:
+        return self._regex.search(tag) is not None
+
+    @abstractmethod
+    def applies(self, age: Optional[timedelta], position: int, /) -> bool:
+        """
+        Decide whether the rule applies to a tag it matches.
+
+        The age is None when the creation time of the tag is unknown. The position is the number
+        of newer tags that this rule has already matched.
+        """
+
+
+@dataclass(frozen=True)
+class KeepLatest(RetentionRule):
+    keeps = True
+
+    count: int
+
+    def applies(self, age: Optional[timedelta], position: int, /) -> bool:
+        return position < self.count
+
+
+@dataclass(frozen=True)
+class KeepNewerThan(RetentionRule):
+    keeps = True
+
+    max_age: timedelta
+
+    def applies(self, age: Optional[timedelta], position: int, /) -> bool:
+        return age is not None and age < self.max_age
+
+
+@dataclass(frozen=True)
+class DeleteOlderThan(RetentionRule):
+    keeps = False
+
+    max_age: timedelta
+
+    def applies(self, age: Optional[timedelta], position: int, /) -> bool:
+        return age is not None and age > self.max_age
+
+
+@dataclass(frozen=True)
+class DeleteMatching(RetentionRule):
+    keeps = False
+
+    def applies(self, age: Optional[timedelta], position: int, /) -> bool:
+        return True
+
+
+@dataclass(frozen=True)
+class RetentionDecision:
+    keep: Sequence[str]
+    delete: Sequence[str]
+
+
+def _newest_first(item: Tuple[str, Optional[datetime]]) -> Tuple[float, str]:
+    tag, created_at = item
+    if created_at is None:
+        return float("-inf"), tag
+    return created_at.timestamp(), tag
+
+
+class RetentionPolicy:
+    """
+    A set of retention rules, evaluated together.
+
+    A tag is deleted when at least one delete rule applies to it and no keep rule does. Tags that
+    no rule applies to are kept. Tags with unknown creation times are treated as the oldest tags,
+    and are never matched by age-based rules.
+    """
+
+    def __init__(self, rules: Iterable[RetentionRule], /) -> None:
+        self._rules: Tuple[RetentionRule, ...] = tuple(rules)
+
+    @property
+    def rules(self) -> Sequence[RetentionRule]:
+        return self._rules
+
+    def evaluate(
+        self,
+        created: Mapping[str, Optional[datetime]],
+        /,
+        *,
+        now: Optional[datetime] = None,
+    ) -> RetentionDecision:
+        if now is None:
+            now = datetime.now(timezone.utc)
+
+        positions = [0] * len(self._rules)
+        keep: List[str] = []
+        delete: List[str] = []
+        for tag, created_at in sorted(created.items(), key=_newest_first, reverse=True):
+            age = now - created_at if created_at is not None else None
+
+            kept = False
+            deleted = False
+            for index, rule in enumerate(self._rules):
+                if not rule.matches(tag):
+                    continue
+                if rule.applies(age, positions[index]):
+                    if rule.keeps:
+                        kept = True
+                    else:
+                        deleted = True
+                positions[index] += 1
+
+            if deleted and not kept:
+                delete.append(tag)
+            else:
+                keep.append(tag)
+
+        return RetentionDecision(keep=tuple(keep), delete=tuple(delete))
+
+
+class RetentionEngine:
+    """
+    Applies a retention policy to repositories.
+
+    Tags are resolved to digests concurrently, and the creation time of each distinct digest is
+    only looked up once, no matter how many tags point at it. For manifest lists, the creation
+    time of the first platform (ordered by platform name) is used.
+    """
+
+    def __init__(
+        self,
+        policy: RetentionPolicy,
+        /,
+        *,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ) -> None:
+        self._policy = policy
+        self._max_concurrency = max_concurrency
+
+    def _created_at(
+        self, repository: Repository, manifest: ManifestParseOutput
+    ) -> Optional[datetime]:
+        if isinstance(manifest, ManifestList):
+            if not manifest.manifests:
+                return None
+            first_ref = min(manifest.manifests, key=lambda ref: ref.platform_name)
+            manifest = repository.get_manifest(first_ref.digest)
+        if not isinstance(manifest, Manifest):
+            return None
+
+        config = repository.get_image_config(manifest.config.digest, lazy=True)
+        try:
+            return parse_timestamp(config.created_at)
+        except ValueError:
+            logger.warning("Unusable creation time in image config %s", config.digest)
+            return None
+
+    def creation_times(
+        self,
+        repository: Repository,
+        resolution: TagResolution,
+        /,
+    ) -> Dict[str, Optional[datetime]]:
+        created_by_digest: Dict[str, Optional[datetime]] = {}
+        for digest, created_at in bounded_map(
+            lambda digest: self._created_at(repository, resolution.manifests[digest]),
+            resolution.manifests,
+            max_concurrency=self._max_concurrency,
+        ):
+            created_by_digest[digest] = created_at
+
+        return {tag: created_by_digest.get(digest) for tag, digest in resolution.digests.items()}
+
+    def plan(
+        self, repository: Repository, /, *, now: Optional[datetime] = None
+    ) -> Tuple[RetentionDecision, DeletionPlan]:
+        resolution = repository.resolve_tags(
+            max_concurrency=self._max_concurrency, fetch_manifests=True
+        )
+        decision = self._policy.evaluate(self.creation_times(repository, resolution), now=now)
+
+        planner = CleanupPlanner(repository, max_concurrency=self._max_concurrency)
+        plan = planner.plan(decision.delete, resolution=resolution)
+        return decision, plan
+
+    def enforce(
+        self,
+        repository: Repository,
+        /,
+        *,
+        now: Optional[datetime] = None,
+        journal_path: Union[None, str, Path] = None,
+        progress: Optional[Callable[[CleanupProgress], None]] = None,
+    ) -> CleanupResult:
+        _, plan = self.plan(repository, now=now)
+        return execute_plan(
+            repository,
+            plan,
+            max_concurrency=self._max_concurrency,
+            journal_path=journal_path,
+            progress=progress,
+        )
+
+
+__all__ = (
+    "DeleteMatching",
+    "DeleteOlderThan",
+    "KeepLatest",
+    "KeepNewerThan",
+    "RetentionDecision",
+    "RetentionEngine",
+    "RetentionPolicy",
+    "RetentionRule",
+)
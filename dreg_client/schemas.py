@@ -1,20 +1,50 @@
 BASE_CONTENT_TYPE = "application/vnd.docker.distribution.manifest"
+OCI_BASE_CONTENT_TYPE = "application/vnd.oci.image"
 
 schema_1 = BASE_CONTENT_TYPE + ".v1+json"
 schema_1_signed = BASE_CONTENT_TYPE + ".v1+prettyjws"
 schema_2 = BASE_CONTENT_TYPE + ".v2+json"
 schema_2_list = BASE_CONTENT_TYPE + ".list.v2+json"
 
+oci_manifest = OCI_BASE_CONTENT_TYPE + ".manifest.v1+json"
+oci_index = OCI_BASE_CONTENT_TYPE + ".index.v1+json"
+
 legacy_manifest_content_types = frozenset(
     {
         schema_1,
         schema_1_signed,
     }
 )
-known_manifest_content_types = legacy_manifest_content_types | {
-    schema_2,
+image_manifest_content_types = frozenset(
+    {
+        schema_2,
+        oci_manifest,
+    }
+)
+manifest_list_content_types = frozenset(
+    {
+        schema_2_list,
+        oci_index,
+    }
+)
+oci_content_types = frozenset(
+    {
+        oci_manifest,
+        oci_index,
+    }
+)
+known_manifest_content_types = (
+    legacy_manifest_content_types | image_manifest_content_types | manifest_list_content_types
+)
+
+# Every non-legacy format is listed, so that registries can serve whatever they have stored
+# without needing to convert it first.
+manifest_accept_content_types = (
     schema_2_list,
-}
+    oci_index,
+    schema_2,
+    oci_manifest,
+)
 
 
 __all__ = (
@@ -22,6 +52,12 @@ __all__ = (
     "schema_1_signed",
     "schema_2",
     "schema_2_list",
+    "oci_manifest",
+    "oci_index",
     "legacy_manifest_content_types",
+    "image_manifest_content_types",
+    "manifest_list_content_types",
+    "oci_content_types",
     "known_manifest_content_types",
+    "manifest_accept_content_types",
 )
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from .image import PlatformImage
+from .manifest import (
+    ArtifactRef,
+    ImageConfig,
+    ImageConfigRef,
+    ImageHistoryItem,
+    ImageLayerRef,
+    LegacyManifest,
+    Manifest,
+    ManifestList,
+    ManifestRef,
+    Platform,
+)
+
+
+def _platform(platform: Platform) -> Dict[str, Any]:
+    return {
+        "name": platform.name,
+        "os": platform.os,
+        "architecture": platform.architecture,
+        "variant": platform.variant,
+    }
+
+
+def _descriptor(ref: Any) -> Dict[str, Any]:
+    return {"digest": ref.digest, "content_type": ref.content_type, "size": ref.size}
+
+
+def to_data(obj: Any, /) -> Any:
+    """
+    Convert a manifest, image config or related object into plain JSON compatible data.
+
+    Raises TypeError for anything else, so this can be passed as the default argument of
+    json.dump() and json.dumps().
+    """
+    if isinstance(obj, Manifest):
+        return {
+            "digest": obj.digest,
+            "content_type": obj.content_type,
+            "content_length": obj.content_length,
+            "config": _descriptor(obj.config),
+            "layers": [_descriptor(layer) for layer in obj.layers],
+        }
+    if isinstance(obj, ManifestList):
+        refs = sorted(obj.manifests, key=lambda ref: ref.platform_name)
+        return {
+            "digest": obj.digest,
+            "content_type": obj.content_type,
+            "content_length": obj.content_length,
+            "manifests": [to_data(ref) for ref in refs],
+            "artifacts": [
+                to_data(ref) for ref in sorted(obj.artifacts, key=lambda ref: ref.digest)
+            ],
+        }
+    if isinstance(obj, ManifestRef):
+        return {**_descriptor(obj), "platform": _platform(obj.platform)}
+    if isinstance(obj, LegacyManifest):
+        return {
+            "digest": obj.digest,
+            "content_type": obj.content_type,
+            "content_length": obj.content_length,
+            "content": dict(obj.content),
+        }
+    if isinstance(obj, ImageConfig):
+        return {
+            "digest": obj.digest,
+            "content_length": obj.content_length,
+            "created_at": obj.created_at,
+            "platform": _platform(obj.platform),
+            "config": dict(obj.config),
+            "rootfs": dict(obj.rootfs),
+            "history": [to_data(item) for item in obj.history],
+        }
+    if isinstance(obj, ImageHistoryItem):
+        return {
+            "created_at": obj.created_at,
+            "created_by": obj.created_by,
+            "empty_layer": obj.empty_layer,
+            "comment": obj.comment,
+        }
+    if isinstance(obj, PlatformImage):
+        return {
+            "digest": obj.digest,
+            "platform": obj.platform_name,
+            "config": to_data(obj.config),
+            "layers": [_descriptor(layer) for layer in obj.layers],
+        }
+    if isinstance(obj, (ImageLayerRef, ImageConfigRef, ArtifactRef)):
+        return _descriptor(obj)
+    if isinstance(obj, Platform):
+        return _platform(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not serialisable.")
+
+
+__all__ = ("to_data",)
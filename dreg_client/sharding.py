@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from typing import (
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from .client import Client
+from .crawl import CrawlRecord, ImageRecord, RegistryCrawler
+from .registry import Registry
+
+
+R = TypeVar("R")
+
+DEFAULT_REPLICAS = 64
+
+
+def _hash(key: str) -> int:
+    # Python's own hash() is randomised per process, so it can't be used to agree on shard
+    # assignments between processes or machines.
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    A consistent hash ring, assigning keys (such as repository names) to a number of shards.
+
+    Each shard is placed on the ring many times over, which keeps the shards evenly sized. When
+    the number of shards changes, only around 1/N of the keys move to a different shard.
+    """
+
+    def __init__(self, shard_count: int, /, *, replicas: int = DEFAULT_REPLICAS) -> None:
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1.")
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1.")
+
+        points = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shard_count)
+            for replica in range(replicas)
+        )
+        self._shard_count = shard_count
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @property
+    def shard_count(self) -> int:
+        return self._shard_count
+
+    def shard_for(self, key: str, /) -> int:
+        index = bisect.bisect(self._hashes, _hash(key))
+        return self._shards[index % len(self._shards)]
+
+    def partition(self, keys: Iterable[str], /) -> List[List[str]]:
+        shards: List[List[str]] = [[] for _ in range(self._shard_count)]
+        for key in keys:
+            shards[self.shard_for(key)].append(key)
+        return shards
+
+
+def shard_repositories(
+    repositories: Iterable[str],
+    shard_index: int,
+    shard_count: int,
+    /,
+    *,
+    replicas: int = DEFAULT_REPLICAS,
+) -> Iterator[str]:
+    """
+    Filter repository names down to those belonging to one shard.
+
+    This is intended for splitting work between machines: each machine is given the same shard
+    count and its own shard index, and every repository is handled by exactly one machine.
+    """
+    if not 0 <= shard_index < shard_count:
+        raise ValueError("shard_index must be at least 0 and less than shard_count.")
+
+    ring = HashRing(shard_count, replicas=replicas)
+    return (name for name in repositories if ring.shard_for(name) == shard_index)
+
+
+def map_shards(
+    client_factory: Callable[[], Client],
+    worker: Callable[[Client, Sequence[str]], R],
+    /,
+    *,
+    shard_count: int,
+    repositories: Optional[Iterable[str]] = None,
+    max_workers: Optional[int] = None,
+    replicas: int = DEFAULT_REPLICAS,
+) -> Generator[Tuple[int, R], None, None]:
+    """
+    Split repositories into shards, and process each shard in a separate process.
+
+    Every worker process builds its own client using client_factory. Both client_factory and
+    worker must be picklable, such as module level functions, or a functools.partial() of
+    Client.build_with_session. The worker is called with that client and the names of the
+    repositories in its shard, and (shard index, result) pairs are yielded as each shard finishes.
+
+    When no repositories are supplied, the registry's full catalog is used.
+    """
+    if repositories is None:
+        repositories = client_factory().iter_catalog()
+
+    shards = HashRing(shard_count, replicas=replicas).partition(repositories)
+    with ProcessPoolExecutor(max_workers=max_workers or shard_count) as executor:
+        futures = {
+            executor.submit(_run_worker, client_factory, worker, names): index
+            for index, names in enumerate(shards)
+            if names
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _run_worker(
+    client_factory: Callable[[], Client],
+    worker: Callable[[Client, Sequence[str]], R],
+    names: Sequence[str],
+) -> R:
+    return worker(client_factory(), names)
+
+
+def crawl_shard(
+    client: Client, repositories: Sequence[str], /, *, directory: Optional[str] = None
+) -> str:
+    """
+    A map_shards() worker that crawls every repository in a shard.
+
+    Records are written to a new file in directory (or the default temporary directory) as
+    they're found, rather than being held in memory and sent back to the parent process. The path
+    of that file is returned, and its records can be read back with read_crawl_records(). The
+    caller is responsible for removing the file.
+    """
+    fd, path = tempfile.mkstemp(prefix="shard-", suffix=".pickle", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as records_file:
+            for record in RegistryCrawler(Registry(client)).crawl(repositories):
+                pickle.dump(record, records_file, protocol=pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def read_crawl_records(path: str, /) -> Iterator[CrawlRecord]:
+    """
+    Read back the records written by crawl_shard(), one at a time.
+    """
+    with open(path, "rb") as records_file:
+        while True:
+            try:
+                yield pickle.load(records_file)
+            except EOFError:
+                return
+
+
+def merge_crawl_records(shards: Iterable[Iterable[CrawlRecord]], /) -> Iterator[CrawlRecord]:
+    """
+    Merge the records from several crawls into one stream.
+
+    Each shard only removes duplicate images within itself, so images found by more than one
+    shard are only yielded the first time they're seen.
+    """
+    seen_digests: Set[str] = set()
+    for records in shards:
+        for record in records:
+            if isinstance(record, ImageRecord):
+                if record.digest in seen_digests:
+                    continue
+                seen_digests.add(record.digest)
+            yield record
+
+
+def crawl_sharded(
+    client_factory: Callable[[], Client],
+    /,
+    *,
+    shard_count: int,
+    repositories: Optional[Iterable[str]] = None,
+    max_workers: Optional[int] = None,
+    replicas: int = DEFAULT_REPLICAS,
+) -> Iterator[CrawlRecord]:
+    """
+    Crawl a registry using several processes, yielding the merged records of every shard.
+
+    Each shard's records are written to a temporary file, and read back from there as each shard
+    finishes, so neither the workers nor the parent process hold a whole shard in memory.
+    """
+    with tempfile.TemporaryDirectory(prefix="crawl-") as tmp_dir:
+        results = map_shards(
+            client_factory,
+            partial(crawl_shard, directory=tmp_dir),
+            shard_count=shard_count,
+            repositories=repositories,
+            max_workers=max_workers,
+            replicas=replicas,
+        )
+        try:
+            yield from merge_crawl_records(read_crawl_records(path) for _, path in results)
+        finally:
+            # Wait for any shards still running before their files are removed.
+            results.close()
+
+
+__all__ = (
+    "HashRing",
+    "crawl_shard",
+    "crawl_sharded",
+    "map_shards",
+    "merge_crawl_records",
+    "read_crawl_records",
+    "shard_repositories",
+)
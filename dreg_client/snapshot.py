@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import gzip
+import heapq
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .cleanup import manifest_blobs
+from .crawl import CrawlRecord, ImageRecord, RegistryCrawler, RepositoryRecord, TagRecord
+from .manifest import Manifest
+from .registry import Registry
+
+
+SNAPSHOT_HEADER = "# dreg-snapshot v1\n"
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+ROW_LAYER = "L"
+ROW_PLATFORM = "P"
+ROW_REPOSITORY = "R"
+ROW_TAG = "T"
+
+KIND_LAYER = "layer"
+KIND_PLATFORM = "platform"
+KIND_REPOSITORY = "repository"
+KIND_TAG = "tag"
+
+CHANGE_ADDED = "added"
+CHANGE_REMOVED = "removed"
+CHANGE_MOVED = "moved"
+
+_KINDS = {
+    ROW_LAYER: KIND_LAYER,
+    ROW_PLATFORM: KIND_PLATFORM,
+    ROW_REPOSITORY: KIND_REPOSITORY,
+    ROW_TAG: KIND_TAG,
+}
+
+# Sorts after every row, marking the end of a stream.
+_END = "\U0010ffff"
+
+PathLike = Union[str, Path]
+
+
+@dataclass(frozen=True)
+class SnapshotChange:
+    kind: str
+    change: str
+    # The repository for repository, platform and tag changes, or the digest of a layer.
+    subject: str
+    # The tag or platform name, where relevant.
+    name: Optional[str] = None
+    old_digest: Optional[str] = None
+    new_digest: Optional[str] = None
+
+
+def _open(path: PathLike, mode: str) -> IO[str]:
+    if str(path).endswith(".gz"):
+        if mode == "w":
+            return gzip.open(path, "wt", encoding="utf-8", newline="\n")
+        return gzip.open(path, "rt", encoding="utf-8", newline="\n")
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+
+class _ExternalSorter:
+    # Rows are gathered into chunks, and each full chunk is sorted and written to its own
+    # temporary file. The files are then merged, removing any duplicate rows.
+
+    def __init__(self, chunk_size: int, tmp_dir: str, stack: ExitStack) -> None:
+        self._chunk_size = chunk_size
+        self._tmp_dir = tmp_dir
+        self._stack = stack
+        self._runs: List[Iterable[str]] = []
+        self._chunk: List[str] = []
+
+    def add(self, row: str) -> None:
+        self._chunk.append(row)
+        if len(self._chunk) >= self._chunk_size:
+            self._chunk.sort()
+            fd, run_path = tempfile.mkstemp(prefix="run-", dir=self._tmp_dir)
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as run_file:
+                run_file.writelines(self._chunk)
+            self._runs.append(
+                self._stack.enter_context(open(run_path, "r", encoding="utf-8", newline="\n"))
+            )
+            self._chunk = []
+
+    def merge(self) -> Iterator[str]:
+        self._chunk.sort()
+        previous = None
+        for row in heapq.merge(*self._runs, self._chunk):
+            if row != previous:
+                yield row
+                previous = row
+
+
+def _sort_rows(records: Iterable[CrawlRecord], chunk_size: int, tmp_dir: str) -> Iterator[str]:
+    with ExitStack() as stack:
+        rows = _ExternalSorter(chunk_size, tmp_dir, stack)
+        # Images are only yielded once by a crawl, however many tags refer to them, so working
+        # out the platforms in each repository means joining tags to images by digest. That's
+        # done with a second sort, rather than by holding every digest in memory: the platforms
+        # of an image sort just before the repositories with tags referring to it.
+        platforms = _ExternalSorter(chunk_size, tmp_dir, stack)
+
+        for record in records:
+            if isinstance(record, TagRecord):
+                rows.add(f"{ROW_TAG}\t{record.repository}\t{record.tag}\t{record.digest}\n")
+                platforms.add(f"{record.digest}\t1\t{record.repository}\n")
+            elif isinstance(record, RepositoryRecord):
+                rows.add(f"{ROW_REPOSITORY}\t{record.repository}\n")
+            elif isinstance(record, ImageRecord):
+                if isinstance(record.manifest, Manifest):
+                    layers: Iterable[str] = (layer.digest for layer in record.manifest.layers)
+                else:
+                    # Only legacy manifests refer to blobs here, and those blobs are all layers.
+                    layers = manifest_blobs(record.manifest)
+                for layer in layers:
+                    rows.add(f"{ROW_LAYER}\t{layer}\n")
+                for image in record.platform_images:
+                    platforms.add(f"{record.digest}\t0\t{image.config.platform_name}\n")
+                    for layer_ref in image.layers:
+                        rows.add(f"{ROW_LAYER}\t{layer_ref.digest}\n")
+
+        digest = None
+        names: List[str] = []
+        for row in platforms.merge():
+            row_digest, kind, value = row.rstrip("\n").split("\t")
+            if row_digest != digest:
+                digest = row_digest
+                names = []
+            if kind == "0":
+                names.append(value)
+            else:
+                for name in names:
+                    rows.add(f"{ROW_PLATFORM}\t{value}\t{name}\n")
+
+        yield from rows.merge()
+
+
+def write_snapshot(
+    path: PathLike,
+    records: Iterable[CrawlRecord],
+    /,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """
+    Write a snapshot of the records of a crawl to a file.
+
+    Snapshots are UTF-8 text files, gzip compressed when the path ends in ``.gz``. After a
+    header line, there's one tab separated row per line, sorted as plain strings:
+
+    * ``L <layer digest>`` for each distinct layer in the registry
+    * ``P <repository> <platform>`` for each platform available in a repository
+    * ``R <repository>`` for each repository
+    * ``T <repository> <tag> <digest>`` for each tag
+
+    Rows are sorted with an external merge sort, so memory use doesn't depend on the size of the
+    registry: at most chunk_size rows are held in memory at once, with each sorted chunk written
+    to a temporary file before they're all merged together.
+
+    Crawl failures are ignored, so anything that failed to crawl appears to be missing.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryDirectory(dir=directory) as tmp_dir:
+        # Write to a temporary file first, so that an interruption never leaves a partially
+        # written snapshot behind.
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".snapshot-", suffix=Path(path).suffix, dir=directory
+        )
+        os.close(fd)
+        try:
+            with _open(tmp_path, "w") as snapshot_file:
+                snapshot_file.write(SNAPSHOT_HEADER)
+                snapshot_file.writelines(_sort_rows(records, chunk_size, tmp_dir))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def snapshot_registry(
+    registry: Registry,
+    path: PathLike,
+    /,
+    *,
+    repositories: Optional[Iterable[str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> None:
+    """
+    Crawl a registry, or some of its repositories, and write a snapshot of it to a file.
+    """
+    records = RegistryCrawler(registry).crawl(repositories)
+    write_snapshot(path, records, chunk_size=chunk_size)
+
+
+def _read_rows(snapshot_file: IO[str], name: str) -> Iterator[str]:
+    if snapshot_file.readline() != SNAPSHOT_HEADER:
+        raise ValueError(f"{name} is not a supported snapshot file.")
+    previous = ""
+    for row in snapshot_file:
+        if row < previous:
+            raise ValueError(f"{name} is not sorted.")
+        previous = row
+        yield row
+
+
+def _key(row: str) -> str:
+    # Tags are identified by everything but their digest. Every other row is its own key. A tab
+    # sorts before any character allowed in a name, so keys sort in the same order as rows.
+    if row.startswith(ROW_TAG):
+        return row.rpartition("\t")[0]
+    return row
+
+
+def _change(row: str, change: str) -> SnapshotChange:
+    fields = row.rstrip("\n").split("\t")
+    kind = _KINDS[fields[0]]
+    if kind == KIND_TAG:
+        _, repository, tag, digest = fields
+        if change == CHANGE_ADDED:
+            return SnapshotChange(kind, change, repository, tag, new_digest=digest)
+        return SnapshotChange(kind, change, repository, tag, old_digest=digest)
+    return SnapshotChange(kind, change, fields[1], fields[2] if len(fields) > 2 else None)
+
+
+def diff_snapshot_rows(
+    old_rows: Iterable[str],
+    new_rows: Iterable[str],
+    /,
+) -> Iterator[SnapshotChange]:
+    """
+    Compare two sorted streams of snapshot rows, yielding every change between them.
+    """
+    old_iter = iter(old_rows)
+    new_iter = iter(new_rows)
+    old = next(old_iter, _END)
+    new = next(new_iter, _END)
+    while old is not _END or new is not _END:
+        # Most rows are normally unchanged, so equal rows are skipped before anything is parsed.
+        if old == new:
+            old = next(old_iter, _END)
+            new = next(new_iter, _END)
+            continue
+
+        old_key = _key(old)
+        new_key = _key(new)
+        if old_key == new_key:
+            _, repository, tag, old_digest = old.rstrip("\n").split("\t")
+            new_digest = new.rstrip("\n").rpartition("\t")[2]
+            yield SnapshotChange(KIND_TAG, CHANGE_MOVED, repository, tag, old_digest, new_digest)
+            old = next(old_iter, _END)
+            new = next(new_iter, _END)
+        elif old_key < new_key:
+            yield _change(old, CHANGE_REMOVED)
+            old = next(old_iter, _END)
+        else:
+            yield _change(new, CHANGE_ADDED)
+            new = next(new_iter, _END)
+
+
+def diff_snapshots(old_path: PathLike, new_path: PathLike, /) -> Iterator[SnapshotChange]:
+    """
+    Compare two snapshot files, yielding every change from the old one to the new one.
+
+    Both files are streamed, so memory use doesn't depend on their size.
+    """
+    with _open(old_path, "r") as old_file, _open(new_path, "r") as new_file:
+        yield from diff_snapshot_rows(
+            _read_rows(old_file, str(old_path)), _read_rows(new_file, str(new_path))
+        )
+
+
+def format_change(change: SnapshotChange, /) -> str:
+    prefix = {CHANGE_ADDED: "+", CHANGE_REMOVED: "-", CHANGE_MOVED: "~"}[change.change]
+    if change.kind == KIND_TAG:
+        if change.change == CHANGE_MOVED:
+            digests = f"{change.old_digest} -> {change.new_digest}"
+        else:
+            digests = change.new_digest or change.old_digest or ""
+        return f"{prefix} tag {change.subject}:{change.name} {digests}"
+    if change.kind == KIND_PLATFORM:
+        return f"{prefix} platform {change.subject} {change.name}"
+    return f"{prefix} {change.kind} {change.subject}"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = ArgumentParser(
+        prog="python -m dreg_client.snapshot",
+        description="Show the changes between two registry snapshots.",
+    )
+    parser.add_argument("old", help="The earlier snapshot file.")
+    parser.add_argument("new", help="The later snapshot file.")
+    args = parser.parse_args(argv)
+
+    changed = False
+    for change in diff_snapshots(args.old, args.new):
+        sys.stdout.write(format_change(change) + "\n")
+        changed = True
+    return 1 if changed else 0
+
+
+__all__ = (
+    "SnapshotChange",
+    "diff_snapshot_rows",
+    "diff_snapshots",
+    "format_change",
+    "snapshot_registry",
+    "write_snapshot",
+)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import threading
+from typing import Callable, Hashable, MutableMapping, Optional, Tuple, TypeVar
+from weakref import WeakValueDictionary
+
+from .manifest import ImageConfig, ManifestParseOutput
+
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+class ContentStore:
+    """
+    A store of content-addressed objects, keyed by their digests.
+
+    A single store is meant to be shared by everything that talks to the same registry, so that
+    each distinct digest only needs to be fetched once. By default, objects are only held weakly,
+    which means they disappear from the store once nothing else refers to them.
+
+    Manifests are also keyed by the repository they were fetched from, because a registry only
+    serves a manifest through the repositories that hold it. Image configs are only ever looked
+    up through a manifest, so they are shared across repositories.
+    """
+
+    def __init__(self, *, weak: bool = True) -> None:
+        self._image_configs: MutableMapping[str, ImageConfig]
+        self._manifests: MutableMapping[Tuple[Optional[str], str], ManifestParseOutput]
+        if weak:
+            self._image_configs = WeakValueDictionary()
+            self._manifests = WeakValueDictionary()
+        else:
+            self._image_configs = {}
+            self._manifests = {}
+
+        self._lock = threading.Lock()
+
+    def _get(self, mapping: MutableMapping[K, T], key: K) -> Optional[T]:
+        with self._lock:
+            return mapping.get(key)
+
+    def _put(self, mapping: MutableMapping[K, T], key: K, obj: T, replace: bool = False) -> T:
+        with self._lock:
+            if replace:
+                mapping[key] = obj
+                return obj
+            return mapping.setdefault(key, obj)
+
+    def _get_or_load(self, mapping: MutableMapping[K, T], key: K, loader: Callable[[], T]) -> T:
+        existing = self._get(mapping, key)
+        if existing is not None:
+            return existing
+
+        # The lock isn't held while loading, so that unrelated fetches can happen concurrently.
+        # If two threads race to load the same digest, whichever finishes first wins.
+        return self._put(mapping, key, loader())
+
+    def get_image_config(self, digest: str, /) -> Optional[ImageConfig]:
+        return self._get(self._image_configs, digest)
+
+    def put_image_config(
+        self, image_config: ImageConfig, /, *, replace: bool = False
+    ) -> ImageConfig:
+        return self._put(self._image_configs, image_config.digest, image_config, replace)
+
+    def image_config(self, digest: str, loader: Callable[[], ImageConfig], /) -> ImageConfig:
+        return self._get_or_load(self._image_configs, digest, loader)
+
+    def get_manifest(
+        self, digest: str, /, *, repository: Optional[str] = None
+    ) -> Optional[ManifestParseOutput]:
+        return self._get(self._manifests, (repository, digest))
+
+    def put_manifest(
+        self,
+        manifest: ManifestParseOutput,
+        /,
+        *,
+        repository: Optional[str] = None,
+        replace: bool = False,
+    ) -> ManifestParseOutput:
+        return self._put(self._manifests, (repository, manifest.digest), manifest, replace)
+
+    def manifest(
+        self,
+        digest: str,
+        loader: Callable[[], ManifestParseOutput],
+        /,
+        *,
+        repository: Optional[str] = None,
+    ) -> ManifestParseOutput:
+        return self._get_or_load(self._manifests, (repository, digest), loader)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._image_configs.clear()
+            self._manifests.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._image_configs) + len(self._manifests)
+
+
+__all__ = ("ContentStore",)
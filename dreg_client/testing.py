@@ -0,0 +1,460 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import secrets
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional, Sequence, Tuple, Type
+from urllib.parse import parse_qs, quote, urlsplit
+
+from ._digest import compute_digest
+from .manifest import Platform
+from .schemas import schema_2, schema_2_list
+
+
+if TYPE_CHECKING:
+    from .registry import Registry
+
+
+DEFAULT_SERVICE = "fake-registry"
+DEFAULT_PAGE_SIZE = 100
+
+CONFIG_CONTENT_TYPE = "application/vnd.docker.container.image.v1+json"
+LAYER_CONTENT_TYPE = "application/vnd.docker.image.rootfs.diff.tar.gzip"
+
+_MANIFEST_PATH = re.compile(r"^/v2/(?P<name>.+)/manifests/(?P<reference>[^/]+)$")
+_BLOB_PATH = re.compile(r"^/v2/(?P<name>.+)/blobs/(?P<digest>[^/]+)$")
+_TAGS_PATH = re.compile(r"^/v2/(?P<name>.+)/tags/list$")
+
+
+def _generate_bytes(seed: str, size: int) -> bytes:
+    # Deterministic filler content, so that the same inputs always produce the same digests.
+    block = hashlib.sha256(seed.encode("utf-8")).digest()
+    return (block * (size // len(block) + 1))[:size]
+
+
+def _json_bytes(data: Any) -> bytes:
+    return json.dumps(data, indent=3, sort_keys=True).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class _Response:
+    status: int
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+def _error(
+    status: int, code: str, message: str, headers: Optional[Dict[str, str]] = None
+) -> _Response:
+    body = _json_bytes({"errors": [{"code": code, "message": message, "detail": None}]})
+    return _Response(status, body, {"Content-Type": "application/json", **(headers or {})})
+
+
+class FakeRegistry:
+    """
+    A small Docker registry running on a local port, for tests and benchmarks.
+
+    The registry serves the read only parts of the registry API from generated data: the
+    paginated catalog, tag listings, manifests and manifest lists (by tag or digest), and blobs.
+    Every generated blob is real content with a real digest, so responses can be verified just
+    like those from a real registry.
+
+    Token authentication can be turned on, in which case the registry also serves tokens, and
+    answers requests without a valid token for the right scope with a 401 challenge. Latency can
+    be added to every response, and failures can be injected deterministically: every Nth
+    request can be throttled with a 429, or fail with a 500.
+
+    Only the standard library is used, and the server runs in background threads within the
+    current process. Use it as a context manager, or call start() and stop().
+    """
+
+    def __init__(
+        self,
+        *,
+        token_auth: bool = False,
+        service: str = DEFAULT_SERVICE,
+        token_expires_in: int = 300,
+        latency: float = 0.0,
+        throttle_every: int = 0,
+        fail_every: int = 0,
+        default_page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> None:
+        self.token_auth = token_auth
+        self.service = service
+        self.token_expires_in = token_expires_in
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.fail_every = fail_every
+        self.default_page_size = default_page_size
+
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, bytes] = {}
+        # Manifests are stored per repository as (content type, payload), keyed by digest.
+        self._manifests: Dict[str, Dict[str, Tuple[str, bytes]]] = {}
+        self._tags: Dict[str, Dict[str, str]] = {}
+        self._tokens: Dict[str, FrozenSet[str]] = {}
+        self._request_count = 0
+        self.requests: List[Tuple[str, str]] = []
+        self.token_requests = 0
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # Data
+
+    def add_blob(self, content: bytes, /) -> str:
+        digest = compute_digest(content)
+        with self._lock:
+            self._blobs[digest] = content
+        return digest
+
+    def add_manifest(self, repository: str, content: bytes, content_type: str, /) -> str:
+        digest = compute_digest(content)
+        with self._lock:
+            self._manifests.setdefault(repository, {})[digest] = (content_type, content)
+            self._tags.setdefault(repository, {})
+        return digest
+
+    def tag(self, repository: str, tag: str, digest: str, /) -> None:
+        with self._lock:
+            if digest not in self._manifests.get(repository, {}):
+                raise KeyError(f"Unknown manifest {digest} in repository {repository}.")
+            self._tags[repository][tag] = digest
+
+    def add_image(
+        self,
+        repository: str,
+        tag: str,
+        /,
+        *,
+        platforms: Sequence[str] = ("linux/amd64",),
+        layer_count: int = 2,
+        layer_size: int = 1024,
+        created_at: str = "2021-01-01T00:00:00Z",
+        labels: Optional[Dict[str, str]] = None,
+        env: Sequence[str] = (),
+        manifest_list: Optional[bool] = None,
+    ) -> str:
+        """
+        Generate an image, push it to a repository under the given tag, and return its digest.
+
+        Each platform gets its own config and layers, except for the first layer, which is
+        shared by every image for the same platform, like a common base image. A manifest list is
+        generated when there's more than one platform, or when manifest_list is set.
+        """
+        refs: List[Dict[str, Any]] = []
+        for platform_name in platforms:
+            platform = Platform.from_name(platform_name)
+            layers = []
+            for index in range(layer_count):
+                seed = (
+                    platform_name if index == 0 else f"{repository}:{tag}:{platform_name}:{index}"
+                )
+                content = _generate_bytes(seed, layer_size)
+                layers.append(
+                    {
+                        "mediaType": LAYER_CONTENT_TYPE,
+                        "size": len(content),
+                        "digest": self.add_blob(content),
+                    }
+                )
+
+            config: Dict[str, Any] = {
+                "architecture": platform.architecture,
+                "os": platform.os,
+                "created": created_at,
+                "config": {"Env": list(env), "Labels": dict(labels or {})},
+                "history": [
+                    {"created": created_at, "created_by": f"/bin/sh -c #(nop) ADD layer {index}"}
+                    for index in range(layer_count)
+                ],
+                "rootfs": {"type": "layers", "diff_ids": [layer["digest"] for layer in layers]},
+            }
+            if platform.variant:
+                config["variant"] = platform.variant
+            config_content = _json_bytes(config)
+            manifest_content = _json_bytes(
+                {
+                    "schemaVersion": 2,
+                    "mediaType": schema_2,
+                    "config": {
+                        "mediaType": CONFIG_CONTENT_TYPE,
+                        "size": len(config_content),
+                        "digest": self.add_blob(config_content),
+                    },
+                    "layers": layers,
+                }
+            )
+            platform_data = {"architecture": platform.architecture, "os": platform.os}
+            if platform.variant:
+                platform_data["variant"] = platform.variant
+            refs.append(
+                {
+                    "mediaType": schema_2,
+                    "size": len(manifest_content),
+                    "digest": self.add_manifest(repository, manifest_content, schema_2),
+                    "platform": platform_data,
+                }
+            )
+
+        if manifest_list is None:
+            manifest_list = len(refs) > 1
+        if manifest_list:
+            content = _json_bytes(
+                {"schemaVersion": 2, "mediaType": schema_2_list, "manifests": refs}
+            )
+            digest = self.add_manifest(repository, content, schema_2_list)
+        else:
+            (ref,) = refs
+            digest = ref["digest"]
+        self.tag(repository, tag, digest)
+        return digest
+
+    def populate(
+        self, repository_count: int, tags_per_repository: int, /, **image_options: Any
+    ) -> None:
+        """
+        Generate many repositories, each with many tagged images.
+        """
+        for repository_index in range(repository_count):
+            repository = f"repo{repository_index:05d}/app"
+            for tag_index in range(tags_per_repository):
+                self.add_image(repository, f"v{tag_index}", **image_options)
+
+    @property
+    def repositories(self) -> Sequence[str]:
+        with self._lock:
+            return sorted(self._tags)
+
+    def tags(self, repository: str, /) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._tags[repository])
+
+    # Server
+
+    @property
+    def port(self) -> int:
+        if self._server is None:
+            raise RuntimeError("The fake registry isn't running.")
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v2/"
+
+    @property
+    def token_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/token"
+
+    def start(self) -> FakeRegistry:
+        if self._server is not None:
+            return self
+
+        registry = self
+
+        class Handler(_RequestHandler):
+            fake = registry
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            # A short poll interval keeps stopping the server quick.
+            kwargs={"poll_interval": 0.05},
+            name="fake-registry",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self) -> FakeRegistry:
+        return self.start()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.stop()
+
+    def build_registry(self) -> Registry:
+        """
+        Build a Registry that talks to this fake registry, using token auth when it's enabled.
+        """
+        # Imported here, so that importing this module stays cheap.
+        from .auth_service import DockerTokenAuthService
+        from .registry import Registry
+
+        auth_service = None
+        if self.token_auth:
+            auth_service = DockerTokenAuthService.build_with_session(self.token_url, self.service)
+        return Registry.build_with_manual_client(self.base_url, auth_service=auth_service)
+
+    # Request handling
+
+    def _handle(
+        self, method: str, path: str, query: Dict[str, List[str]], headers: Any
+    ) -> _Response:
+        with self._lock:
+            self._request_count += 1
+            count = self._request_count
+            self.requests.append((method, path))
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.throttle_every and count % self.throttle_every == 0:
+            return _error(429, "TOOMANYREQUESTS", "Too many requests.", {"Retry-After": "1"})
+        if self.fail_every and count % self.fail_every == 0:
+            return _error(500, "UNKNOWN", "Injected failure.")
+
+        if path == "/token":
+            return self._issue_token(query)
+
+        scope = self._scope_for(path)
+        if scope is None:
+            return _error(404, "NOT_FOUND", "Unknown endpoint.")
+        if self.token_auth and not self._authorised(headers.get("Authorization", ""), scope):
+            challenge = f'Bearer realm="{self.token_url}",service="{self.service}",scope="{scope}"'
+            return _error(
+                401, "UNAUTHORIZED", "Authentication required.", {"WWW-Authenticate": challenge}
+            )
+
+        if path == "/v2/":
+            return _Response(200, b"{}", {"Content-Type": "application/json"})
+        if path == "/v2/_catalog":
+            return self._catalog(query)
+
+        match = _TAGS_PATH.match(path)
+        if match:
+            return self._tag_list(match["name"])
+        match = _MANIFEST_PATH.match(path)
+        if match:
+            return self._manifest(match["name"], match["reference"])
+        match = _BLOB_PATH.match(path)
+        if match:
+            return self._blob(match["digest"])
+        return _error(404, "NOT_FOUND", "Unknown endpoint.")  # pragma: no cover
+
+    @staticmethod
+    def _scope_for(path: str) -> Optional[str]:
+        if path == "/v2/":
+            return ""
+        if path == "/v2/_catalog":
+            return "registry:catalog:*"
+        for pattern in (_TAGS_PATH, _MANIFEST_PATH, _BLOB_PATH):
+            match = pattern.match(path)
+            if match:
+                return f"repository:{match['name']}:pull"
+        return None
+
+    def _authorised(self, authorization: str, scope: str) -> bool:
+        scheme, _, token = authorization.partition(" ")
+        if scheme != "Bearer":
+            return False
+        with self._lock:
+            granted = self._tokens.get(token)
+        if granted is None:
+            return False
+        if not scope:
+            return True
+        if scope in granted:
+            return True
+        # A repository scope with every action (like the client requests) also grants pull.
+        kind, _, rest = scope.partition(":")
+        name = rest.rpartition(":")[0]
+        return f"{kind}:{name}:*" in granted
+
+    def _issue_token(self, query: Dict[str, List[str]]) -> _Response:
+        if query.get("service", [None])[0] != self.service:
+            return _error(400, "INVALID_REQUEST", "Unknown service.")
+        token = secrets.token_hex(16)
+        with self._lock:
+            self._tokens[token] = frozenset(query.get("scope", ()))
+            self.token_requests += 1
+        body = _json_bytes({"token": token, "expires_in": self.token_expires_in})
+        return _Response(200, body, {"Content-Type": "application/json"})
+
+    def _catalog(self, query: Dict[str, List[str]]) -> _Response:
+        page_size = int(query.get("n", [self.default_page_size])[0])
+        last = query.get("last", [""])[0]
+        names = [name for name in self.repositories if name > last]
+        page = names[:page_size]
+        headers = {"Content-Type": "application/json"}
+        if len(names) > page_size:
+            headers["Link"] = f'</v2/_catalog?last={quote(page[-1])}&n={page_size}>; rel="next"'
+        return _Response(200, _json_bytes({"repositories": page}), headers)
+
+    def _tag_list(self, name: str) -> _Response:
+        with self._lock:
+            tags = self._tags.get(name)
+            if tags is None:
+                return _error(404, "NAME_UNKNOWN", "Repository name not known to registry.")
+            body = _json_bytes({"name": name, "tags": sorted(tags)})
+        return _Response(200, body, {"Content-Type": "application/json"})
+
+    def _manifest(self, name: str, reference: str) -> _Response:
+        with self._lock:
+            digest = self._tags.get(name, {}).get(reference, reference)
+            manifest = self._manifests.get(name, {}).get(digest)
+        if manifest is None:
+            return _error(404, "MANIFEST_UNKNOWN", "Manifest unknown.")
+        content_type, content = manifest
+        return _Response(
+            200, content, {"Content-Type": content_type, "Docker-Content-Digest": digest}
+        )
+
+    def _blob(self, digest: str) -> _Response:
+        with self._lock:
+            content = self._blobs.get(digest)
+        if content is None:
+            return _error(404, "BLOB_UNKNOWN", "Blob unknown to registry.")
+        return _Response(
+            200,
+            content,
+            {"Content-Type": "application/octet-stream", "Docker-Content-Digest": digest},
+        )
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    fake: FakeRegistry
+    protocol_version = "HTTP/1.1"
+
+    def _respond(self, include_body: bool) -> None:
+        url = urlsplit(self.path)
+        response = self.fake._handle(self.command, url.path, parse_qs(url.query), self.headers)
+        self.send_response(response.status)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(response.body)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(response.body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._respond(include_body=True)
+
+    def do_HEAD(self) -> None:  # noqa: N802
+        self._respond(include_body=False)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+
+__all__ = ("FakeRegistry",)
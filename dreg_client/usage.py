@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import heapq
+from array import array
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Sequence, Set, Tuple
+
+from .cleanup import manifest_blobs
+from .crawl import CrawlRecord, ImageRecord, TagRecord
+
+
+DEFAULT_TOP = 10
+
+
+def namespace_of(repository: str) -> str:
+    namespace, sep, _ = repository.partition("/")
+    return namespace if sep else "library"
+
+
+@dataclass(frozen=True)
+class StorageUsage:
+    name: str
+    # Bytes referenced, with every blob counted once.
+    total_bytes: int
+    # Bytes only referenced from here.
+    unique_bytes: int
+
+    @property
+    def shared_bytes(self) -> int:
+        return self.total_bytes - self.unique_bytes
+
+
+@dataclass(frozen=True)
+class UsageReport:
+    total_bytes: int
+    shared_bytes: int
+    blob_count: int
+    repositories: Mapping[str, StorageUsage]
+    namespaces: Mapping[str, StorageUsage]
+    largest_repositories: Sequence[StorageUsage]
+    largest_blobs: Sequence[Tuple[str, int]]
+
+
+class UsageAnalyzer:
+    """
+    Works out how much storage a registry uses, counting each blob only once.
+
+    Crawl records are consumed one at a time, and only a compact table of blob sizes is kept,
+    rather than the manifests themselves. Each blob digest is interned as a small integer, with
+    the sizes held in an array indexed by those integers. Repositories are reduced to the set
+    of image digests their tags point at, and images to an array of the blobs they contain.
+    """
+
+    def __init__(self) -> None:
+        self._blob_ids: Dict[str, int] = {}
+        self._blob_digests: List[str] = []
+        self._sizes = array("q")
+        self._image_blobs: Dict[str, array[int]] = {}
+        self._repository_images: Dict[str, Set[str]] = {}
+
+    def _blob_id(self, digest: str, size: int) -> int:
+        blob_id = self._blob_ids.get(digest)
+        if blob_id is None:
+            blob_id = len(self._sizes)
+            self._blob_ids[digest] = blob_id
+            self._blob_digests.append(digest)
+            self._sizes.append(size)
+        elif size > self._sizes[blob_id]:
+            # Legacy manifests don't record sizes, so a known size replaces an unknown one.
+            self._sizes[blob_id] = size
+        return blob_id
+
+    def add_image(self, digest: str, blobs: Mapping[str, int], /) -> None:
+        blob_ids = array("l", sorted(self._blob_id(blob, size) for blob, size in blobs.items()))
+        self._image_blobs[digest] = blob_ids
+
+    def add_tag(self, repository: str, digest: str, /) -> None:
+        self._repository_images.setdefault(repository, set()).add(digest)
+
+    def add_record(self, record: CrawlRecord, /) -> None:
+        if isinstance(record, TagRecord):
+            self.add_tag(record.repository, record.digest)
+        elif isinstance(record, ImageRecord):
+            blobs = dict(manifest_blobs(record.manifest))
+            for image in record.platform_images:
+                blobs[image.config.digest] = image.config.content_length
+                for layer in image.layers:
+                    blobs[layer.digest] = layer.size
+            self.add_image(record.digest, blobs)
+
+    def add_records(self, records: Iterable[CrawlRecord], /) -> None:
+        for record in records:
+            self.add_record(record)
+
+    def _blobs_of(self, image_digests: Iterable[str]) -> FrozenSet[int]:
+        blob_ids: Set[int] = set()
+        for digest in image_digests:
+            blob_ids.update(self._image_blobs.get(digest, ()))
+        return frozenset(blob_ids)
+
+    def _usage(self, groups: Mapping[str, Set[str]]) -> Tuple[Dict[str, StorageUsage], array[int]]:
+        # Counts how many groups refer to each blob first, so that unique bytes can be worked
+        # out on a second pass without holding the blobs of every group at once.
+        counts = array("l", [0]) * len(self._sizes)
+        for images in groups.values():
+            for blob_id in self._blobs_of(images):
+                counts[blob_id] += 1
+
+        usage: Dict[str, StorageUsage] = {}
+        for name, images in groups.items():
+            total = unique = 0
+            for blob_id in self._blobs_of(images):
+                size = self._sizes[blob_id]
+                total += size
+                if counts[blob_id] == 1:
+                    unique += size
+            usage[name] = StorageUsage(name, total, unique)
+        return usage, counts
+
+    def report(self, *, top: int = DEFAULT_TOP) -> UsageReport:
+        repositories, counts = self._usage(self._repository_images)
+
+        namespace_images: Dict[str, Set[str]] = {}
+        for repository, images in self._repository_images.items():
+            namespace_images.setdefault(namespace_of(repository), set()).update(images)
+        namespaces, _ = self._usage(namespace_images)
+
+        total_bytes = shared_bytes = blob_count = 0
+        for blob_id, count in enumerate(counts):
+            if count:
+                blob_count += 1
+                total_bytes += self._sizes[blob_id]
+                if count > 1:
+                    shared_bytes += self._sizes[blob_id]
+
+        largest_blobs = heapq.nlargest(
+            top,
+            (
+                (self._blob_digests[blob_id], self._sizes[blob_id])
+                for blob_id, count in enumerate(counts)
+                if count
+            ),
+            key=lambda blob: blob[1],
+        )
+        return UsageReport(
+            total_bytes=total_bytes,
+            shared_bytes=shared_bytes,
+            blob_count=blob_count,
+            repositories=repositories,
+            namespaces=namespaces,
+            largest_repositories=heapq.nlargest(
+                top, repositories.values(), key=lambda usage: usage.unique_bytes
+            ),
+            largest_blobs=largest_blobs,
+        )
+
+
+def analyze_usage(records: Iterable[CrawlRecord], /, *, top: int = DEFAULT_TOP) -> UsageReport:
+    """
+    Build a storage usage report from the records of a crawl.
+    """
+    analyzer = UsageAnalyzer()
+    analyzer.add_records(records)
+    return analyzer.report(top=top)
+
+
+__all__ = (
+    "StorageUsage",
+    "UsageAnalyzer",
+    "UsageReport",
+    "analyze_usage",
+    "namespace_of",
+)
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ._concurrency import bounded_map
+from .repository import DEFAULT_MAX_CONCURRENCY, Repository
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class TagChange:
+    repository: str
+    tag: str
+    old_digest: Optional[str]
+    new_digest: Optional[str]
+
+
+class _WatchedTag:
+    __slots__ = ("repository", "tag", "digest", "known", "interval", "generation")
+
+    def __init__(self, repository: Repository, tag: str, digest: Optional[str], interval: float):
+        self.repository = repository
+        self.tag = tag
+        self.digest = digest
+        self.known = digest is not None
+        self.interval = interval
+        self.generation = 0
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.repository.name, self.tag
+
+
+class TagWatcher:
+    """
+    Watches tags for changes to the digests they point at.
+
+    Tags are polled using HEAD requests only. Each tag has its own polling interval, which is
+    reset to min_interval whenever the tag changes, and grows by a factor of backoff (up to
+    max_interval) every time a poll finds the tag unchanged. Every interval is randomly varied
+    by up to the jitter fraction, so that polls of tags watched at the same time drift apart.
+
+    The first poll of a tag establishes its digest without reporting a change, unless a known
+    digest is supplied when the tag is watched. A tag that disappears is reported as a change
+    to a digest of None. A poll that finds the tag without a digest header is treated as a
+    failed poll, rather than as the tag disappearing.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_interval: float = 60.0,
+        max_interval: float = 3600.0,
+        backoff: float = 2.0,
+        jitter: float = 0.1,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError(
+                "Polling intervals must be positive, with min_interval <= max_interval."
+            )
+        if backoff < 1:
+            raise ValueError("backoff must be at least 1.")
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be at least 0 and less than 1.")
+
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._jitter = jitter
+        self._max_concurrency = max_concurrency
+        self._clock = clock
+        self._rng = rng if rng is not None else random.Random()
+
+        self._lock = threading.Lock()
+        self._watched: Dict[Tuple[str, str], _WatchedTag] = {}
+        # Entries are (due time, tiebreaker, key, generation). Entries with an outdated
+        # generation have been superseded, and are discarded when they reach the top.
+        self._schedule: List[Tuple[float, int, Tuple[str, str], int]] = []
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._watched)
+
+    def _push(self, watched: _WatchedTag, due: float) -> None:
+        watched.generation += 1
+        self._counter += 1
+        heapq.heappush(self._schedule, (due, self._counter, watched.key, watched.generation))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * self._rng.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def watch(self, repository: Repository, tag: str, /, *, digest: Optional[str] = None) -> None:
+        """
+        Start watching a tag.
+
+        The first poll happens at a random point within min_interval, to spread out the polls of
+        many tags watched at once.
+        """
+        with self._lock:
+            watched = _WatchedTag(repository, tag, digest, self._min_interval)
+            if watched.key in self._watched:
+                return
+            self._watched[watched.key] = watched
+
+            self._push(watched, self._clock() + self._rng.uniform(0, self._min_interval))
+
+    def unwatch(self, repository: Repository, tag: str, /) -> None:
+        with self._lock:
+            self._watched.pop((repository.name, tag), None)
+
+    def digest(self, repository: Repository, tag: str, /) -> Optional[str]:
+        with self._lock:
+            watched = self._watched.get((repository.name, tag))
+            return watched.digest if watched is not None else None
+
+    def next_poll_in(self) -> Optional[float]:
+        """
+        Return the number of seconds until the next poll is due, or None if nothing is watched.
+        """
+        with self._lock:
+            self._discard_superseded()
+            if not self._schedule:
+                return None
+            return max(0.0, self._schedule[0][0] - self._clock())
+
+    def _discard_superseded(self) -> None:
+        while self._schedule:
+            _, _, key, generation = self._schedule[0]
+            watched = self._watched.get(key)
+            if watched is not None and watched.generation == generation:
+                return
+            heapq.heappop(self._schedule)
+
+    def _take_due(self) -> List[_WatchedTag]:
+        due: List[_WatchedTag] = []
+        with self._lock:
+            now = self._clock()
+            while True:
+                self._discard_superseded()
+                if not self._schedule or self._schedule[0][0] > now:
+                    break
+                _, _, key, _ = heapq.heappop(self._schedule)
+                # Stops the tag from being taken twice while its poll is in progress.
+                watched = self._watched[key]
+                watched.generation += 1
+                due.append(watched)
+        return due
+
+    @staticmethod
+    def _check(watched: _WatchedTag) -> Tuple[bool, Optional[str]]:
+        try:
+            return True, watched.repository.check_manifest(watched.tag, require_digest=True)
+        except Exception as exc:
+            # Any failure, such as a request error, an auth service failure or a response without
+            # a digest, is treated as a failed poll. Letting it escape would leave the tag out of
+            # the schedule for good.
+            logger.warning("Failed to poll %s:%s: %s", watched.repository.name, watched.tag, exc)
+            return False, None
+
+    def _record(
+        self, watched: _WatchedTag, succeeded: bool, digest: Optional[str]
+    ) -> Optional[TagChange]:
+        with self._lock:
+            if self._watched.get(watched.key) is not watched:
+                # Unwatched while the poll was in progress.
+                return None
+
+            change: Optional[TagChange] = None
+            if not succeeded or (watched.known and digest == watched.digest):
+                watched.interval = min(watched.interval * self._backoff, self._max_interval)
+            elif not watched.known:
+                watched.digest = digest
+                watched.known = True
+            else:
+                change = TagChange(watched.repository.name, watched.tag, watched.digest, digest)
+                watched.digest = digest
+                watched.interval = self._min_interval
+
+            self._push(watched, self._clock() + self._jittered(watched.interval))
+            return change
+
+    def poll(self) -> Sequence[TagChange]:
+        """
+        Poll every tag that is due, and return the changes found.
+        """
+        changes: List[TagChange] = []
+        for watched, (succeeded, digest) in bounded_map(
+            self._check, self._take_due(), max_concurrency=self._max_concurrency
+        ):
+            change = self._record(watched, succeeded, digest)
+            if change is not None:
+                changes.append(change)
+        return changes
+
+    async def poll_async(self) -> Sequence[TagChange]:
+        """
+        Poll every tag that is due from an asyncio event loop, and return the changes found.
+
+        The HEAD requests are made from the loop's default executor, with no more than
+        max_concurrency of them in flight at once.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def check(watched: _WatchedTag) -> Optional[TagChange]:
+            async with semaphore:
+                succeeded, digest = await loop.run_in_executor(None, self._check, watched)
+            return self._record(watched, succeeded, digest)
+
+        results = await asyncio.gather(*(check(watched) for watched in self._take_due()))
+        return [change for change in results if change is not None]
+
+    def run(
+        self,
+        callback: Callable[[TagChange], None],
+        /,
+        *,
+        stop: threading.Event,
+        idle_interval: Optional[float] = None,
+    ) -> None:
+        """
+        Poll tags as they become due, until the stop event is set.
+
+        The callback is called with each change as it's found. When nothing is being watched,
+        the watcher checks for newly watched tags every idle_interval seconds, which defaults
+        to min_interval.
+        """
+        if idle_interval is None:
+            idle_interval = self._min_interval
+        while not stop.is_set():
+            for change in self.poll():
+                callback(change)
+            wait_for = self.next_poll_in()
+            stop.wait(idle_interval if wait_for is None else min(wait_for, idle_interval))
+
+    async def run_async(
+        self,
+        callback: Callable[[TagChange], None],
+        /,
+        *,
+        stop: asyncio.Event,
+        idle_interval: Optional[float] = None,
+    ) -> None:
+        """
+        The asyncio equivalent of run().
+        """
+        if idle_interval is None:
+            idle_interval = self._min_interval
+        while not stop.is_set():
+            for change in await self.poll_async():
+                callback(change)
+            wait_for = self.next_poll_in()
+            try:
+                await asyncio.wait_for(
+                    stop.wait(), idle_interval if wait_for is None else min(wait_for, idle_interval)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+
+__all__ = (
+    "TagChange",
+    "TagWatcher",
+)
@@ -14,13 +14,16 @@ else:
 
 @task
 def reformat(c):
-    c.run("isort dreg_client tests setup.py tasks.py docker-registry-show.py", pty=pty)
-    c.run("black dreg_client tests setup.py tasks.py docker-registry-show.py", pty=pty)
+    c.run("isort dreg_client tests benchmarks setup.py tasks.py docker-registry-show.py", pty=pty)
+    c.run("black dreg_client tests benchmarks setup.py tasks.py docker-registry-show.py", pty=pty)
 
 
 @task
 def lint(c):
-    c.run("flake8 --show-source --statistics dreg_client tests docker-registry-show.py", pty=pty)
+    c.run(
+        "flake8 --show-source --statistics dreg_client tests benchmarks docker-registry-show.py",
+        pty=pty,
+    )
     c.run("check-manifest", pty=pty)
 
 
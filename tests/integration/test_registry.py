@@ -6,7 +6,7 @@ import pytest
 from docker import DockerClient
 from requests import HTTPError
 
-import dreg_client.repository as _repository
+import dreg_client.image as _image
 from dreg_client import Image, Manifest, Platform, PlatformImage, Registry
 
 from ..util import spy
@@ -45,11 +45,15 @@ def test_client_image_interactions_single_arch(docker_client: DockerClient, fixt
     manifest = repo.get_manifest("x-dreg-test")
     assert isinstance(manifest, Manifest)
 
-    with spy(_repository, "synth_manifest_list_from_manifest") as synth_spy:
+    with spy(_image, "synth_manifest_list_from_manifest") as synth_spy:
         image = repo.get_image("x-dreg-test")
-    assert isinstance(image, Image)
+        assert isinstance(image, Image)
+        assert image.digest == manifest.digest
+        synth_spy.assert_not_called()
+
+        manifest_list = image.manifest_list
     synth_spy.assert_called_once()
-    assert image.manifest_list is synth_spy.spy_return
+    assert manifest_list is synth_spy.spy_return
 
     assert image.repo == "x-dreg/x-dreg-example"
     assert image.tag == "x-dreg-test"
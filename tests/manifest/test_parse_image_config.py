@@ -1,15 +1,20 @@
+import json
 import re
 from unittest.mock import Mock
 from uuid import uuid4
 
 import pytest
 
+import dreg_client.manifest as _manifest
 from dreg_client.manifest import (
     UnusableImageConfigBlobPayloadError,
     UnusableImageConfigBlobResponseError,
     parse_image_config_blob_response,
 )
 
+from ..conftest import DockerJsonBlob
+from ..util import spy
+
 
 def test_missing_digest_header():
     response = Mock()
@@ -56,3 +61,59 @@ def test_invalid_json():
     errmsg = "^" + re.escape("Non-dictionary payload returned.") + "$"
     with pytest.raises(UnusableImageConfigBlobPayloadError, match=errmsg):
         parse_image_config_blob_response(response)
+
+
+def test_invalid_json_lazy():
+    response = Mock()
+    response.headers = {
+        "Content-Length": "2",
+        "Docker-Content-Digest": str(uuid4()),
+    }
+    response.json.return_value = []
+
+    errmsg = "^" + re.escape("Non-dictionary payload returned.") + "$"
+    with pytest.raises(UnusableImageConfigBlobPayloadError, match=errmsg):
+        parse_image_config_blob_response(response, lazy=True)
+
+
+def test_lazy_matches_eager(blob_container_image_v1: DockerJsonBlob):
+    content = json.dumps(blob_container_image_v1).encode()
+    response = Mock()
+    response.headers = {
+        "Content-Length": str(len(content)),
+        "Docker-Content-Digest": "sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667",
+    }
+    response.json.return_value = blob_container_image_v1
+
+    eager_config = parse_image_config_blob_response(response)
+    lazy_config = parse_image_config_blob_response(response, lazy=True)
+
+    assert lazy_config == eager_config
+    assert lazy_config.platform == eager_config.platform
+    assert lazy_config.created_at == eager_config.created_at
+    assert dict(lazy_config.config) == eager_config.config
+    assert dict(lazy_config.rootfs) == eager_config.rootfs
+    assert tuple(lazy_config.history) == eager_config.history
+    assert lazy_config.history == eager_config.history
+    assert eager_config.history == lazy_config.history
+    assert tuple(lazy_config.non_empty_history) == tuple(eager_config.non_empty_history)
+    assert lazy_config.history[0].clean_created_by == eager_config.history[0].clean_created_by
+
+
+def test_lazy_defers_history(blob_container_image_v1: DockerJsonBlob):
+    content = json.dumps(blob_container_image_v1).encode()
+    response = Mock()
+    response.headers = {
+        "Content-Length": str(len(content)),
+        "Docker-Content-Digest": str(uuid4()),
+    }
+    response.json.return_value = blob_container_image_v1
+
+    with spy(_manifest, "_parse_image_history") as history_spy:
+        config = parse_image_config_blob_response(response, lazy=True)
+        assert config.platform_name == "linux/amd64"
+        history_spy.assert_not_called()
+
+        assert len(config.history) == 1
+        assert len(config.history) == 1
+        history_spy.assert_called_once()
@@ -1,10 +1,17 @@
+import json
 import re
+from hashlib import sha256
 from unittest.mock import Mock
 from uuid import uuid4
 
 import pytest
 
 from dreg_client.manifest import (
+    ArtifactRef,
+    Manifest,
+    ManifestDigestMismatchError,
+    ManifestList,
+    Platform,
     UnusableManifestPayloadError,
     UnusableManifestResponseError,
     parse_manifest_response,
@@ -132,3 +139,190 @@ def test_mismatched_list_content_type():
     errmsg = "^" + re.escape("Mismatched media type between headers and payload.") + "$"
     with pytest.raises(UnusableManifestPayloadError, match=errmsg):
         parse_manifest_response(response)
+
+
+def test_oci_manifest():
+    response = Mock()
+    response.headers = {
+        "Content-Length": "42",
+        "Content-Type": "application/vnd.oci.image.manifest.v1+json",
+        "Docker-Content-Digest": "sha256:c2e7a4b4a4f2a0c2c2b3df3bd5cd1de5ad8ad43a1e4d20e3dd84e11e2d1b2d51",
+    }
+    response.json.return_value = {
+        "schemaVersion": 2,
+        "config": {
+            "mediaType": "application/vnd.oci.image.config.v1+json",
+            "digest": "sha256:7dd0ea28ac1a8b4d1e9e7b7dccf5fbc5bd0b8d1e0a6cb9bc6f0ae6d8d2df2c4e",
+            "size": 1470,
+        },
+        "layers": [
+            {
+                "mediaType": "application/vnd.oci.image.layer.v1.tar+gzip",
+                "digest": "sha256:e4c58958181a5925816faa528ce959e487632f4cfd192f8132f71b32df2744b4",
+                "size": 27145915,
+            },
+        ],
+    }
+
+    manifest = parse_manifest_response(response)
+    assert isinstance(manifest, Manifest)
+    assert manifest.content_type == "application/vnd.oci.image.manifest.v1+json"
+    assert manifest.config.content_type == "application/vnd.oci.image.config.v1+json"
+    assert manifest.image_size == 27145915
+
+
+def test_oci_index():
+    response = Mock()
+    response.headers = {
+        "Content-Length": "42",
+        "Content-Type": "application/vnd.oci.image.index.v1+json",
+        "Docker-Content-Digest": "sha256:c2e7a4b4a4f2a0c2c2b3df3bd5cd1de5ad8ad43a1e4d20e3dd84e11e2d1b2d51",
+    }
+    response.json.return_value = {
+        "schemaVersion": 2,
+        "mediaType": "application/vnd.oci.image.index.v1+json",
+        "manifests": [
+            {
+                "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                "digest": "sha256:e692418e4cbaf90ca69d05a66403747baa33ee08806650b51fab815ad7fc331f",
+                "size": 7143,
+                "platform": {"architecture": "arm64", "os": "linux", "variant": "v8"},
+            },
+            {
+                "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                "digest": "sha256:5b0bcabd1ed22e9fb1310cf6c2dec7cdef19f0ad69efa1f392e94a4333501270",
+                "size": 7682,
+                "platform": {"architecture": "amd64", "os": "linux"},
+            },
+            {
+                "mediaType": "application/vnd.oci.image.manifest.v1+json",
+                "digest": "sha256:0d6c8a3c2c5d7aa5c8e7d24ef11e6b42e0e7a3af51b31e1e2f4db7d0c4a2c1b9",
+                "size": 566,
+            },
+        ],
+    }
+
+    manifest_list = parse_manifest_response(response)
+    assert isinstance(manifest_list, ManifestList)
+    assert manifest_list.content_type == "application/vnd.oci.image.index.v1+json"
+    assert len(manifest_list.manifests) == 2
+    assert manifest_list.platforms == Platform.from_names(("linux/arm64/v8", "linux/amd64"))
+    # Entries without a platform are kept separately.
+    assert manifest_list.artifacts == {
+        ArtifactRef(
+            "sha256:0d6c8a3c2c5d7aa5c8e7d24ef11e6b42e0e7a3af51b31e1e2f4db7d0c4a2c1b9",
+            "application/vnd.oci.image.manifest.v1+json",
+            566,
+        )
+    }
+    assert len(manifest_list.referenced_digests) == 3
+
+
+def test_mismatched_oci_content_type():
+    response = Mock()
+    response.headers = {
+        "Content-Length": "42",
+        "Content-Type": "application/vnd.oci.image.index.v1+json",
+        "Docker-Content-Digest": str(uuid4()),
+    }
+    response.json.return_value = {
+        "schemaVersion": 2,
+        "mediaType": "application/vnd.oci.image.manifest.v1+json",
+    }
+
+    errmsg = "^" + re.escape("Mismatched media type between headers and payload.") + "$"
+    with pytest.raises(UnusableManifestPayloadError, match=errmsg):
+        parse_manifest_response(response)
+
+
+def _verifiable_response(content: bytes, digest: str) -> Mock:
+    response = Mock()
+    response.headers = {
+        "Content-Length": str(len(content)),
+        "Content-Type": "application/vnd.docker.distribution.manifest.list.v2+json",
+        "Docker-Content-Digest": digest,
+    }
+    response.content = content
+    return response
+
+
+_list_content = json.dumps(
+    {
+        "schemaVersion": 2,
+        "mediaType": "application/vnd.docker.distribution.manifest.list.v2+json",
+        "manifests": [],
+    }
+).encode()
+_list_digest = "sha256:" + sha256(_list_content).hexdigest()
+
+
+def test_verify_digest():
+    response = _verifiable_response(_list_content, _list_digest)
+
+    manifest_list = parse_manifest_response(
+        response, verify_digest=True, expected_digest=_list_digest
+    )
+    assert isinstance(manifest_list, ManifestList)
+    assert manifest_list.digest == _list_digest
+    response.json.assert_not_called()
+
+
+def test_verify_digest_header_mismatch():
+    wrong_digest = "sha256:" + sha256(b"docker").hexdigest()
+    response = _verifiable_response(_list_content, wrong_digest)
+
+    errmsg = "^" + re.escape("Digest of payload does not match the expected digest.") + "$"
+    with pytest.raises(ManifestDigestMismatchError, match=errmsg) as exc_info:
+        parse_manifest_response(response, verify_digest=True)
+
+    assert exc_info.value.expected_digest == wrong_digest
+    assert exc_info.value.actual_digest == _list_digest
+
+
+def test_verify_digest_expected_mismatch():
+    wrong_digest = "sha256:" + sha256(b"docker").hexdigest()
+    response = _verifiable_response(_list_content, _list_digest)
+
+    errmsg = "^" + re.escape("Digest of payload does not match the expected digest.") + "$"
+    with pytest.raises(ManifestDigestMismatchError, match=errmsg) as exc_info:
+        parse_manifest_response(response, verify_digest=True, expected_digest=wrong_digest)
+
+    assert exc_info.value.expected_digest == wrong_digest
+
+
+def test_expected_digest_implies_verification():
+    wrong_digest = "sha256:" + sha256(b"docker").hexdigest()
+    response = _verifiable_response(_list_content, _list_digest)
+
+    errmsg = "^" + re.escape("Digest of payload does not match the expected digest.") + "$"
+    with pytest.raises(ManifestDigestMismatchError, match=errmsg):
+        parse_manifest_response(response, expected_digest=wrong_digest)
+
+
+def test_verify_digest_unknown_algorithm():
+    response = _verifiable_response(_list_content, "docker:" + str(uuid4()))
+
+    errmsg = "^" + re.escape("Unsupported digest algorithm specified.") + "$"
+    with pytest.raises(UnusableManifestResponseError, match=errmsg):
+        parse_manifest_response(response, verify_digest=True)
+
+
+def test_retain_content():
+    response = _verifiable_response(_list_content, _list_digest)
+
+    manifest_list = parse_manifest_response(response, retain_content=True)
+    assert manifest_list.raw_content is _list_content
+    raw_content_view = manifest_list.raw_content_view
+    assert isinstance(raw_content_view, memoryview)
+    assert raw_content_view.readonly
+    assert raw_content_view.tobytes() == _list_content
+    response.json.assert_not_called()
+
+
+def test_content_not_retained_by_default():
+    response = _verifiable_response(_list_content, _list_digest)
+    response.json.return_value = json.loads(_list_content)
+
+    manifest_list = parse_manifest_response(response)
+    assert manifest_list.raw_content is None
+    assert manifest_list.raw_content_view is None
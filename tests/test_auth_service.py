@@ -1,7 +1,9 @@
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Callable, Mapping, Tuple
+from typing import Any, Callable, List, Mapping, Tuple
 from uuid import uuid4
 
 import pytest
@@ -9,12 +11,14 @@ import responses
 from freezegun import freeze_time
 
 from dreg_client.auth_service import (
+    SCOPE_SEPARATOR,
     AuthService,
     AuthServiceFailure,
     AuthToken,
     DockerTokenAuthService,
     make_expires_at,
 )
+from dreg_client.client import Client
 
 
 # TODO: This should be importable directly from the responses package
@@ -290,6 +294,69 @@ def test_repeat_request_token_different_scope(
         assert len(rsps.calls) == 2
 
 
+def test_request_token_multiple_scopes(auth_service: DockerTokenAuthService):
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.GET, "https://auth.example.com:5000/token", json={"token": "abc"})
+
+        scope = "repository:dstrepo:* repository:srcrepo:pull"
+        assert auth_service.request_token(scope) == "abc"
+
+        # Each scope is sent as a separate parameter.
+        assert rsps.calls[0].request.url == (
+            "https://auth.example.com:5000/token?service=registry.example.com"
+            "&scope=repository%3Adstrepo%3A%2A&scope=repository%3Asrcrepo%3Apull"
+        )
+
+
+def test_auth_service_receives_joined_scopes():
+    class RecordingAuthService:
+        def __init__(self) -> None:
+            self.scopes: List[str] = []
+
+        def request_token(self, scope: str) -> str:
+            self.scopes.append(scope)
+            return "abc"
+
+    auth_service = RecordingAuthService()
+    assert isinstance(auth_service, AuthService)
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            rsps.POST, "https://registry.example.com:5000/v2/dstrepo/blobs/uploads/", status=201
+        )
+        client = Client.build_with_session(
+            "https://registry.example.com:5000/v2/", auth_service=auth_service
+        )
+        client.mount_blob("dstrepo", "sha256:abc", "srcrepo")
+
+    (scope,) = auth_service.scopes
+    assert scope.split(SCOPE_SEPARATOR) == ["repository:dstrepo:*", "repository:srcrepo:pull"]
+
+
+def test_concurrent_request_token(auth_service: DockerTokenAuthService):
+    with responses.RequestsMock() as rsps:
+
+        def mkbody() -> Mapping[str, Any]:
+            # Give every other thread the chance to ask for the same token.
+            time.sleep(0.05)
+            return {"token": str(uuid4()), "expires_in": 60}
+
+        for scope in ("repository:one:pull", "repository:two:pull"):
+            rsps.add_callback(
+                rsps.GET,
+                f"https://auth.example.com:5000/token?scope={scope}&service=registry.example.com",
+                callback=cbreq(mkbody),
+                match_querystring=True,
+            )
+
+        scopes = ["repository:one:pull", "repository:two:pull"] * 8
+        with ThreadPoolExecutor(max_workers=len(scopes)) as executor:
+            tokens = list(executor.map(auth_service.request_token, scopes))
+
+        assert len(set(tokens[0::2])) == 1
+        assert len(set(tokens[1::2])) == 1
+        assert len(rsps.calls) == 2
+
+
 def test_auth_failure(auth_service: DockerTokenAuthService):
     with responses.RequestsMock() as rsps:
         rsps.add(
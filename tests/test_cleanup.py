@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict
+from unittest.mock import Mock
+
+import pytest
+from requests import HTTPError, Response
+
+from dreg_client.cleanup import (
+    CleanupPlanner,
+    CleanupProgress,
+    DeletionPlan,
+    execute_plan,
+    manifest_blobs,
+)
+from dreg_client.manifest import (
+    ImageConfigRef,
+    ImageLayerRef,
+    Manifest,
+    ManifestList,
+    ManifestParseOutput,
+    ManifestRef,
+    Platform,
+    UnusableManifestResponseError,
+)
+from dreg_client.repository import Repository
+from dreg_client.schemas import schema_2, schema_2_list
+
+
+def make_manifest(digest: str, config: str, *layers: str) -> Manifest:
+    return Manifest(
+        digest=digest,
+        content_type=schema_2,
+        content_length=42,
+        config=ImageConfigRef(config, "application/vnd.docker.container.image.v1+json", 5),
+        layers=tuple(
+            ImageLayerRef(layer, "application/vnd.docker.image.rootfs.diff.tar.gzip", 10)
+            for layer in layers
+        ),
+    )
+
+
+def not_found() -> HTTPError:
+    response = Response()
+    response.status_code = 404
+    return HTTPError("404 Client Error", response=response)
+
+
+@pytest.fixture
+def manifests() -> Dict[str, ManifestParseOutput]:
+    return {
+        "sha256:l1": ManifestList(
+            "sha256:l1",
+            schema_2_list,
+            42,
+            frozenset({ManifestRef("sha256:m1", schema_2, 42, Platform.from_name("linux/amd64"))}),
+        ),
+        "sha256:m1": make_manifest("sha256:m1", "sha256:c1", "sha256:a", "sha256:b"),
+        "sha256:m2": make_manifest("sha256:m2", "sha256:c2", "sha256:b", "sha256:c"),
+        "sha256:m3": make_manifest("sha256:m3", "sha256:c3", "sha256:d"),
+        "sha256:m4": make_manifest("sha256:m4", "sha256:c4", "sha256:e"),
+    }
+
+
+@pytest.fixture
+def client(manifests: Dict[str, ManifestParseOutput]):
+    tags = {
+        "old": "sha256:l1",
+        "new": "sha256:m2",
+        "dup1": "sha256:m3",
+        "dup2": "sha256:m3",
+    }
+
+    def get_manifest(name: str, reference: str, **kwargs) -> ManifestParseOutput:
+        try:
+            return manifests[tags.get(reference, reference)]
+        except KeyError:
+            raise not_found() from None
+
+    client = Mock()
+    client.get_repository_tags.return_value = {"name": "testrepo", "tags": list(tags)}
+    client.check_manifest.side_effect = lambda name, tag, **kwargs: tags.get(tag)
+    client.get_manifest.side_effect = get_manifest
+    return client
+
+
+def test_manifest_blobs(manifests: Dict[str, ManifestParseOutput]):
+    assert manifest_blobs(manifests["sha256:m1"]) == {
+        "sha256:c1": 5,
+        "sha256:a": 10,
+        "sha256:b": 10,
+    }
+    assert manifest_blobs(manifests["sha256:l1"]) == {}
+
+
+def test_plan(client):
+    planner = CleanupPlanner(Repository(client, "testrepo"), max_concurrency=2)
+    plan = planner.plan(("old", "dup1", "unknown"), candidate_digests=("sha256:m4", "sha256:gone"))
+
+    assert plan.repository == "testrepo"
+    assert plan.tags == ("old",)
+    assert plan.undeletable_tags == ("dup1",)
+    assert plan.manifests == ("sha256:l1", "sha256:m4", "sha256:m1")
+    assert plan.blobs == {
+        "sha256:c1": 5,
+        "sha256:a": 10,
+        "sha256:c4": 5,
+        "sha256:e": 10,
+    }
+    assert plan.manifest_lists == (("sha256:l1",),)
+    assert plan.estimated_bytes_freed == 30
+    client.delete_manifest.assert_not_called()
+    client.delete_blob.assert_not_called()
+
+
+def test_plan_nested_lists(client, manifests: Dict[str, ManifestParseOutput]):
+    amd64 = Platform.from_name("linux/amd64")
+    manifests["sha256:l0"] = ManifestList(
+        "sha256:l0",
+        schema_2_list,
+        42,
+        frozenset({ManifestRef("sha256:l1", schema_2_list, 42, amd64)}),
+    )
+    client.check_manifest.side_effect = lambda name, tag, **kwargs: {"outer": "sha256:l0"}.get(tag)
+    client.get_repository_tags.return_value = {"name": "testrepo", "tags": ["outer"]}
+
+    plan = CleanupPlanner(Repository(client, "testrepo")).plan(("outer",))
+
+    assert plan.manifests == ("sha256:l0", "sha256:l1", "sha256:m1")
+    assert plan.manifest_lists == (("sha256:l0",), ("sha256:l1",))
+    assert plan.blobs == {"sha256:c1": 5, "sha256:a": 10, "sha256:b": 10}
+
+
+def test_plan_keeps_nested_children_of_remaining_tags(
+    client, manifests: Dict[str, ManifestParseOutput]
+):
+    amd64 = Platform.from_name("linux/amd64")
+    manifests["sha256:l0"] = ManifestList(
+        "sha256:l0",
+        schema_2_list,
+        42,
+        frozenset({ManifestRef("sha256:l1", schema_2_list, 42, amd64)}),
+    )
+    tags = {"outer": "sha256:l0", "inner": "sha256:l1"}
+    client.check_manifest.side_effect = lambda name, tag, **kwargs: tags.get(tag)
+    client.get_repository_tags.return_value = {"name": "testrepo", "tags": list(tags)}
+
+    plan = CleanupPlanner(Repository(client, "testrepo")).plan(("inner",))
+
+    assert plan.tags == ()
+    assert plan.undeletable_tags == ("inner",)
+    assert plan.manifests == ()
+    assert plan.blobs == {}
+
+
+def test_plan_protected_digests(client):
+    plan = CleanupPlanner(Repository(client, "testrepo")).plan(
+        ("old",), protected_digests=("sha256:m1",)
+    )
+
+    assert plan.manifests == ("sha256:l1",)
+    assert plan.blobs == {}
+
+
+def test_plan_keeps_blobs_of_protected_manifests(client):
+    plan = CleanupPlanner(Repository(client, "testrepo")).plan(
+        (), candidate_digests=("sha256:m4",), protected_digests=("sha256:m1",)
+    )
+
+    assert plan.manifests == ("sha256:m4",)
+    assert plan.blobs == {"sha256:c4": 5, "sha256:e": 10}
+
+
+def test_plan_with_unresolved_tags(client):
+    def check_manifest(name: str, tag: str, *, require_digest: bool = False):
+        if tag == "dup2":
+            raise UnusableManifestResponseError(Mock(), "No digest specified in response headers.")
+        return {"old": "sha256:l1", "new": "sha256:m2"}.get(tag)
+
+    client.check_manifest.side_effect = check_manifest
+    planner = CleanupPlanner(Repository(client, "testrepo"))
+
+    plan = planner.plan(("old", "dup2"))
+    assert plan.tags == ("old",)
+    assert plan.undeletable_tags == ("dup2",)
+
+    with pytest.raises(ValueError, match="^Unable to resolve tags being kept: dup2$"):
+        planner.plan(("old",))
+
+
+def test_plan_round_trip(client):
+    plan = CleanupPlanner(Repository(client, "testrepo")).plan(("old",))
+    data = json.loads(json.dumps(plan.to_dict()))
+    assert data["estimated_bytes_freed"] == plan.estimated_bytes_freed
+    assert DeletionPlan.from_dict(data) == plan
+
+
+def test_execute_plan(client):
+    plan = DeletionPlan(
+        repository="testrepo",
+        tags=("old",),
+        undeletable_tags=(),
+        manifests=("sha256:l1", "sha256:m1"),
+        blobs={"sha256:c1": 5, "sha256:a": 10, "sha256:gone": 20},
+    )
+
+    def delete_blob(name: str, digest: str) -> None:
+        if digest == "sha256:gone":
+            raise not_found()
+
+    client.delete_blob.side_effect = delete_blob
+
+    progress = Mock()
+    result = execute_plan(Repository(client, "testrepo"), plan, progress=progress)
+
+    assert result.deleted_manifests == ("sha256:l1", "sha256:m1")
+    assert sorted(result.deleted_blobs) == ["sha256:a", "sha256:c1", "sha256:gone"]
+    assert result.bytes_freed == 35
+    assert result.failures == {}
+    assert progress.call_count == 5
+    assert progress.call_args.args[0] == CleanupProgress(
+        "blob", progress.call_args.args[0].digest, True, 5, 5
+    )
+
+
+def test_execute_plan_deletes_lists_first(client):
+    plan = DeletionPlan(
+        repository="testrepo",
+        tags=("outer",),
+        undeletable_tags=(),
+        manifests=("sha256:m1", "sha256:l1", "sha256:m4", "sha256:l0"),
+        blobs={"sha256:c1": 5},
+        manifest_lists=(("sha256:l0",), ("sha256:l1",)),
+    )
+    order = []
+    client.delete_manifest.side_effect = lambda name, digest: order.append(digest)
+    client.delete_blob.side_effect = lambda name, digest: order.append(digest)
+
+    result = execute_plan(Repository(client, "testrepo"), plan, max_concurrency=4)
+
+    assert order[:2] == ["sha256:l0", "sha256:l1"]
+    assert sorted(order[2:4]) == ["sha256:m1", "sha256:m4"]
+    assert order[4:] == ["sha256:c1"]
+    assert sorted(result.deleted_manifests) == sorted(plan.manifests)
+
+
+def test_execute_plan_resumes_from_journal(client, tmp_path: Path):
+    plan = DeletionPlan(
+        repository="testrepo",
+        tags=("old",),
+        undeletable_tags=(),
+        manifests=("sha256:l1", "sha256:m1"),
+        blobs={"sha256:c1": 5, "sha256:a": 10},
+    )
+    failure = HTTPError("500 Server Error", response=Mock(status_code=500))
+    client.delete_blob.side_effect = failure
+    journal_path = tmp_path / "journal.txt"
+
+    result1 = execute_plan(Repository(client, "testrepo"), plan, journal_path=journal_path)
+    assert result1.deleted_manifests == ("sha256:l1", "sha256:m1")
+    assert result1.deleted_blobs == ()
+    assert result1.failures == {"sha256:c1": failure, "sha256:a": failure}
+    assert client.delete_manifest.call_count == 2
+
+    client.delete_manifest.reset_mock()
+    client.delete_blob.side_effect = None
+    result2 = execute_plan(Repository(client, "testrepo"), plan, journal_path=journal_path)
+    assert result2.deleted_manifests == ()
+    assert sorted(result2.deleted_blobs) == ["sha256:a", "sha256:c1"]
+    assert result2.failures == {}
+    client.delete_manifest.assert_not_called()
+
+    assert journal_path.read_text(encoding="utf-8").splitlines() == [
+        "manifest sha256:l1",
+        "manifest sha256:m1",
+        *(f"blob {digest}" for digest in result2.deleted_blobs),
+    ]
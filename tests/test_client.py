@@ -2,15 +2,24 @@ from __future__ import annotations
 
 import json
 import re
+from hashlib import sha256
 from unittest.mock import Mock
 
 import pytest
 import responses
 from requests import HTTPError
+from responses import matchers
 
 from dreg_client.auth_service import AuthService
 from dreg_client.client import Client
-from dreg_client.manifest import ImageConfig, LegacyManifest, Platform
+from dreg_client.manifest import (
+    ImageConfig,
+    LegacyManifest,
+    ManifestDigestMismatchError,
+    ManifestList,
+    Platform,
+    UnusableManifestResponseError,
+)
 
 from .conftest import DockerJsonBlob
 
@@ -64,6 +73,30 @@ def test_catalog_success():
         assert client.catalog() == result
 
 
+def test_iter_catalog():
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            rsps.GET,
+            "https://registry.example.com:5000/v2/_catalog",
+            json={"repositories": ["abc", "def"]},
+            headers={"Link": '</v2/_catalog?last=def&n=2>; rel="next"'},
+            match=[matchers.query_param_matcher({"n": "2"})],
+        )
+        rsps.add(
+            rsps.GET,
+            "https://registry.example.com:5000/v2/_catalog",
+            json={"repositories": ["ghi"]},
+            match=[matchers.query_param_matcher({"last": "def", "n": "2"})],
+        )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        catalog = client.iter_catalog(page_size=2)
+        assert next(catalog) == "abc"
+        assert len(rsps.calls) == 1
+        assert list(catalog) == ["def", "ghi"]
+        assert len(rsps.calls) == 2
+
+
 def test_catalog_failure():
     with responses.RequestsMock() as rsps:
         rsps.add(rsps.GET, "https://registry.example.com:5000/v2/_catalog", status=404)
@@ -179,6 +212,20 @@ def test_check_manifest_failure():
         assert exc_info.value.response.status_code == 500
 
 
+def test_check_manifest_without_digest():
+    url = "https://registry.example.com:5000/v2/testns/testrepo/manifests/abcdef"
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.HEAD, url)
+        rsps.add(rsps.HEAD, url)
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        assert client.check_manifest("testns/testrepo", "abcdef") is None
+
+        errmsg = "^" + re.escape("No digest specified in response headers.") + "$"
+        with pytest.raises(UnusableManifestResponseError, match=errmsg):
+            client.check_manifest("testns/testrepo", "abcdef", require_digest=True)
+
+
 def test_get_manifest_success(manifest_v1: DockerJsonBlob):
     # TODO: Clean this up once this PR is released: https://github.com/getsentry/responses/pull/398
     content_length = len(json.dumps(manifest_v1))
@@ -229,6 +276,79 @@ def test_get_manifest_success(manifest_v1: DockerJsonBlob):
         assert manifest2.content == manifest1.content
 
 
+def test_manifest_requests_accept_oci_content_types():
+    accept = ",".join(
+        (
+            "application/vnd.docker.distribution.manifest.list.v2+json",
+            "application/vnd.oci.image.index.v1+json",
+            "application/vnd.docker.distribution.manifest.v2+json",
+            "application/vnd.oci.image.manifest.v1+json",
+        )
+    )
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            rsps.HEAD,
+            "https://registry.example.com:5000/v2/testns/testrepo/manifests/abcdef",
+            headers={
+                "Docker-Content-Digest": "sha256:1a067fa67b5bf1044c411ad73ac82cecd3d4dd2dabe7bc4d4b6dbbd55963b667",
+            },
+            match=[matchers.header_matcher({"Accept": accept})],
+        )
+        rsps.add(
+            rsps.GET,
+            "https://registry.example.com:5000/v2/testns/testrepo/manifests/abcdef",
+            json={"schemaVersion": 2, "manifests": []},
+            content_type="application/vnd.oci.image.index.v1+json",
+            headers={
+                "Content-Length": "36",
+                "Docker-Content-Digest": "sha256:1a067fa67b5bf1044c411ad73ac82cecd3d4dd2dabe7bc4d4b6dbbd55963b667",
+            },
+            match=[matchers.header_matcher({"Accept": accept})],
+        )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        digest = client.check_manifest("testns/testrepo", "abcdef")
+        manifest = client.get_manifest("testns/testrepo", "abcdef")
+
+        assert isinstance(manifest, ManifestList)
+        assert manifest.digest == digest
+
+
+def test_get_manifest_verify_digest():
+    content = json.dumps(
+        {
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.docker.distribution.manifest.list.v2+json",
+            "manifests": [],
+        }
+    ).encode()
+    digest = "sha256:" + sha256(content).hexdigest()
+    wrong_digest = "sha256:" + sha256(b"docker").hexdigest()
+
+    with responses.RequestsMock() as rsps:
+        for reference in (digest, wrong_digest):
+            rsps.add(
+                rsps.GET,
+                f"https://registry.example.com:5000/v2/testns/testrepo/manifests/{reference}",
+                body=content,
+                content_type="application/vnd.docker.distribution.manifest.list.v2+json",
+                headers={
+                    "Content-Length": str(len(content)),
+                    "Docker-Content-Digest": digest,
+                },
+            )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+
+        manifest = client.get_manifest("testns/testrepo", digest, verify_digest=True)
+        assert isinstance(manifest, ManifestList)
+        assert manifest.digest == digest
+
+        with pytest.raises(ManifestDigestMismatchError):
+            client.get_manifest("testns/testrepo", wrong_digest, verify_digest=True)
+
+
 def test_get_manifest_failure():
     with responses.RequestsMock() as rsps:
         rsps.add(
@@ -412,3 +532,112 @@ def test_delete_blob_failure():
                 "sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667",
             )
         assert exc_info.value.response.status_code == 404
+
+
+def test_put_manifest():
+    content = b'{"schemaVersion": 2}'
+    digest = "sha256:" + sha256(content).hexdigest()
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            rsps.PUT,
+            "https://registry.example.com:5000/v2/testns/testrepo/manifests/latest",
+            status=201,
+            headers={"Docker-Content-Digest": digest},
+            match=[
+                matchers.header_matcher(
+                    {"Content-Type": "application/vnd.oci.image.manifest.v1+json"}
+                )
+            ],
+        )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        assert (
+            client.put_manifest(
+                "testns/testrepo", "latest", content, "application/vnd.oci.image.manifest.v1+json"
+            )
+            == digest
+        )
+        assert rsps.calls[0].request.body == content
+
+
+def test_check_blob():
+    url = "https://registry.example.com:5000/v2/testrepo/blobs/sha256:abc"
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.HEAD, url, headers={"Content-Length": "1234"})
+        rsps.add(rsps.HEAD, url, status=404)
+        rsps.add(rsps.HEAD, url, status=500)
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        assert client.check_blob("testrepo", "sha256:abc") == 1234
+        assert client.check_blob("testrepo", "sha256:abc") is None
+        with pytest.raises(HTTPError, match=re.escape("500 Server Error")):
+            client.check_blob("testrepo", "sha256:abc")
+
+
+def test_mount_blob():
+    url = "https://registry.example.com:5000/v2/dstrepo/blobs/uploads/"
+    match = [matchers.query_param_matcher({"mount": "sha256:abc", "from": "srcrepo"})]
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.POST, url, status=201, match=match)
+        rsps.add(
+            rsps.POST, url, status=202, headers={"Location": "/v2/dstrepo/uploads/1"}, match=match
+        )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        assert client.mount_blob("dstrepo", "sha256:abc", "srcrepo") is None
+        assert client.mount_blob("dstrepo", "sha256:abc", "srcrepo") == "/v2/dstrepo/uploads/1"
+
+
+def test_mount_blob_scope():
+    url = "https://registry.example.com:5000/v2/dstrepo/blobs/uploads/"
+    auth_service = Mock(spec=AuthService)
+    auth_service.request_token.return_value = "abc"
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.POST, url, status=201)
+
+        client = Client.build_with_session(
+            "https://registry.example.com:5000/v2/", auth_service=auth_service
+        )
+        client.mount_blob("dstrepo", "sha256:abc", "srcrepo")
+        auth_service.request_token.assert_called_once_with(
+            "repository:dstrepo:* repository:srcrepo:pull"
+        )
+        assert rsps.calls[0].request.headers["Authorization"] == "Bearer abc"
+
+
+def test_upload_blob():
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            rsps.POST,
+            "https://registry.example.com:5000/v2/testrepo/blobs/uploads/",
+            status=202,
+            headers={"Location": "/v2/testrepo/blobs/uploads/1?_state=x"},
+        )
+        rsps.add(
+            rsps.PUT,
+            "https://registry.example.com:5000/v2/testrepo/blobs/uploads/1",
+            status=201,
+            match=[matchers.query_param_matcher({"_state": "x", "digest": "sha256:abc"})],
+        )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        chunks = iter((b"abc", b"def"))
+        client.upload_blob("testrepo", "sha256:abc", chunks)
+        # The chunks are passed straight through, rather than being read into memory first.
+        assert rsps.calls[1].request.body is chunks
+
+
+def test_upload_blob_to_existing_location():
+    with responses.RequestsMock() as rsps:
+        rsps.add(
+            rsps.PUT,
+            "https://other.example.com/uploads/1",
+            status=201,
+            match=[matchers.query_param_matcher({"digest": "sha256:abc"})],
+        )
+
+        client = Client.build_with_session("https://registry.example.com:5000/v2/")
+        client.upload_blob(
+            "testrepo", "sha256:abc", b"abcdef", location="https://other.example.com/uploads/1"
+        )
+        assert rsps.calls[0].request.body == b"abcdef"
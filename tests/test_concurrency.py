@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+
+import pytest
+
+from dreg_client._concurrency import bounded_map
+
+
+def test_rejects_invalid_concurrency():
+    errmsg = "^" + re.escape("max_concurrency must be at least 1.") + "$"
+    with pytest.raises(ValueError, match=errmsg):
+        list(bounded_map(str, (1, 2, 3), max_concurrency=0))
+
+
+@pytest.mark.parametrize("max_concurrency", (1, 2, 8))
+def test_ordered(max_concurrency: int):
+    def slow_square(item: int) -> int:
+        time.sleep((10 - item) / 1000)
+        return item * item
+
+    results = list(
+        bounded_map(slow_square, range(10), max_concurrency=max_concurrency, ordered=True)
+    )
+    assert results == [(item, item * item) for item in range(10)]
+
+
+def test_unordered():
+    results = list(bounded_map(lambda item: item * 2, range(50), max_concurrency=4))
+    assert sorted(results) == [(item, item * 2) for item in range(50)]
+
+
+def test_bounded():
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def track(item: int) -> int:
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.002)
+        with lock:
+            in_flight -= 1
+        return item
+
+    assert len(list(bounded_map(track, range(40), max_concurrency=3))) == 40
+    assert max_in_flight <= 3
+
+
+def test_exception_propagates():
+    def explode(item: int) -> int:
+        if item == 3:
+            raise KeyError(item)
+        return item
+
+    with pytest.raises(KeyError):
+        list(bounded_map(explode, range(10), max_concurrency=4, ordered=True))
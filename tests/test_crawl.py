@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, Generator, List, Type, TypeVar, cast
+from unittest.mock import Mock
+
+import pytest
+from requests import ConnectionError
+
+from dreg_client.crawl import (
+    CrawlCheckpoint,
+    CrawlFailure,
+    CrawlRecord,
+    ImageRecord,
+    RegistryCrawler,
+    RepositoryRecord,
+    TagRecord,
+)
+from dreg_client.manifest import ImageConfig, ImageConfigRef, ImageLayerRef, Manifest, Platform
+from dreg_client.registry import Registry
+from dreg_client.schemas import schema_2
+
+
+TAGS: Dict[str, Dict[str, str]] = {
+    "ns/app": {"latest": "sha256:a", "v1": "sha256:a", "v0": "sha256:b"},
+    "ns/other": {"latest": "sha256:a"},
+    "empty": {},
+}
+
+
+def make_manifest(digest: str) -> Manifest:
+    return Manifest(
+        digest,
+        schema_2,
+        42,
+        ImageConfigRef(f"{digest}-config", "", 5),
+        (ImageLayerRef(f"{digest}-layer", "", 10),),
+    )
+
+
+@pytest.fixture
+def client() -> Mock:
+    client = Mock()
+    client.iter_catalog.side_effect = lambda: iter(TAGS)
+    client.get_repository_tags.side_effect = lambda name: {"name": name, "tags": list(TAGS[name])}
+    client.check_manifest.side_effect = lambda name, tag: TAGS[name].get(tag)
+    client.get_manifest.side_effect = lambda name, reference, **kwargs: make_manifest(reference)
+    client.get_image_config_blob.side_effect = lambda name, digest, **kwargs: ImageConfig(
+        digest=digest,
+        content_length=5,
+        created_at="2021-01-01T00:00:00Z",
+        config={},
+        history=(),
+        rootfs={},
+        platform=Platform.from_name("linux/amd64"),
+    )
+    return client
+
+
+R = TypeVar("R", RepositoryRecord, TagRecord, ImageRecord, CrawlFailure)
+
+
+def by_type(records: List[CrawlRecord], record_type: Type[R]) -> List[R]:
+    return [record for record in records if isinstance(record, record_type)]
+
+
+def test_crawl(client: Mock):
+    crawler = RegistryCrawler(
+        Registry(client), tag_concurrency=2, head_concurrency=3, image_concurrency=2
+    )
+    records = list(crawler.crawl())
+
+    assert sorted(by_type(records, RepositoryRecord), key=lambda r: r.repository) == [
+        RepositoryRecord("empty", ()),
+        RepositoryRecord("ns/app", ("latest", "v1", "v0")),
+        RepositoryRecord("ns/other", ("latest",)),
+    ]
+    assert len(by_type(records, TagRecord)) == 4
+    assert TagRecord("ns/app", "v0", "sha256:b") in records
+
+    images = by_type(records, ImageRecord)
+    assert sorted(image.digest for image in images) == ["sha256:a", "sha256:b"]
+    image = images[0]
+    assert isinstance(image, ImageRecord)
+    assert [p.platform_name for p in image.platform_images] == ["linux/amd64"]
+    assert client.get_image_config_blob.call_count == 2
+
+
+def test_crawl_known_digests(client: Mock):
+    crawler = RegistryCrawler(Registry(client), known_digests=["sha256:a"])
+    records = list(crawler.crawl(["ns/app"]))
+    assert [image.digest for image in by_type(records, ImageRecord)] == ["sha256:b"]
+    client.iter_catalog.assert_not_called()
+
+
+def test_crawl_select_tags(client: Mock):
+    crawler = RegistryCrawler(
+        Registry(client), select_tags=lambda name, tags: [tag for tag in tags if tag != "v0"]
+    )
+    records = list(crawler.crawl(["ns/app"]))
+    assert by_type(records, RepositoryRecord) == [
+        RepositoryRecord("ns/app", ("latest", "v1", "v0"))
+    ]
+    assert len(by_type(records, TagRecord)) == 2
+    assert [image.digest for image in by_type(records, ImageRecord)] == ["sha256:a"]
+
+
+def test_crawl_without_images(client: Mock):
+    records = list(RegistryCrawler(Registry(client), fetch_images=False).crawl(["ns/app"]))
+    assert len(by_type(records, TagRecord)) == 3
+    assert by_type(records, ImageRecord) == []
+    client.get_manifest.assert_not_called()
+
+
+def test_crawl_failures_are_retried_on_resume(client: Mock, tmp_path: Path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    check_manifest = client.check_manifest.side_effect
+
+    def flaky_check_manifest(name: str, tag: str):
+        if name == "ns/app" and tag == "v0":
+            raise ConnectionError("Connection reset")
+        return check_manifest(name, tag)
+
+    client.check_manifest.side_effect = flaky_check_manifest
+    crawler = RegistryCrawler(Registry(client), checkpoint_path=checkpoint_path)
+    records = list(crawler.crawl())
+
+    failures = by_type(records, CrawlFailure)
+    assert len(failures) == 1
+    assert failures[0] == CrawlFailure("heads", "ns/app", "v0", ConnectionError())
+    assert str(failures[0].error) == "Connection reset"
+
+    checkpoint = CrawlCheckpoint.load(checkpoint_path)
+    assert checkpoint.completed_repositories == {"empty", "ns/other"}
+    assert checkpoint.seen_digests == {"sha256:a"}
+
+    client.check_manifest.side_effect = check_manifest
+    client.get_repository_tags.reset_mock()
+    records = list(crawler.crawl())
+    assert [r.repository for r in by_type(records, RepositoryRecord)] == ["ns/app"]
+    assert [r.digest for r in by_type(records, ImageRecord)] == ["sha256:b"]
+
+    checkpoint = CrawlCheckpoint.load(checkpoint_path)
+    assert checkpoint.completed_repositories == {"empty", "ns/app", "ns/other"}
+    assert list(crawler.crawl()) == []
+
+
+def test_periodic_checkpoints(client: Mock, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    save = Mock(wraps=CrawlCheckpoint.save)
+    monkeypatch.setattr(CrawlCheckpoint, "save", lambda self, path: save(self, path))
+    ticks = iter(range(1000))
+    crawler = RegistryCrawler(
+        Registry(client),
+        checkpoint_path=tmp_path / "checkpoint.json",
+        checkpoint_interval=1,
+        clock=lambda: next(ticks),
+    )
+    records = list(crawler.crawl())
+    # At least one periodic checkpoint, plus a final one.
+    assert 1 < save.call_count <= len(records) + 1
+
+
+def test_checkpoint_on_close(client: Mock, tmp_path: Path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    crawler = RegistryCrawler(Registry(client), checkpoint_path=checkpoint_path)
+    crawl = cast(Generator[CrawlRecord, None, None], crawler.crawl())
+    next(crawl)
+    crawl.close()
+    assert json.loads(checkpoint_path.read_text())["version"] == 1
+
+
+def test_invalid_checkpoint(tmp_path: Path):
+    checkpoint_path = tmp_path / "checkpoint.json"
+    checkpoint_path.write_text('{"version": 99}')
+    with pytest.raises(ValueError, match="^Unsupported crawl checkpoint version.$"):
+        CrawlCheckpoint.load(checkpoint_path)
+
+
+def test_invalid_concurrency():
+    with pytest.raises(ValueError, match="^Concurrency limits must be at least 1.$"):
+        RegistryCrawler(Mock(), head_concurrency=0)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+from dreg_client.crawl import CrawlFailure, CrawlRecord, ImageRecord, RepositoryRecord, TagRecord
+from dreg_client.export import SCHEMA_VERSION, CrawlExporter, export_crawl
+from dreg_client.image import PlatformImage
+from dreg_client.manifest import (
+    ImageConfig,
+    ImageConfigRef,
+    ImageHistoryItem,
+    ImageLayerRef,
+    LegacyManifest,
+    Manifest,
+    ManifestList,
+    ManifestRef,
+    Platform,
+)
+from dreg_client.schemas import schema_1, schema_2, schema_2_list
+
+
+LAYER_TYPE = "application/vnd.docker.image.rootfs.diff.tar.gzip"
+
+
+def make_config(digest: str, platform: Platform) -> ImageConfig:
+    history = (
+        ImageHistoryItem("2021-01-01T00:00:00Z", "ADD file:abc in /", False, ""),
+        ImageHistoryItem("2021-01-01T00:00:01Z", 'CMD ["sh"]', True, "a, comment"),
+    )
+    return ImageConfig(digest, 100, "2021-01-01T00:00:01Z", {}, history, {}, platform)
+
+
+def make_records() -> List[CrawlRecord]:
+    amd64 = Platform("linux", "amd64")
+    arm64 = Platform("linux", "arm64", "v8")
+    layers = (
+        ImageLayerRef("sha256:l1", LAYER_TYPE, 10),
+        ImageLayerRef("sha256:l2", LAYER_TYPE, 20),
+    )
+    single = Manifest(
+        "sha256:single", schema_2, 500, ImageConfigRef("sha256:cfg-amd64", "", 100), layers
+    )
+    manifest_list = ManifestList(
+        "sha256:list",
+        schema_2_list,
+        700,
+        frozenset(
+            (
+                ManifestRef("sha256:amd64", schema_2, 500, amd64),
+                ManifestRef("sha256:arm64", schema_2, 501, arm64),
+            )
+        ),
+    )
+    return [
+        RepositoryRecord("app", ("latest", "single")),
+        TagRecord("app", "latest", "sha256:list"),
+        TagRecord("app", "single", "sha256:single"),
+        ImageRecord(
+            "app",
+            "sha256:list",
+            manifest_list,
+            (
+                PlatformImage("sha256:amd64", make_config("sha256:cfg-amd64", amd64), layers),
+                PlatformImage("sha256:arm64", make_config("sha256:cfg-arm64", arm64), layers[:1]),
+            ),
+        ),
+        ImageRecord(
+            "app",
+            "sha256:single",
+            single,
+            (PlatformImage("sha256:single", make_config("sha256:cfg-amd64", amd64), layers),),
+        ),
+        ImageRecord("old", "sha256:legacy", LegacyManifest("sha256:legacy", schema_1, 3, {}), ()),
+        CrawlFailure("images", "app", "sha256:broken", Exception()),
+    ]
+
+
+EXPECTED_COUNTS = {"repositories": 1, "tags": 2, "manifests": 5, "layers": 5, "history": 4}
+
+
+def read_csv(path: Path) -> List[List[str]]:
+    with open(path, encoding="utf-8", newline="") as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_export_csv(tmp_path: Path):
+    counts = export_crawl(make_records(), tmp_path, export_format="csv", batch_size=2)
+    assert counts == EXPECTED_COUNTS
+
+    schema = json.loads((tmp_path / "schema.json").read_text(encoding="utf-8"))
+    assert schema["version"] == SCHEMA_VERSION
+    assert schema["format"] == "csv"
+    assert schema["tables"]["layers"]["file"] == "layers.csv"
+    assert schema["tables"]["layers"]["rows"] == 5
+    assert {"name": "size", "type": "int64"} in schema["tables"]["layers"]["columns"]
+
+    assert read_csv(tmp_path / "repositories.csv") == [["repository", "tag_count"], ["app", "2"]]
+    assert read_csv(tmp_path / "manifests.csv") == [
+        [
+            "digest",
+            "repository",
+            "content_type",
+            "content_length",
+            "parent_digest",
+            "platform",
+            "config_digest",
+        ],
+        ["sha256:list", "app", schema_2_list, "700", "", "", ""],
+        ["sha256:amd64", "app", schema_2, "500", "sha256:list", "linux/amd64", "sha256:cfg-amd64"],
+        [
+            "sha256:arm64",
+            "app",
+            schema_2,
+            "501",
+            "sha256:list",
+            "linux/arm64/v8",
+            "sha256:cfg-arm64",
+        ],
+        ["sha256:single", "app", schema_2, "500", "", "linux/amd64", "sha256:cfg-amd64"],
+        ["sha256:legacy", "old", schema_1, "3", "", "", ""],
+    ]
+    assert read_csv(tmp_path / "layers.csv")[1:3] == [
+        ["sha256:amd64", "0", "sha256:l1", LAYER_TYPE, "10"],
+        ["sha256:amd64", "1", "sha256:l2", LAYER_TYPE, "20"],
+    ]
+    # Configs shared between images only have their history exported once.
+    assert read_csv(tmp_path / "history.csv")[1:] == [
+        ["sha256:cfg-amd64", "0", "2021-01-01T00:00:00Z", "ADD file:abc in /", "false", ""],
+        ["sha256:cfg-amd64", "1", "2021-01-01T00:00:01Z", 'CMD ["sh"]', "true", "a, comment"],
+        ["sha256:cfg-arm64", "0", "2021-01-01T00:00:00Z", "ADD file:abc in /", "false", ""],
+        ["sha256:cfg-arm64", "1", "2021-01-01T00:00:01Z", 'CMD ["sh"]', "true", "a, comment"],
+    ]
+
+
+def test_export_ndjson(tmp_path: Path):
+    with CrawlExporter(tmp_path, export_format="ndjson", batch_size=3) as exporter:
+        assert exporter.export_format == "ndjson"
+        exporter.add_records(make_records())
+    assert exporter.row_counts == EXPECTED_COUNTS
+
+    lines = (tmp_path / "history.ndjson").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[1]) == {
+        "config_digest": "sha256:cfg-amd64",
+        "position": 1,
+        "created_at": "2021-01-01T00:00:01Z",
+        "created_by": 'CMD ["sh"]',
+        "empty_layer": True,
+        "comment": "a, comment",
+    }
+    lines = (tmp_path / "manifests.ndjson").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["parent_digest"] is None
+
+
+def test_export_parquet(tmp_path: Path):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    counts = export_crawl(make_records(), tmp_path, export_format="parquet", batch_size=2)
+    assert counts == EXPECTED_COUNTS
+
+    history = pyarrow.parquet.read_table(tmp_path / "history.parquet")
+    assert str(history.schema.field("position").type) == "int64"
+    assert str(history.schema.field("empty_layer").type) == "bool"
+    assert history.column("empty_layer").to_pylist() == [False, True, False, True]
+    assert history.column("position").to_pylist() == [0, 1, 0, 1]
+
+    manifests = pyarrow.parquet.read_table(tmp_path / "manifests.parquet")
+    assert manifests.num_rows == 5
+    assert manifests.column("parent_digest").to_pylist()[:2] == [None, "sha256:list"]
+
+
+def test_invalid_options(tmp_path: Path):
+    with pytest.raises(ValueError, match="Unsupported export format"):
+        CrawlExporter(tmp_path, export_format="xml")
+    with pytest.raises(ValueError, match="batch_size"):
+        CrawlExporter(tmp_path, export_format="csv", batch_size=0)
+
+
+def test_write_after_close(tmp_path: Path):
+    exporter = CrawlExporter(tmp_path, export_format="csv", batch_size=1)
+    exporter.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        exporter.add_record(RepositoryRecord("app", ("latest",)))
+
+
+def test_no_schema_after_failure(tmp_path: Path):
+    (tmp_path / "schema.json").write_text("{}", encoding="utf-8")
+
+    def records() -> Iterator[CrawlRecord]:
+        yield RepositoryRecord("app", ("latest",))
+        raise ConnectionError("Connection reset")
+
+    with pytest.raises(ConnectionError):
+        export_crawl(records(), tmp_path, export_format="csv")
+    assert not (tmp_path / "schema.json").exists()
+    assert (tmp_path / "repositories.csv").exists()
@@ -1,11 +1,19 @@
 import re
-from unittest.mock import Mock
+from unittest.mock import Mock, call
 
 import pytest
 
 from dreg_client.image import Image, UnavailableImagePlatformError
-from dreg_client.manifest import ManifestList, ManifestRef, Platform
+from dreg_client.manifest import (
+    ImageConfig,
+    ImageConfigRef,
+    Manifest,
+    ManifestList,
+    ManifestRef,
+    Platform,
+)
 from dreg_client.schemas import schema_2, schema_2_list
+from dreg_client.store import ContentStore
 
 
 def test_fetch_manifest_by_platform_name_no_refs():
@@ -76,3 +84,92 @@ def test_fetch_manifest_by_unknown_platform():
     errmsg = "^" + re.escape("No manifest available for the selected platform in this image.") + "$"
     with pytest.raises(UnavailableImagePlatformError, match=errmsg):
         image.fetch_manifest_by_platform(Platform.from_name("linux/amd64"))
+
+
+def test_platforms():
+    image = Image(
+        Mock(),
+        "testns/testrepo",
+        "latest",
+        ManifestList(
+            "test",
+            schema_2_list,
+            42,
+            frozenset(
+                {
+                    ManifestRef("testref1", schema_2, 52, Platform.from_name("linux/amd64")),
+                    ManifestRef("testref2", schema_2, 52, Platform.from_name("linux/arm/v7")),
+                }
+            ),
+        ),
+    )
+
+    assert image.platforms == Platform.from_names(("linux/amd64", "linux/arm/v7"))
+    assert image.platforms is image.platforms
+
+
+def test_fetch_manifest_by_platform_uses_index():
+    client = Mock()
+    client.get_manifest.return_value = Mock(spec=Manifest)
+    image = Image(
+        client,
+        "testns/testrepo",
+        "latest",
+        ManifestList(
+            "test",
+            schema_2_list,
+            42,
+            frozenset(
+                {
+                    ManifestRef("testref1", schema_2, 52, Platform.from_name("linux/amd64")),
+                    ManifestRef("testref2", schema_2, 52, Platform.from_name("linux/arm/v7")),
+                }
+            ),
+        ),
+    )
+
+    image.fetch_manifest_by_platform(Platform.from_name("linux/arm/v7"))
+    client.get_manifest.assert_called_once_with("testns/testrepo", "testref2")
+
+    client.get_manifest.reset_mock()
+    image.fetch_manifest_by_platform_name("linux/amd64")
+    client.get_manifest.assert_called_once_with("testns/testrepo", "testref1")
+
+
+def test_requires_manifest_list_or_manifest():
+    errmsg = "^" + re.escape("Must supply exactly one of manifest_list and manifest.") + "$"
+    with pytest.raises(ValueError, match=errmsg):
+        Image(Mock(), "testns/testrepo", "latest")
+
+
+def test_platform_images_share_store():
+    manifest = Manifest("testref1", schema_2, 52, ImageConfigRef("testconfig", "", 42), ())
+    config = Mock(spec=ImageConfig)
+
+    client = Mock()
+    client.get_manifest.return_value = manifest
+    client.get_image_config_blob.return_value = config
+
+    manifest_list = ManifestList(
+        "test",
+        schema_2_list,
+        42,
+        frozenset(
+            {
+                ManifestRef("testref1", schema_2, 52, Platform.from_name("linux/amd64")),
+            }
+        ),
+    )
+    store = ContentStore()
+    image1 = Image(client, "testns/testrepo1", "latest", manifest_list, store=store)
+    image2 = Image(client, "testns/testrepo2", "v1", manifest_list, store=store)
+
+    platform_image1 = image1.get_platform_image(Platform.from_name("linux/amd64"))
+    platform_image2 = image2.get_platform_image(Platform.from_name("linux/amd64"))
+
+    assert platform_image1.config is platform_image2.config
+    assert client.get_manifest.call_args_list == [
+        call("testns/testrepo1", "testref1"),
+        call("testns/testrepo2", "testref1"),
+    ]
+    client.get_image_config_blob.assert_called_once_with("testns/testrepo1", "testconfig")
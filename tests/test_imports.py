@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Sequence
+
+import pytest
+
+import dreg_client
+from dreg_client.registry import Registry
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The cumulative import time of the package itself, in microseconds. The real figure is far
+# lower, so this only fails when something heavy starts being imported eagerly again.
+IMPORT_BUDGET_US = 50_000
+
+
+def import_times(args: Sequence[str]) -> Dict[str, int]:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_is_lazy():
+    times = import_times(["-c", "import dreg_client"])
+    assert times["dreg_client"] < IMPORT_BUDGET_US
+    assert not [name for name in times if name.split(".")[0] in ("requests", "requests_toolbelt")]
+    assert not [name for name in times if name.startswith("dreg_client.")]
+
+
+def test_cli_help_is_lazy():
+    times = import_times(["docker-registry-show.py", "--help"])
+    assert "requests" not in times
+    assert "dreg_client.client" not in times
+
+
+def test_lazy_attributes():
+    assert dreg_client.Registry is Registry
+    assert "Registry" in dir(dreg_client)
+    assert set(dreg_client.__all__) <= set(dir(dreg_client))
+    for name in dreg_client.__all__:
+        assert getattr(dreg_client, name) is not None
+
+    with pytest.raises(AttributeError, match="has no attribute 'Missing'"):
+        getattr(dreg_client, "Missing")  # noqa: B009
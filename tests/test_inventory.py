@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import Dict
+from unittest.mock import Mock
+
+import pytest
+
+from dreg_client.inventory import ImageReference, Inventory
+from dreg_client.manifest import (
+    ImageConfig,
+    ImageConfigRef,
+    ImageLayerRef,
+    Manifest,
+    ManifestList,
+    ManifestParseOutput,
+    ManifestRef,
+    Platform,
+)
+from dreg_client.registry import Registry
+from dreg_client.schemas import schema_2, schema_2_list
+
+
+def make_manifest(digest: str, platform: str) -> Manifest:
+    return Manifest(
+        digest,
+        schema_2,
+        42,
+        ImageConfigRef(f"{digest}-config-{platform}", "", 5),
+        (ImageLayerRef("sha256:base", "", 100), ImageLayerRef(f"{digest}-layer", "", 10)),
+    )
+
+
+MANIFESTS: Dict[str, ManifestParseOutput] = {
+    "sha256:a": make_manifest("sha256:a", "linux/amd64"),
+    "sha256:b": make_manifest("sha256:b", "linux/amd64"),
+    "sha256:arm": make_manifest("sha256:arm", "linux/arm64"),
+    "sha256:list": ManifestList(
+        "sha256:list",
+        schema_2_list,
+        42,
+        frozenset(
+            {
+                ManifestRef("sha256:a", schema_2, 42, Platform.from_name("linux/amd64")),
+                ManifestRef("sha256:arm", schema_2, 42, Platform.from_name("linux/arm64")),
+            }
+        ),
+    ),
+}
+
+
+@pytest.fixture
+def tags() -> Dict[str, Dict[str, str]]:
+    return {
+        "ns/app": {"latest": "sha256:list", "v1": "sha256:a"},
+        "ns/other": {"latest": "sha256:b"},
+    }
+
+
+@pytest.fixture
+def client(tags: Dict[str, Dict[str, str]]) -> Mock:
+    client = Mock()
+    client.iter_catalog.side_effect = lambda: iter(list(tags))
+    client.get_repository_tags.side_effect = lambda name: {"name": name, "tags": list(tags[name])}
+    client.check_manifest.side_effect = lambda name, tag: tags[name].get(tag)
+    client.get_manifest.side_effect = lambda name, reference, **kwargs: MANIFESTS[reference]
+    client.get_image_config_blob.side_effect = lambda name, digest, **kwargs: ImageConfig(
+        digest=digest,
+        content_length=5,
+        created_at="2021-01-01T00:00:00Z",
+        config={
+            "Labels": {"org.opencontainers.image.source": f"https://example.com/{digest[7]}"},
+            "Env": ["PATH=/usr/bin", f"IMAGE={digest[7:]}"],
+            "Entrypoint": ["/bin/app", "--serve"] if "arm" in digest else None,
+        },
+        history=(),
+        rootfs={},
+        platform=Platform.from_name(digest.split("-config-")[1]),
+    )
+    return client
+
+
+@pytest.fixture
+def inventory(tmp_path: Path):
+    with Inventory(tmp_path / "inventory.db") as inventory:
+        yield inventory
+
+
+def test_sync(inventory: Inventory, client: Mock):
+    result = inventory.sync(Registry(client))
+
+    assert result.repositories == 2
+    assert result.checked_tags == 3
+    assert result.new_images == 3
+    assert result.failures == ()
+    assert inventory.repositories() == ("ns/app", "ns/other")
+    assert inventory.tags("ns/app") == {"latest": "sha256:list", "v1": "sha256:a"}
+    assert inventory.platforms("sha256:list") == ("linux/amd64", "linux/arm64")
+    assert inventory.platforms("sha256:b") == ("linux/amd64",)
+    assert inventory.layers("sha256:arm") == (("sha256:base", 100), ("sha256:arm-layer", 10))
+    assert inventory.known_digests() == {"sha256:list", "sha256:a", "sha256:b"}
+
+
+def test_incremental_sync(inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]):
+    registry = Registry(client)
+    inventory.sync(registry)
+    client.check_manifest.reset_mock()
+    client.get_manifest.reset_mock()
+
+    tags["ns/other"] = {"latest": "sha256:b", "v2": "sha256:a"}
+    del tags["ns/app"]
+    result = inventory.sync(Registry(client))
+
+    assert result.checked_tags == 2
+    assert result.new_images == 0
+    assert result.removed_repositories == 1
+    assert client.check_manifest.call_count == 2
+    client.get_manifest.assert_not_called()
+    assert inventory.repositories() == ("ns/other",)
+    assert inventory.tags("ns/other") == {"latest": "sha256:b", "v2": "sha256:a"}
+
+
+def test_moved_tags(inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]):
+    inventory.sync(Registry(client))
+    client.get_manifest.reset_mock()
+    tags["ns/other"] = {"latest": "sha256:a"}
+    tags["ns/app"] = {"latest": "sha256:list"}
+
+    result = inventory.sync(Registry(client))
+    assert result.checked_tags == 2
+    assert result.removed_tags == 1
+    assert inventory.tags("ns/other") == {"latest": "sha256:a"}
+    assert inventory.tags("ns/app") == {"latest": "sha256:list"}
+    # Both digests were already known, so nothing is fetched.
+    client.get_manifest.assert_not_called()
+
+
+def test_skip_known_tags(inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]):
+    inventory.sync(Registry(client))
+    client.check_manifest.reset_mock()
+    tags["ns/other"] = {"latest": "sha256:a", "v2": "sha256:a"}
+
+    result = inventory.sync(Registry(client), skip_known_tags=True)
+    assert result.checked_tags == 1
+    client.check_manifest.assert_called_once_with("ns/other", "v2")
+    assert inventory.tags("ns/other") == {"latest": "sha256:b", "v2": "sha256:a"}
+
+
+def test_removed_tags(inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]):
+    inventory.sync(Registry(client))
+    del tags["ns/app"]["v1"]
+    result = inventory.sync(Registry(client), repositories=["ns/app"])
+    assert result.removed_tags == 1
+    assert result.removed_repositories == 0
+    assert inventory.tags("ns/app") == {"latest": "sha256:list"}
+    assert inventory.repositories() == ("ns/app", "ns/other")
+
+
+def test_tags_deleted_after_listing(
+    inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]
+):
+    inventory.sync(Registry(client))
+    # The tag is still listed, but has gone by the time it's resolved.
+    listed = {name: list(repo_tags) for name, repo_tags in tags.items()}
+    client.get_repository_tags.side_effect = lambda name: {"name": name, "tags": listed[name]}
+    del tags["ns/app"]["v1"]
+
+    result = inventory.sync(Registry(client))
+    assert result.checked_tags == 2
+    assert result.removed_tags == 1
+    assert inventory.tags("ns/app") == {"latest": "sha256:list"}
+
+
+def test_tags_failing_to_resolve_are_kept(inventory: Inventory, client: Mock):
+    inventory.sync(Registry(client))
+    check_manifest = client.check_manifest.side_effect
+
+    def flaky_check_manifest(name: str, tag: str):
+        if tag == "v1":
+            raise ConnectionError("Connection reset")
+        return check_manifest(name, tag)
+
+    client.check_manifest.side_effect = flaky_check_manifest
+    result = inventory.sync(Registry(client))
+    assert len(result.failures) == 1
+    assert result.removed_tags == 0
+    assert inventory.tags("ns/app") == {"latest": "sha256:list", "v1": "sha256:a"}
+
+
+def test_failed_images_are_retried(inventory: Inventory, client: Mock):
+    get_manifest = client.get_manifest.side_effect
+
+    def flaky_get_manifest(name: str, reference: str, **kwargs):
+        if reference == "sha256:b":
+            raise ConnectionError("Connection reset")
+        return get_manifest(name, reference, **kwargs)
+
+    client.get_manifest.side_effect = flaky_get_manifest
+    result = inventory.sync(Registry(client))
+    assert len(result.failures) == 1
+    assert "sha256:b" not in inventory.known_digests()
+
+    client.get_manifest.side_effect = get_manifest
+    client.check_manifest.reset_mock()
+    result = inventory.sync(Registry(client), skip_known_tags=True)
+    assert result.failures == ()
+    assert result.new_images == 1
+    client.check_manifest.assert_called_once_with("ns/other", "latest")
+
+
+def test_find_blob(inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]):
+    inventory.sync(Registry(client))
+    assert inventory.find_blob("sha256:base") == (
+        ImageReference("ns/app", "latest", "linux/amd64"),
+        ImageReference("ns/app", "latest", "linux/arm64"),
+        ImageReference("ns/app", "v1", "linux/amd64"),
+        ImageReference("ns/other", "latest", "linux/amd64"),
+    )
+    assert inventory.find_blob("sha256:arm-layer") == (
+        ImageReference("ns/app", "latest", "linux/arm64"),
+    )
+    assert inventory.find_blob("sha256:b-config-linux/amd64") == (
+        ImageReference("ns/other", "latest", "linux/amd64"),
+    )
+    assert inventory.find_blob("sha256:unknown") == ()
+
+    # Moving a tag updates the results.
+    tags["ns/app"]["latest"] = "sha256:b"
+    inventory.sync(Registry(client))
+    assert inventory.find_blob("sha256:arm-layer") == ()
+    assert ImageReference("ns/app", "latest", "linux/amd64") in inventory.find_blob(
+        "sha256:b-layer"
+    )
+
+
+def test_find_by_config_attributes(inventory: Inventory, client: Mock):
+    inventory.sync(Registry(client))
+    label = "org.opencontainers.image.source"
+
+    assert len(inventory.find_by_label(label)) == 4
+    assert inventory.find_by_label(label, "https://example.com/b") == (
+        ImageReference("ns/other", "latest", "linux/amd64"),
+    )
+    assert inventory.find_by_label(label, "https://example.com/") == ()
+    assert len(inventory.find_by_label(label, "https://example.com/", prefix=True)) == 4
+    assert inventory.find_by_label("org.opencontainers.image.title") == ()
+
+    assert inventory.find_by_env("IMAGE", "arm", prefix=True) == (
+        ImageReference("ns/app", "latest", "linux/arm64"),
+    )
+    assert len(inventory.find_by_env("PATH", "/usr/bin")) == 4
+
+    assert inventory.find_by_entrypoint("/bin/app --serve") == (
+        ImageReference("ns/app", "latest", "linux/arm64"),
+    )
+    assert len(inventory.find_by_entrypoint("/bin/", prefix=True)) == 1
+    assert inventory.find_by_entrypoint("/bin/app") == ()
+
+
+def test_prune(inventory: Inventory, client: Mock, tags: Dict[str, Dict[str, str]]):
+    inventory.sync(Registry(client))
+    assert inventory.prune() == 0
+
+    tags["ns/app"] = {"latest": "sha256:b"}
+    inventory.sync(Registry(client))
+    assert inventory.prune() == 2
+    assert inventory.known_digests() == {"sha256:b"}
+    assert inventory.layers("sha256:arm") == ()
+    assert inventory.platforms("sha256:list") == ()
+    assert inventory.find_by_entrypoint("/bin/app --serve") == ()
+    count = inventory.connection.execute("SELECT COUNT(*) FROM config_attributes").fetchone()[0]
+    assert count == 3
+
+
+def test_unsupported_schema_version(tmp_path: Path):
+    path = tmp_path / "inventory.db"
+    connection = sqlite3.connect(str(path))
+    connection.execute("PRAGMA user_version = 99")
+    connection.close()
+    with pytest.raises(ValueError, match="^Unsupported inventory schema version.$"):
+        Inventory(path)
+
+
+def test_upgrade_from_version_1(tmp_path: Path, client: Mock):
+    path = tmp_path / "inventory.db"
+    with Inventory(path) as inventory:
+        inventory.sync(Registry(client))
+        inventory.connection.execute("DELETE FROM config_attributes")
+        inventory.connection.execute("PRAGMA user_version = 1")
+        inventory.connection.commit()
+
+    with Inventory(path) as inventory:
+        assert inventory.connection.execute("PRAGMA user_version").fetchone()[0] == 2
+        assert inventory.tags("ns/app") == {"latest": "sha256:list", "v1": "sha256:a"}
+        assert inventory.known_digests() == set()
+
+        result = inventory.sync(Registry(client))
+        assert result.new_images == 3
+        assert len(inventory.find_by_env("PATH")) == 4
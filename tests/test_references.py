@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import threading
+from unittest.mock import Mock
+
+import pytest
+import requests
+
+from dreg_client.references import (
+    ParsedReference,
+    ReferenceResolution,
+    parse_reference,
+    resolve_references,
+)
+from dreg_client.registry import Registry
+
+
+DIGEST = "sha256:" + "a" * 64
+
+
+@pytest.mark.parametrize(
+    ("reference", "expected"),
+    (
+        ("app", ParsedReference(None, "app", None, None)),
+        ("ns/app:1.0", ParsedReference(None, "ns/app", "1.0", None)),
+        (f"ns/app@{DIGEST}", ParsedReference(None, "ns/app", None, DIGEST)),
+        (f"ns/app:1.0@{DIGEST}", ParsedReference(None, "ns/app", "1.0", DIGEST)),
+        (
+            "registry.example.com/ns/app",
+            ParsedReference("registry.example.com", "ns/app", None, None),
+        ),
+        ("localhost:5000/app:v1", ParsedReference("localhost:5000", "app", "v1", None)),
+        ("localhost/app", ParsedReference("localhost", "app", None, None)),
+    ),
+)
+def test_parse_reference(reference: str, expected: ParsedReference):
+    assert parse_reference(reference) == expected
+
+
+@pytest.mark.parametrize("reference", ("", "app:", "ns/", "registry.example.com/"))
+def test_parse_invalid_reference(reference: str):
+    with pytest.raises(ValueError, match="Invalid image reference"):
+        parse_reference(reference)
+
+
+def test_reference_precedence():
+    assert parse_reference("app").reference == "latest"
+    assert parse_reference("app:v1").reference == "v1"
+    assert parse_reference(f"app:v1@{DIGEST}").reference == DIGEST
+
+
+def test_resolve_references():
+    digests = {("ns/app", "v1"): "sha256:1", ("app", "latest"): "sha256:2"}
+    client = Mock()
+    client.check_manifest.side_effect = lambda name, reference: digests.get((name, reference))
+
+    references = ["registry.example.com/ns/app:v1", "app", "ns/app:v2", "bad:", "ns/app:v1"]
+    results = list(resolve_references(Registry(client), references, max_concurrency=3))
+    assert results == [
+        ReferenceResolution("registry.example.com/ns/app:v1", "sha256:1"),
+        ReferenceResolution("app", "sha256:2"),
+        ReferenceResolution("ns/app:v2", None),
+        ReferenceResolution("bad:", None),
+        ReferenceResolution("ns/app:v1", "sha256:1"),
+    ]
+    assert results[2].error is None
+    assert isinstance(results[3].error, ValueError)
+
+
+def test_resolve_references_as_completed():
+    release = threading.Event()
+    client = Mock()
+
+    def check_manifest(name: str, reference: str) -> str:
+        if reference == "slow":
+            release.wait(5)
+        else:
+            release.set()
+        return f"sha256:{reference}"
+
+    client.check_manifest.side_effect = check_manifest
+    results = resolve_references(
+        Registry(client), ["app:slow", "app:fast"], max_concurrency=2, ordered=False
+    )
+    assert [result.digest for result in results] == ["sha256:fast", "sha256:slow"]
+
+
+def test_resolve_references_request_failure():
+    client = Mock()
+    client.check_manifest.side_effect = requests.ConnectionError("refused")
+    (result,) = resolve_references(Registry(client), ["app"])
+    assert result.digest is None
+    assert isinstance(result.error, requests.ConnectionError)
@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+from typing import Dict
+from unittest.mock import Mock
+
+import pytest
+
+from dreg_client.manifest import (
+    ArtifactRef,
+    ImageConfigRef,
+    ImageLayerRef,
+    LegacyManifest,
+    Manifest,
+    ManifestList,
+    ManifestParseOutput,
+    ManifestRef,
+    Platform,
+)
+from dreg_client.replication import replicate_image
+from dreg_client.repository import LegacyImageRequestError, Repository
+from dreg_client.schemas import schema_1, schema_2, schema_2_list
+
+
+def make_manifest(digest: str, config: str, *layers: str) -> Manifest:
+    return Manifest(
+        digest,
+        schema_2,
+        42,
+        ImageConfigRef(config, "", 5),
+        tuple(ImageLayerRef(layer, "", 10) for layer in layers),
+        raw_content=digest.encode(),
+    )
+
+
+@pytest.fixture
+def manifests() -> Dict[str, ManifestParseOutput]:
+    amd64 = make_manifest("sha256:amd64", "sha256:c1", "sha256:base", "sha256:l1")
+    arm64 = make_manifest("sha256:arm64", "sha256:c2", "sha256:base", "sha256:l2")
+    image_list = ManifestList(
+        "sha256:list",
+        schema_2_list,
+        42,
+        frozenset(
+            {
+                ManifestRef(amd64.digest, schema_2, 42, Platform.from_name("linux/amd64")),
+                ManifestRef(arm64.digest, schema_2, 42, Platform.from_name("linux/arm64")),
+            }
+        ),
+        raw_content=b"sha256:list",
+    )
+    return {
+        "latest": image_list,
+        "single": amd64,
+        image_list.digest: image_list,
+        amd64.digest: amd64,
+        arm64.digest: arm64,
+    }
+
+
+@pytest.fixture
+def src_client(manifests: Dict[str, ManifestParseOutput]) -> Mock:
+    client = Mock()
+    client.get_manifest.side_effect = lambda name, reference, **kwargs: manifests[reference]
+
+    def get_blob(name: str, digest: str, *, stream: bool = False) -> Mock:
+        response = Mock()
+        response.iter_content.return_value = iter((digest.encode(),))
+        return response
+
+    client.get_blob.side_effect = get_blob
+    return client
+
+
+@pytest.fixture
+def dst_client() -> Mock:
+    client = Mock()
+    client.check_blob.side_effect = lambda name, digest: 10 if digest == "sha256:base" else None
+    client.check_manifest.return_value = None
+    return client
+
+
+def test_replicate_manifest_list(src_client: Mock, dst_client: Mock):
+    result = replicate_image(
+        Repository(src_client, "srcrepo"), "latest", Repository(dst_client, "dstrepo")
+    )
+
+    assert result.digest == "sha256:list"
+    assert result.existing_blobs == ("sha256:base",)
+    assert result.mounted_blobs == ()
+    assert sorted(result.copied_blobs) == ["sha256:c1", "sha256:c2", "sha256:l1", "sha256:l2"]
+    assert result.bytes_copied == 30
+    assert sorted(result.pushed_manifests) == ["sha256:amd64", "sha256:arm64", "sha256:list"]
+
+    dst_client.mount_blob.assert_not_called()
+    assert dst_client.upload_blob.call_count == 4
+    src_client.get_blob.assert_any_call("srcrepo", "sha256:l1", stream=True)
+    # The manifest list is pushed last, with its original payload.
+    assert dst_client.put_manifest.call_args_list[-1] == (
+        ("dstrepo", "latest", b"sha256:list", schema_2_list),
+    )
+    dst_client.put_manifest.assert_any_call("dstrepo", "sha256:amd64", b"sha256:amd64", schema_2)
+
+
+def test_replicate_skips_existing_manifests(src_client: Mock, dst_client: Mock):
+    dst_client.check_manifest.side_effect = lambda name, reference: reference
+    result = replicate_image(
+        Repository(src_client, "srcrepo"), "latest", Repository(dst_client, "dstrepo")
+    )
+    assert result.pushed_manifests == ("sha256:list",)
+    dst_client.put_manifest.assert_called_once()
+
+
+def test_replicate_mounts_within_registry(src_client: Mock):
+    src_client.check_blob.return_value = None
+    src_client.check_manifest.return_value = None
+    src_client.mount_blob.side_effect = lambda name, digest, from_name: (
+        None if digest != "sha256:l2" else "/v2/dstrepo/blobs/uploads/1"
+    )
+
+    result = replicate_image(
+        Repository(src_client, "srcrepo"), "latest", Repository(src_client, "dstrepo")
+    )
+    assert sorted(result.mounted_blobs) == ["sha256:base", "sha256:c1", "sha256:c2", "sha256:l1"]
+    assert list(result.copied_blobs) == ["sha256:l2"]
+    src_client.mount_blob.assert_any_call("dstrepo", "sha256:l1", "srcrepo")
+    src_client.upload_blob.assert_called_once()
+    assert src_client.upload_blob.call_args[1] == {"location": "/v2/dstrepo/blobs/uploads/1"}
+
+
+def test_replicate_single_platform(src_client: Mock, dst_client: Mock):
+    result = replicate_image(
+        Repository(src_client, "srcrepo"),
+        "latest",
+        Repository(dst_client, "dstrepo"),
+        ["linux/arm64"],
+    )
+    assert result.digest == "sha256:arm64"
+    assert sorted(result.copied_blobs) == ["sha256:c2", "sha256:l2"]
+    dst_client.put_manifest.assert_called_once_with("dstrepo", "latest", b"sha256:arm64", schema_2)
+
+
+def test_replicate_all_platforms(src_client: Mock, dst_client: Mock):
+    result = replicate_image(
+        Repository(src_client, "srcrepo"),
+        "latest",
+        Repository(dst_client, "dstrepo"),
+        [Platform.from_name("linux/arm64"), "linux/amd64"],
+    )
+    assert result.digest == "sha256:list"
+
+
+def test_replicate_unavailable_platform(src_client: Mock, dst_client: Mock):
+    errmsg = "None of the selected platforms are available in this image."
+    with pytest.raises(ValueError, match=errmsg):
+        replicate_image(
+            Repository(src_client, "srcrepo"),
+            "latest",
+            Repository(dst_client, "dstrepo"),
+            ["linux/s390x"],
+        )
+    dst_client.put_manifest.assert_not_called()
+
+
+def test_replicate_platform_subset(
+    manifests: Dict[str, ManifestParseOutput], src_client: Mock, dst_client: Mock
+):
+    image_list = manifests["latest"]
+    assert isinstance(image_list, ManifestList)
+    manifests["latest"] = ManifestList(
+        image_list.digest,
+        image_list.content_type,
+        image_list.content_length,
+        image_list.manifests
+        | {ManifestRef("sha256:s390x", schema_2, 42, Platform.from_name("linux/s390x"))},
+        raw_content=image_list.raw_content,
+    )
+
+    errmsg = "Replicating a subset of the platforms in a manifest list would change its digest."
+    with pytest.raises(ValueError, match=errmsg):
+        replicate_image(
+            Repository(src_client, "srcrepo"),
+            "latest",
+            Repository(dst_client, "dstrepo"),
+            ["linux/amd64", "linux/arm64"],
+        )
+
+
+@pytest.mark.parametrize("platforms", (None, ["linux/amd64", "linux/arm64"]))
+def test_replicate_keeps_entries_without_platform(
+    manifests: Dict[str, ManifestParseOutput], src_client: Mock, dst_client: Mock, platforms
+):
+    image_list = manifests["latest"]
+    assert isinstance(image_list, ManifestList)
+    attestation = make_manifest("sha256:attestation", "sha256:c3", "sha256:statement")
+    manifests[attestation.digest] = attestation
+    manifests["latest"] = ManifestList(
+        image_list.digest,
+        image_list.content_type,
+        image_list.content_length,
+        image_list.manifests,
+        raw_content=image_list.raw_content,
+        artifacts=frozenset({ArtifactRef(attestation.digest, schema_2, 42)}),
+    )
+
+    result = replicate_image(
+        Repository(src_client, "srcrepo"), "latest", Repository(dst_client, "dstrepo"), platforms
+    )
+    assert result.digest == "sha256:list"
+    assert "sha256:attestation" in result.pushed_manifests
+    assert "sha256:statement" in result.copied_blobs
+
+
+def test_replicate_legacy_image(src_client: Mock, dst_client: Mock):
+    src_client.get_manifest.side_effect = None
+    src_client.get_manifest.return_value = LegacyManifest(
+        "sha256:legacy", schema_1, 42, {}, raw_content=b"{}"
+    )
+    with pytest.raises(LegacyImageRequestError):
+        replicate_image(
+            Repository(src_client, "srcrepo"), "legacy", Repository(dst_client, "dstrepo")
+        )
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
 import json
+from typing import Optional
 from unittest.mock import Mock
 
 import pytest
 
-from dreg_client.manifest import LegacyManifest
+from dreg_client.image import Image
+from dreg_client.manifest import (
+    ImageConfigRef,
+    LegacyManifest,
+    Manifest,
+    Platform,
+    UnusableManifestResponseError,
+    parse_image_config_blob_response,
+)
 from dreg_client.repository import LegacyImageRequestError, Repository
+from dreg_client.store import ContentStore
 
 from .conftest import DockerJsonBlob
 
@@ -88,6 +98,45 @@ def test_get_image_legacy_manifest(manifest_client):
     manifest_client.check_manifest.assert_not_called()
 
 
+def test_get_image_single_platform_is_lazy(blob_container_image_v1: DockerJsonBlob):
+    manifest = Manifest(
+        digest="sha256:5b0bcabd1ed22e9fb1310cf6c2dec7cdef19f0ad69efa1f392e94a4333501270",
+        content_type="application/vnd.docker.distribution.manifest.v2+json",
+        content_length=528,
+        config=ImageConfigRef(
+            digest="sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667",
+            content_type="application/vnd.docker.container.image.v1+json",
+            size=1463,
+        ),
+        layers=(),
+    )
+    config_response = Mock()
+    config_response.headers = {
+        "Content-Length": "1463",
+        "Docker-Content-Digest": manifest.config.digest,
+    }
+    config_response.json.return_value = blob_container_image_v1
+
+    client = Mock()
+    client.get_manifest.return_value = manifest
+    client.get_image_config_blob.return_value = parse_image_config_blob_response(config_response)
+
+    repo = Repository(client, "testrepo", "testns")
+    image = repo.get_image("2021")
+    assert isinstance(image, Image)
+    assert image.digest == manifest.digest
+    client.get_image_config_blob.assert_not_called()
+
+    assert image.platforms == {Platform.from_name("linux/amd64")}
+    assert image.manifest_list.digest.startswith("sha256:")
+    assert image.manifest_list.digest != manifest.digest
+    assert image.manifest_list is image.manifest_list
+    client.get_image_config_blob.assert_called_once_with("testns/testrepo", manifest.config.digest)
+
+    assert image.fetch_manifest_by_platform_name("linux/amd64") is manifest
+    client.get_manifest.assert_called_once()
+
+
 def test_get_image_legacy_manifest_raises(manifest_client):
     repo = Repository(manifest_client, "testrepo", "testns")
     with pytest.raises(LegacyImageRequestError):
@@ -145,6 +194,93 @@ def test_get_manifest_by_digest(manifest_client):
     manifest_client.check_manifest.assert_not_called()
 
 
+def test_get_manifest_by_digest_is_cached(manifest_client):
+    repo = Repository(manifest_client, "testrepo", "testns")
+    manifest1 = repo.get_manifest("2021")
+    manifest2 = repo.get_manifest(
+        "sha256:fc7187188888f5192efdc08682d7fa260820a41f2bdd09b7f5f9cdcb53c9fbc0"
+    )
+    assert manifest2 is manifest1
+    manifest_client.get_manifest.assert_called_once_with("testns/testrepo", "2021")
+
+
+def test_shared_store_across_repositories(manifest_client):
+    store = ContentStore()
+    repo1 = Repository(manifest_client, "testrepo1", "testns", store=store)
+    repo2 = Repository(manifest_client, "testrepo2", "testns", store=store)
+
+    manifest = repo1.get_manifest("2021")
+    assert repo1.get_manifest(manifest.digest) is manifest
+    manifest_client.get_manifest.assert_called_once()
+
+    # A registry only serves a manifest through the repositories that hold it.
+    assert repo2.get_manifest(manifest.digest) == manifest
+    manifest_client.get_manifest.assert_called_with("testns/testrepo2", manifest.digest)
+    assert manifest_client.get_manifest.call_count == 2
+
+
+def test_resolve_tags():
+    digests = {
+        "2019": "sha256:1a067fa67b5bf1044c411ad73ac82cecd3d4dd2dabe7bc4d4b6dbbd55963b667",
+        "2020": "sha256:fc7187188888f5192efdc08682d7fa260820a41f2bdd09b7f5f9cdcb53c9fbc0",
+        "2021": "sha256:fc7187188888f5192efdc08682d7fa260820a41f2bdd09b7f5f9cdcb53c9fbc0",
+        "latest": "sha256:fc7187188888f5192efdc08682d7fa260820a41f2bdd09b7f5f9cdcb53c9fbc0",
+    }
+    client = Mock()
+    client.get_repository_tags.return_value = {
+        "name": "testns/testrepo",
+        "tags": ["2019", "2020", "2021", "latest", "missing"],
+    }
+    client.check_manifest.side_effect = lambda name, tag, **kwargs: digests.get(tag)
+
+    repo = Repository(client, "testrepo", "testns")
+    resolution = repo.resolve_tags(max_concurrency=3)
+
+    assert resolution.digests == digests
+    assert resolution.tags_by_digest == {
+        "sha256:1a067fa67b5bf1044c411ad73ac82cecd3d4dd2dabe7bc4d4b6dbbd55963b667": ("2019",),
+        "sha256:fc7187188888f5192efdc08682d7fa260820a41f2bdd09b7f5f9cdcb53c9fbc0": (
+            "2020",
+            "2021",
+            "latest",
+        ),
+    }
+    assert resolution.missing_tags == ("missing",)
+    assert resolution.manifests == {}
+    assert client.check_manifest.call_count == 5
+    client.get_manifest.assert_not_called()
+
+
+def test_resolve_tags_without_digests():
+    def check_manifest(name: str, tag: str, *, require_digest: bool = False) -> Optional[str]:
+        if tag == "nodigest" and require_digest:
+            raise UnusableManifestResponseError(Mock(), "No digest specified in response headers.")
+        return "sha256:abc" if tag == "latest" else None
+
+    client = Mock()
+    client.check_manifest.side_effect = check_manifest
+
+    repo = Repository(client, "testrepo", "testns")
+    resolution = repo.resolve_tags(("latest", "nodigest", "latest", "missing"))
+
+    assert resolution.digests == {"latest": "sha256:abc"}
+    assert resolution.tags_by_digest == {"sha256:abc": ("latest",)}
+    assert resolution.missing_tags == ("missing",)
+    assert resolution.unresolved_tags == ("nodigest",)
+    assert client.check_manifest.call_count == 3
+
+
+def test_resolve_tags_fetches_one_manifest_per_digest(manifest_client):
+    repo = Repository(manifest_client, "testrepo", "testns")
+    resolution = repo.resolve_tags(("2020", "2021"), fetch_manifests=True)
+
+    digest = "sha256:fc7187188888f5192efdc08682d7fa260820a41f2bdd09b7f5f9cdcb53c9fbc0"
+    assert resolution.tags_by_digest == {digest: ("2020", "2021")}
+    assert resolution.manifests == {digest: manifest_client.get_manifest.return_value}
+    manifest_client.get_manifest.assert_called_once_with("testns/testrepo", digest)
+    manifest_client.get_repository_tags.assert_not_called()
+
+
 def test_delete_manifest():
     client = Mock()
     repo = Repository(client, "testrepo")
@@ -163,6 +299,23 @@ def test_get_blob():
     )
 
 
+def test_blob_transfer_methods():
+    client = Mock()
+    repo = Repository(client, "testrepo", "testns")
+    repo.check_blob("sha256:abc")
+    client.check_blob.assert_called_once_with("testns/testrepo", "sha256:abc")
+    repo.mount_blob("sha256:abc", "otherrepo")
+    client.mount_blob.assert_called_once_with("testns/testrepo", "sha256:abc", "otherrepo")
+    repo.upload_blob("sha256:abc", b"abc")
+    client.upload_blob.assert_called_once_with(
+        "testns/testrepo", "sha256:abc", b"abc", location=None
+    )
+    repo.put_manifest("latest", b"{}", "application/vnd.oci.image.manifest.v1+json")
+    client.put_manifest.assert_called_once_with(
+        "testns/testrepo", "latest", b"{}", "application/vnd.oci.image.manifest.v1+json"
+    )
+
+
 def test_delete_blob():
     client = Mock()
     repo = Repository(client, "testrepo", "testns")
@@ -205,3 +358,20 @@ def test_repr_with_namespace():
 def test_repr_without_namespace():
     repo = Repository(Mock(), "testrepo")
     assert repr(repo) == "Repository(testrepo)"
+
+
+def test_get_image_config_is_cached():
+    client = Mock()
+    repo = Repository(client, "testrepo", "testns")
+    config1 = repo.get_image_config(
+        "sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667"
+    )
+    config2 = repo.get_image_config(
+        "sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667"
+    )
+    assert config2 is config1
+    client.get_image_config_blob.assert_called_once_with(
+        "testns/testrepo",
+        "sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667",
+        lazy=False,
+    )
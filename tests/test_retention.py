@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from unittest.mock import Mock
+
+import pytest
+
+from dreg_client.manifest import (
+    ImageConfig,
+    ImageConfigRef,
+    ImageLayerRef,
+    Manifest,
+    ManifestList,
+    ManifestRef,
+    Platform,
+)
+from dreg_client.repository import Repository
+from dreg_client.retention import (
+    DeleteMatching,
+    DeleteOlderThan,
+    KeepLatest,
+    KeepNewerThan,
+    RetentionEngine,
+    RetentionPolicy,
+    RetentionRule,
+)
+from dreg_client.schemas import schema_2, schema_2_list
+
+
+NOW = datetime(2022, 1, 31, 12, 0, 0, tzinfo=timezone.utc)
+
+
+def days_ago(days: int) -> datetime:
+    return NOW - timedelta(days=days)
+
+
+@pytest.fixture
+def created() -> Dict[str, Optional[datetime]]:
+    return {
+        "release-1": days_ago(90),
+        "release-2": days_ago(60),
+        "release-3": days_ago(30),
+        "ci-100": days_ago(20),
+        "ci-101": days_ago(10),
+        "ci-legacy": None,
+        "latest": days_ago(1),
+    }
+
+
+def test_rule_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        RetentionRule("ci-.*")  # type: ignore[abstract]
+
+
+def test_keep_latest(created):
+    policy = RetentionPolicy((KeepLatest("^release-", 2), DeleteMatching("^release-")))
+    decision = policy.evaluate(created, now=NOW)
+    assert decision.delete == ("release-1",)
+    assert sorted(decision.keep) == sorted(set(created) - {"release-1"})
+
+
+def test_delete_older_than(created):
+    policy = RetentionPolicy((DeleteOlderThan("^ci-", timedelta(days=14)),))
+    decision = policy.evaluate(created, now=NOW)
+    assert decision.delete == ("ci-100",)
+
+
+def test_keep_rules_win(created):
+    policy = RetentionPolicy(
+        (
+            KeepNewerThan("^release-", timedelta(days=45)),
+            DeleteOlderThan(".", timedelta(days=14)),
+        )
+    )
+    decision = policy.evaluate(created, now=NOW)
+    assert decision.delete == ("ci-100", "release-2", "release-1")
+
+
+def test_unknown_creation_times_sort_last(created):
+    policy = RetentionPolicy((KeepLatest("^ci-", 2), DeleteMatching("^ci-")))
+    decision = policy.evaluate(created, now=NOW)
+    assert decision.delete == ("ci-legacy",)
+
+
+def make_config(digest: str, created_at: str) -> ImageConfig:
+    return ImageConfig(
+        digest=digest,
+        content_length=42,
+        created_at=created_at,
+        config={},
+        history=(),
+        rootfs={},
+        platform=Platform.from_name("linux/amd64"),
+    )
+
+
+def test_engine():
+    manifests = {
+        "sha256:m1": Manifest(
+            "sha256:m1",
+            schema_2,
+            42,
+            ImageConfigRef("sha256:c1", "", 5),
+            (ImageLayerRef("sha256:shared", "", 10), ImageLayerRef("sha256:a", "", 10)),
+        ),
+        "sha256:m2": Manifest(
+            "sha256:m2",
+            schema_2,
+            42,
+            ImageConfigRef("sha256:c2", "", 5),
+            (ImageLayerRef("sha256:shared", "", 10),),
+        ),
+        "sha256:l3": ManifestList(
+            "sha256:l3",
+            schema_2_list,
+            42,
+            frozenset(
+                {
+                    ManifestRef("sha256:m2", schema_2, 42, Platform.from_name("linux/arm64")),
+                }
+            ),
+        ),
+    }
+    configs = {
+        "sha256:c1": make_config("sha256:c1", "2021-12-01T00:00:00.123456789Z"),
+        "sha256:c2": make_config("sha256:c2", "2022-01-30T00:00:00Z"),
+    }
+    tags = {"ci-1": "sha256:m1", "ci-1-alias": "sha256:m1", "ci-2": "sha256:l3"}
+
+    client = Mock()
+    client.get_repository_tags.return_value = {"name": "testrepo", "tags": list(tags)}
+    client.check_manifest.side_effect = lambda name, tag, **kwargs: tags.get(tag)
+    client.get_manifest.side_effect = lambda name, reference, **kwargs: manifests[reference]
+    client.get_image_config_blob.side_effect = lambda name, digest, **kwargs: configs[digest]
+
+    engine = RetentionEngine(
+        RetentionPolicy((DeleteOlderThan("^ci-", timedelta(days=14)),)), max_concurrency=2
+    )
+    repository = Repository(client, "testrepo")
+    decision, plan = engine.plan(repository, now=NOW)
+
+    assert sorted(decision.delete) == ["ci-1", "ci-1-alias"]
+    assert plan.tags == ("ci-1", "ci-1-alias")
+    assert plan.manifests == ("sha256:m1",)
+    assert plan.blobs == {"sha256:c1": 5, "sha256:a": 10}
+    assert client.check_manifest.call_count == 3
+    assert client.get_image_config_blob.call_count == 2
+
+    result = engine.enforce(repository, now=NOW)
+    assert result.deleted_manifests == ("sha256:m1",)
+    assert result.bytes_freed == 15
+    client.delete_manifest.assert_called_once_with("testrepo", "sha256:m1")
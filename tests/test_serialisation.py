@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from dreg_client.image import PlatformImage
+from dreg_client.manifest import (
+    ImageConfig,
+    ImageConfigRef,
+    ImageHistoryItem,
+    ImageLayerRef,
+    LegacyManifest,
+    Manifest,
+    ManifestList,
+    ManifestRef,
+    Platform,
+)
+from dreg_client.schemas import schema_1, schema_2, schema_2_list
+from dreg_client.serialisation import to_data
+
+
+LAYER = ImageLayerRef("sha256:layer", "application/vnd.docker.image.rootfs.diff.tar.gzip", 10)
+
+
+def test_manifest():
+    manifest = Manifest(
+        "sha256:m", schema_2, 500, ImageConfigRef("sha256:c", "application/json", 5), (LAYER,)
+    )
+    assert json.loads(json.dumps(manifest, default=to_data)) == {
+        "digest": "sha256:m",
+        "content_type": schema_2,
+        "content_length": 500,
+        "config": {"digest": "sha256:c", "content_type": "application/json", "size": 5},
+        "layers": [{"digest": "sha256:layer", "content_type": LAYER.content_type, "size": 10}],
+    }
+
+
+def test_manifest_list():
+    manifest_list = ManifestList(
+        "sha256:list",
+        schema_2_list,
+        700,
+        frozenset(
+            (
+                ManifestRef("sha256:b", schema_2, 2, Platform("linux", "arm64", "v8")),
+                ManifestRef("sha256:a", schema_2, 1, Platform("linux", "amd64")),
+            )
+        ),
+    )
+    data = to_data(manifest_list)
+    assert [ref["digest"] for ref in data["manifests"]] == ["sha256:a", "sha256:b"]
+    assert data["manifests"][1]["platform"] == {
+        "name": "linux/arm64/v8",
+        "os": "linux",
+        "architecture": "arm64",
+        "variant": "v8",
+    }
+
+
+def test_legacy_manifest():
+    manifest = LegacyManifest("sha256:legacy", schema_1, 3, {"schemaVersion": 1})
+    assert to_data(manifest)["content"] == {"schemaVersion": 1}
+
+
+def test_platform_image():
+    config = ImageConfig(
+        digest="sha256:c",
+        content_length=5,
+        created_at="2021-01-01T00:00:00Z",
+        config={"Env": ["A=1"]},
+        history=(ImageHistoryItem("2021-01-01T00:00:00Z", "ADD x /", False, ""),),
+        rootfs={"type": "layers"},
+        platform=Platform("linux", "amd64"),
+    )
+    data = json.loads(json.dumps(PlatformImage("sha256:m", config, (LAYER,)), default=to_data))
+    assert data["platform"] == "linux/amd64"
+    assert data["config"]["config"] == {"Env": ["A=1"]}
+    assert data["config"]["history"] == [
+        {
+            "created_at": "2021-01-01T00:00:00Z",
+            "created_by": "ADD x /",
+            "empty_layer": False,
+            "comment": "",
+        }
+    ]
+    assert data["layers"] == [to_data(LAYER)]
+
+
+def test_unsupported():
+    with pytest.raises(TypeError, match="Object of type object is not serialisable"):
+        to_data(object())
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Sequence
+from unittest.mock import Mock
+
+import pytest
+
+from dreg_client.client import Client
+from dreg_client.crawl import ImageRecord, RepositoryRecord, TagRecord
+from dreg_client.manifest import ImageConfig, ImageConfigRef, Manifest, Platform
+from dreg_client.schemas import schema_2
+from dreg_client.sharding import (
+    HashRing,
+    crawl_shard,
+    crawl_sharded,
+    map_shards,
+    merge_crawl_records,
+    read_crawl_records,
+    shard_repositories,
+)
+
+
+NAMES = [f"team-{team}/service-{service}" for team in range(20) for service in range(50)]
+
+TAGS = {
+    "ns/app": {"latest": "sha256:a"},
+    "ns/other": {"latest": "sha256:a", "old": "sha256:b"},
+    "ns/third": {"v1": "sha256:c"},
+}
+
+
+def make_client() -> Mock:
+    client = Mock()
+    client.iter_catalog.side_effect = lambda: iter(TAGS)
+    client.get_repository_tags.side_effect = lambda name: {"name": name, "tags": list(TAGS[name])}
+    client.check_manifest.side_effect = lambda name, tag: TAGS[name].get(tag)
+    client.get_manifest.side_effect = lambda name, reference, **kwargs: Manifest(
+        reference, schema_2, 42, ImageConfigRef(f"{reference}-config", "", 5), ()
+    )
+    client.get_image_config_blob.side_effect = lambda name, digest, **kwargs: ImageConfig(
+        digest=digest,
+        content_length=5,
+        created_at="2021-01-01T00:00:00Z",
+        config={},
+        history=(),
+        rootfs={},
+        platform=Platform.from_name("linux/amd64"),
+    )
+    return client
+
+
+def shard_names(client: Client, names: Sequence[str]) -> Sequence[str]:
+    return sorted(names)
+
+
+def test_hash_ring_is_stable():
+    first = HashRing(8)
+    second = HashRing(8)
+    assert [first.shard_for(name) for name in NAMES] == [second.shard_for(name) for name in NAMES]
+
+
+def test_hash_ring_is_balanced():
+    counts = Counter(HashRing(4).shard_for(name) for name in NAMES)
+    assert sorted(counts) == [0, 1, 2, 3]
+    assert min(counts.values()) > len(NAMES) / 4 * 0.6
+
+
+def test_hash_ring_moves_few_keys():
+    before = HashRing(8)
+    after = HashRing(9)
+    moved = sum(before.shard_for(name) != after.shard_for(name) for name in NAMES)
+    # Ideally 1/9 of the keys move to the new shard, and nothing else moves.
+    assert moved < len(NAMES) / 9 * 1.5
+    assert all(
+        after.shard_for(name) == 8
+        for name in NAMES
+        if before.shard_for(name) != after.shard_for(name)
+    )
+
+
+def test_partition():
+    shards = HashRing(3).partition(NAMES)
+    assert sorted(name for shard in shards for name in shard) == sorted(NAMES)
+
+
+def test_shard_repositories():
+    shards = [list(shard_repositories(NAMES, index, 5)) for index in range(5)]
+    assert sorted(name for shard in shards for name in shard) == sorted(NAMES)
+    assert shards == HashRing(5).partition(NAMES)
+
+
+@pytest.mark.parametrize(("shard_index", "shard_count"), ((-1, 2), (2, 2)))
+def test_shard_repositories_invalid_index(shard_index: int, shard_count: int):
+    errmsg = "^shard_index must be at least 0 and less than shard_count.$"
+    with pytest.raises(ValueError, match=errmsg):
+        shard_repositories(NAMES, shard_index, shard_count)
+
+
+def test_invalid_hash_ring():
+    with pytest.raises(ValueError, match="^shard_count must be at least 1.$"):
+        HashRing(0)
+    with pytest.raises(ValueError, match="^replicas must be at least 1.$"):
+        HashRing(2, replicas=0)
+
+
+def test_map_shards():
+    results = dict(
+        map_shards(make_client, shard_names, shard_count=3, repositories=NAMES, max_workers=2)
+    )
+    assert results == {
+        index: sorted(names) for index, names in enumerate(HashRing(3).partition(NAMES)) if names
+    }
+
+
+def test_crawl_shard(tmp_path: Path):
+    path = crawl_shard(make_client(), ["ns/app", "ns/third"], directory=str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+
+    records = list(read_crawl_records(path))
+    assert [r.repository for r in records if isinstance(r, RepositoryRecord)] == [
+        "ns/app",
+        "ns/third",
+    ]
+    assert TagRecord("ns/app", "latest", "sha256:a") in records
+    assert sorted(r.digest for r in records if isinstance(r, ImageRecord)) == [
+        "sha256:a",
+        "sha256:c",
+    ]
+
+
+def test_crawl_shard_failure(tmp_path: Path):
+    client = make_client()
+    client.get_repository_tags.side_effect = KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        crawl_shard(client, ["ns/app"], directory=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_merge_crawl_records():
+    image = ImageRecord("ns/app", "sha256:a", Mock(), ())
+    merged = list(
+        merge_crawl_records(
+            (
+                [TagRecord("ns/app", "latest", "sha256:a"), image],
+                [TagRecord("ns/other", "latest", "sha256:a"), image],
+            )
+        )
+    )
+    assert merged == [
+        TagRecord("ns/app", "latest", "sha256:a"),
+        image,
+        TagRecord("ns/other", "latest", "sha256:a"),
+    ]
+
+
+def test_crawl_sharded():
+    records = list(crawl_sharded(make_client, shard_count=3))
+    assert sorted(r.repository for r in records if isinstance(r, RepositoryRecord)) == sorted(TAGS)
+    assert len([r for r in records if isinstance(r, TagRecord)]) == 4
+    digests = [r.digest for r in records if isinstance(r, ImageRecord)]
+    assert sorted(digests) == ["sha256:a", "sha256:b", "sha256:c"]
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+from unittest.mock import Mock
+
+import pytest
+
+from dreg_client.crawl import CrawlFailure, CrawlRecord, ImageRecord, RepositoryRecord, TagRecord
+from dreg_client.image import PlatformImage
+from dreg_client.manifest import ImageLayerRef, ManifestList
+from dreg_client.schemas import schema_2_list
+from dreg_client.snapshot import (
+    SnapshotChange,
+    diff_snapshot_rows,
+    diff_snapshots,
+    format_change,
+    main,
+    write_snapshot,
+)
+
+
+def image_record(repository: str, digest: str, **platform_layers: str) -> ImageRecord:
+    platform_images = []
+    for platform, layer in platform_layers.items():
+        config = Mock()
+        config.platform_name = platform
+        platform_images.append(
+            PlatformImage(f"{digest}-{platform}", config, (ImageLayerRef(layer, "", 1),))
+        )
+    manifest = ManifestList(digest, schema_2_list, 42, frozenset())
+    return ImageRecord(repository, digest, manifest, tuple(platform_images))
+
+
+OLD_RECORDS: List[CrawlRecord] = [
+    RepositoryRecord("ns/app", ("latest", "v1")),
+    TagRecord("ns/app", "latest", "sha256:a"),
+    image_record("ns/app", "sha256:a", linux_amd64="sha256:layer-1"),
+    TagRecord("ns/app", "v1", "sha256:a"),
+    RepositoryRecord("gone", ("latest",)),
+    TagRecord("gone", "latest", "sha256:c"),
+    image_record("gone", "sha256:c", linux_amd64="sha256:layer-3"),
+]
+
+NEW_RECORDS: List[CrawlRecord] = [
+    RepositoryRecord("ns/app", ("latest", "v1", "v2")),
+    TagRecord("ns/app", "latest", "sha256:b"),
+    TagRecord("ns/app", "v1", "sha256:a"),
+    TagRecord("ns/app", "v2", "sha256:b"),
+    # The image is only fetched under the first repository to refer to it.
+    TagRecord("ns/copy", "latest", "sha256:b"),
+    RepositoryRecord("ns/copy", ("latest",)),
+    image_record("ns/app", "sha256:b", linux_amd64="sha256:layer-1", linux_arm64="sha256:layer-2"),
+    CrawlFailure("images", "ns/app", "sha256:x", Exception()),
+]
+
+
+def test_write_snapshot(tmp_path: Path):
+    path = tmp_path / "snapshot.tsv"
+    write_snapshot(path, NEW_RECORDS, chunk_size=2)
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        "# dreg-snapshot v1",
+        "L\tsha256:layer-1",
+        "L\tsha256:layer-2",
+        "P\tns/app\tlinux_amd64",
+        "P\tns/app\tlinux_arm64",
+        "P\tns/copy\tlinux_amd64",
+        "P\tns/copy\tlinux_arm64",
+        "R\tns/app",
+        "R\tns/copy",
+        "T\tns/app\tlatest\tsha256:b",
+        "T\tns/app\tv1\tsha256:a",
+        "T\tns/app\tv2\tsha256:b",
+        "T\tns/copy\tlatest\tsha256:b",
+    ]
+    # Only the snapshot itself is left behind.
+    assert list(tmp_path.iterdir()) == [path]
+
+
+@pytest.mark.parametrize("suffix", [".tsv", ".tsv.gz"])
+def test_diff_snapshots(tmp_path: Path, suffix: str):
+    old_path = tmp_path / f"old{suffix}"
+    new_path = tmp_path / f"new{suffix}"
+    write_snapshot(old_path, OLD_RECORDS)
+    write_snapshot(new_path, NEW_RECORDS, chunk_size=3)
+
+    assert list(diff_snapshots(old_path, new_path)) == [
+        SnapshotChange("layer", "added", "sha256:layer-2"),
+        SnapshotChange("layer", "removed", "sha256:layer-3"),
+        SnapshotChange("platform", "removed", "gone", "linux_amd64"),
+        SnapshotChange("platform", "added", "ns/app", "linux_arm64"),
+        SnapshotChange("platform", "added", "ns/copy", "linux_amd64"),
+        SnapshotChange("platform", "added", "ns/copy", "linux_arm64"),
+        SnapshotChange("repository", "removed", "gone"),
+        SnapshotChange("repository", "added", "ns/copy"),
+        SnapshotChange("tag", "removed", "gone", "latest", old_digest="sha256:c"),
+        SnapshotChange("tag", "moved", "ns/app", "latest", "sha256:a", "sha256:b"),
+        SnapshotChange("tag", "added", "ns/app", "v2", new_digest="sha256:b"),
+        SnapshotChange("tag", "added", "ns/copy", "latest", new_digest="sha256:b"),
+    ]
+    assert list(diff_snapshots(new_path, new_path)) == []
+
+
+def test_diff_tags_with_common_prefixes():
+    old_rows = ["T\tapp\tv1\tsha256:a\n", "T\tapp\tv1.0\tsha256:a\n"]
+    new_rows = ["T\tapp\tv1\tsha256:b\n", "T\tapp\tv1.0\tsha256:a\n", "T\tapp\tv1.1\tsha256:c\n"]
+    assert list(diff_snapshot_rows(old_rows, new_rows)) == [
+        SnapshotChange("tag", "moved", "app", "v1", "sha256:a", "sha256:b"),
+        SnapshotChange("tag", "added", "app", "v1.1", new_digest="sha256:c"),
+    ]
+
+
+def test_invalid_snapshots(tmp_path: Path):
+    valid = tmp_path / "valid.tsv"
+    write_snapshot(valid, OLD_RECORDS)
+
+    unsorted = tmp_path / "unsorted.tsv"
+    unsorted.write_text("# dreg-snapshot v1\nR\tb\nR\ta\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="not sorted"):
+        list(diff_snapshots(valid, unsorted))
+
+    unknown = tmp_path / "unknown.tsv"
+    unknown.write_text("R\ta\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="not a supported snapshot"):
+        list(diff_snapshots(unknown, valid))
+
+    with pytest.raises(ValueError, match="chunk_size"):
+        write_snapshot(valid, OLD_RECORDS, chunk_size=0)
+
+
+def test_format_change():
+    assert format_change(SnapshotChange("repository", "added", "app")) == "+ repository app"
+    assert format_change(SnapshotChange("platform", "removed", "app", "linux/arm64")) == (
+        "- platform app linux/arm64"
+    )
+    assert format_change(SnapshotChange("tag", "moved", "app", "v1", "sha256:a", "sha256:b")) == (
+        "~ tag app:v1 sha256:a -> sha256:b"
+    )
+    assert format_change(SnapshotChange("tag", "added", "app", "v1", new_digest="sha256:b")) == (
+        "+ tag app:v1 sha256:b"
+    )
+
+
+def test_main(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    old_path = tmp_path / "old.tsv"
+    new_path = tmp_path / "new.tsv"
+    write_snapshot(old_path, OLD_RECORDS)
+    write_snapshot(new_path, OLD_RECORDS[:4])
+
+    assert main([str(old_path), str(old_path)]) == 0
+    assert capsys.readouterr().out == ""
+    assert main([str(old_path), str(new_path)]) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        "- layer sha256:layer-3",
+        "- platform gone linux_amd64",
+        "- repository gone",
+        "- tag gone:latest sha256:c",
+    ]
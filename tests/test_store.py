@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import gc
+from unittest.mock import Mock
+
+from dreg_client.manifest import ImageConfigRef, Manifest
+from dreg_client.store import ContentStore
+
+
+def make_manifest(digest: str) -> Manifest:
+    return Manifest(
+        digest=digest,
+        content_type="application/vnd.docker.distribution.manifest.v2+json",
+        content_length=528,
+        config=ImageConfigRef(
+            digest="sha256:1a067abcdef121044c411ad73ac82cecd098762dabe7bc4d4b6dbbd55963b667",
+            content_type="application/vnd.docker.container.image.v1+json",
+            size=1463,
+        ),
+        layers=(),
+    )
+
+
+def test_loads_once():
+    store = ContentStore()
+    manifest = make_manifest("sha256:5b0bcabd")
+    loader = Mock(return_value=manifest)
+
+    for _ in range(5):
+        assert store.manifest("sha256:5b0bcabd", loader) is manifest
+    loader.assert_called_once_with()
+
+
+def test_manifests_are_kept_per_repository():
+    store = ContentStore()
+    manifest1 = make_manifest("sha256:5b0bcabd")
+    manifest2 = make_manifest("sha256:5b0bcabd")
+
+    assert store.put_manifest(manifest1, repository="ns/one") is manifest1
+    assert store.put_manifest(manifest2, repository="ns/two") is manifest2
+    assert store.get_manifest("sha256:5b0bcabd", repository="ns/one") is manifest1
+    assert store.get_manifest("sha256:5b0bcabd", repository="ns/two") is manifest2
+    assert store.get_manifest("sha256:5b0bcabd") is None
+
+
+def test_put_keeps_first():
+    store = ContentStore()
+    manifest1 = make_manifest("sha256:5b0bcabd")
+    manifest2 = make_manifest("sha256:5b0bcabd")
+
+    assert store.put_manifest(manifest1) is manifest1
+    assert store.put_manifest(manifest2) is manifest1
+    assert store.put_manifest(manifest2, replace=True) is manifest2
+    assert store.get_manifest("sha256:5b0bcabd") is manifest2
+
+
+def test_weak_references():
+    store = ContentStore()
+    manifest = make_manifest("sha256:5b0bcabd")
+    store.put_manifest(manifest)
+    assert len(store) == 1
+
+    del manifest
+    gc.collect()
+    assert store.get_manifest("sha256:5b0bcabd") is None
+    assert len(store) == 0
+
+
+def test_strong_references():
+    store = ContentStore(weak=False)
+    store.put_manifest(make_manifest("sha256:5b0bcabd"))
+    gc.collect()
+    assert store.get_manifest("sha256:5b0bcabd") is not None
+
+    store.clear()
+    assert store.get_manifest("sha256:5b0bcabd") is None
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+import requests
+
+from dreg_client.manifest import ManifestList
+from dreg_client.testing import FakeRegistry
+
+
+@pytest.fixture
+def fake():
+    with FakeRegistry() as fake:
+        yield fake
+
+
+def test_catalog_pagination(fake):
+    fake.populate(5, 1)
+    client = fake.build_registry().client
+
+    assert list(client.iter_catalog(page_size=2)) == [f"repo{index:05d}/app" for index in range(5)]
+    catalog_requests = [path for method, path in fake.requests if path == "/v2/_catalog"]
+    assert len(catalog_requests) == 3
+
+
+def test_tags_and_manifests(fake):
+    digest = fake.add_image("ns/app", "1.0")
+    fake.tag("ns/app", "latest", digest)
+    repository = fake.build_registry().repository("ns/app")
+
+    assert repository.tags() == ("1.0", "latest")
+    assert repository.check_manifest("1.0") == digest
+    assert repository.check_manifest("missing") is None
+
+    image = repository.get_image("latest")
+    assert image.digest == digest
+    (platform_image,) = image.get_platform_images()
+    assert platform_image.platform_name == "linux/amd64"
+    assert len(platform_image.layers) == 2
+
+
+def test_manifest_list(fake):
+    digest = fake.add_image("ns/app", "1.0", platforms=("linux/amd64", "linux/arm64/v8"))
+    image = fake.build_registry().repository("ns/app").get_image("1.0")
+
+    assert isinstance(image.manifest_list, ManifestList)
+    assert image.digest == digest
+    platforms = sorted(image.platform_name for image in image.get_platform_images())
+    assert platforms == ["linux/amd64", "linux/arm64/v8"]
+
+
+def test_images_are_deterministic():
+    first = FakeRegistry().add_image("ns/app", "1.0")
+    second = FakeRegistry().add_image("ns/app", "1.0")
+    assert first == second
+
+
+def test_base_layer_is_shared(fake):
+    first = fake.add_image("ns/app", "1.0")
+    second = fake.add_image("ns/other", "1.0")
+    registry = fake.build_registry()
+
+    (first_image,) = registry.repository("ns/app").get_image(first).get_platform_images()
+    (second_image,) = registry.repository("ns/other").get_image(second).get_platform_images()
+    assert first_image.layers[0].digest == second_image.layers[0].digest
+    assert first_image.layers[1].digest != second_image.layers[1].digest
+
+
+def test_tag_unknown_manifest(fake):
+    with pytest.raises(KeyError):
+        fake.tag("ns/app", "1.0", "sha256:" + "a" * 64)
+
+
+def test_unknown_repository(fake):
+    response = requests.get(fake.base_url + "ns/missing/tags/list")
+    assert response.status_code == 404
+    assert response.json()["errors"][0]["code"] == "NAME_UNKNOWN"
+
+
+def test_token_auth():
+    with FakeRegistry(token_auth=True) as fake:
+        fake.add_image("ns/app", "1.0")
+
+        response = requests.get(fake.base_url + "ns/app/tags/list")
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == (
+            f'Bearer realm="{fake.token_url}",service="fake-registry",'
+            'scope="repository:ns/app:pull"'
+        )
+
+        repository = fake.build_registry().repository("ns/app")
+        assert repository.tags() == ("1.0",)
+        assert repository.check_manifest("1.0") is not None
+        # The client reuses its token for the repository.
+        assert fake.token_requests == 1
+
+
+def test_token_for_another_scope():
+    with FakeRegistry(token_auth=True) as fake:
+        fake.add_image("ns/app", "1.0")
+        token = requests.get(
+            fake.token_url, params={"service": fake.service, "scope": "repository:ns/other:pull"}
+        ).json()["token"]
+
+        response = requests.get(
+            fake.base_url + "ns/app/tags/list", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 401
+
+
+def test_throttling():
+    with FakeRegistry(throttle_every=2) as fake:
+        assert requests.get(fake.base_url).status_code == 200
+        response = requests.get(fake.base_url)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        assert requests.get(fake.base_url).status_code == 200
+
+
+def test_failures():
+    with FakeRegistry(fail_every=1) as fake:
+        fake.add_image("ns/app", "1.0")
+        with pytest.raises(requests.HTTPError):
+            fake.build_registry().repository("ns/app").tags()
+
+
+def test_latency():
+    with FakeRegistry(latency=0.05) as fake:
+        start = time.perf_counter()
+        requests.get(fake.base_url)
+        assert time.perf_counter() - start >= 0.05
+
+
+def test_not_running():
+    with pytest.raises(RuntimeError):
+        FakeRegistry().base_url
@@ -0,0 +1,35 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from dreg_client._time import parse_timestamp
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        (
+            "2021-08-28T01:35:59.758616391Z",
+            datetime(2021, 8, 28, 1, 35, 59, 758616, tzinfo=timezone.utc),
+        ),
+        ("2021-08-28T01:35:59Z", datetime(2021, 8, 28, 1, 35, 59, tzinfo=timezone.utc)),
+        (
+            "2021-08-28T01:35:59.5+10:00",
+            datetime(2021, 8, 28, 1, 35, 59, 500000, tzinfo=timezone(timedelta(hours=10))),
+        ),
+        (
+            "2021-08-28T01:35:59-02:30",
+            datetime(2021, 8, 28, 1, 35, 59, tzinfo=timezone(-timedelta(hours=2, minutes=30))),
+        ),
+    ),
+)
+def test_parse_timestamp(value: str, expected: datetime):
+    assert parse_timestamp(value) == expected
+
+
+@pytest.mark.parametrize("value", ("", "2021-08-28", "2021-08-28T01:35:59", "yesterday"))
+def test_parse_invalid_timestamp(value: str):
+    errmsg = "^" + re.escape(f"Invalid timestamp '{value}' supplied.") + "$"
+    with pytest.raises(ValueError, match=errmsg):
+        parse_timestamp(value)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import List
+from unittest.mock import Mock
+
+from dreg_client.crawl import CrawlRecord, ImageRecord, RepositoryRecord, TagRecord
+from dreg_client.image import PlatformImage
+from dreg_client.manifest import (
+    ImageConfigRef,
+    ImageLayerRef,
+    LegacyManifest,
+    Manifest,
+    ManifestList,
+)
+from dreg_client.schemas import schema_1, schema_2, schema_2_list
+from dreg_client.usage import StorageUsage, UsageAnalyzer, analyze_usage, namespace_of
+
+
+def manifest_record(repository: str, digest: str, config_size: int, *layers: int) -> ImageRecord:
+    manifest = Manifest(
+        digest,
+        schema_2,
+        42,
+        ImageConfigRef(f"{digest}-config", "", config_size),
+        tuple(ImageLayerRef(f"sha256:layer-{size}", "", size) for size in layers),
+    )
+    return ImageRecord(repository, digest, manifest, ())
+
+
+def test_namespace_of():
+    assert namespace_of("ns/app") == "ns"
+    assert namespace_of("ns/app/sub") == "ns"
+    assert namespace_of("app") == "library"
+
+
+def test_report():
+    records: List[CrawlRecord] = [
+        RepositoryRecord("ns/app", ("latest", "v1")),
+        TagRecord("ns/app", "latest", "sha256:a"),
+        TagRecord("ns/app", "v1", "sha256:b"),
+        TagRecord("ns/other", "latest", "sha256:a"),
+        TagRecord("solo", "latest", "sha256:c"),
+        manifest_record("ns/app", "sha256:a", 1, 1000, 100),
+        manifest_record("ns/app", "sha256:b", 2, 1000, 200),
+        manifest_record("solo", "sha256:c", 3, 5000),
+    ]
+    report = analyze_usage(records, top=2)
+
+    # Layers of 1000, 100, 200 and 5000 bytes, plus configs of 1, 2 and 3 bytes.
+    assert report.total_bytes == 6306
+    assert report.blob_count == 7
+    # The image shared between ns/app and ns/other.
+    assert report.shared_bytes == 1101
+    assert report.repositories == {
+        "ns/app": StorageUsage("ns/app", 1303, 202),
+        "ns/other": StorageUsage("ns/other", 1101, 0),
+        "solo": StorageUsage("solo", 5003, 5003),
+    }
+    assert report.repositories["ns/app"].shared_bytes == 1101
+    assert report.namespaces == {
+        "ns": StorageUsage("ns", 1303, 1303),
+        "library": StorageUsage("library", 5003, 5003),
+    }
+    assert [usage.name for usage in report.largest_repositories] == ["solo", "ns/app"]
+    assert report.largest_blobs == [("sha256:layer-5000", 5000), ("sha256:layer-1000", 1000)]
+
+
+def test_manifest_lists_and_legacy_images():
+    config = Mock()
+    config.digest = "sha256:config"
+    config.content_length = 10
+    platform_image = PlatformImage(
+        "sha256:child", config, (ImageLayerRef("sha256:layer", "", 500),)
+    )
+    analyzer = UsageAnalyzer()
+    analyzer.add_records(
+        [
+            TagRecord("app", "latest", "sha256:list"),
+            TagRecord("legacy", "latest", "sha256:legacy"),
+            ImageRecord(
+                "app",
+                "sha256:list",
+                ManifestList("sha256:list", schema_2_list, 42, frozenset()),
+                (platform_image,),
+            ),
+            ImageRecord(
+                "legacy",
+                "sha256:legacy",
+                LegacyManifest(
+                    "sha256:legacy", schema_1, 42, {"fsLayers": [{"blobSum": "sha256:layer"}]}
+                ),
+                (),
+            ),
+        ]
+    )
+    report = analyzer.report()
+    assert report.total_bytes == 510
+    # The legacy manifest's unknown layer size doesn't replace the known one.
+    assert report.repositories["legacy"] == StorageUsage("legacy", 500, 0)
+
+
+def test_untagged_images_are_ignored():
+    report = analyze_usage([manifest_record("ns/app", "sha256:a", 1, 1000)])
+    assert report.total_bytes == 0
+    assert report.blob_count == 0
+    assert report.repositories == {}
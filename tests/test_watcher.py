@@ -0,0 +1,263 @@
+import asyncio
+import random
+import threading
+from typing import Dict, List, Mapping, Optional
+from unittest.mock import Mock
+
+import pytest
+import responses
+from requests import ConnectionError
+
+from dreg_client.auth_service import AuthServiceFailure
+from dreg_client.client import Client
+from dreg_client.repository import Repository
+from dreg_client.watcher import TagChange, TagWatcher
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_repository(name: str, digests: Mapping[str, Optional[str]]) -> Mock:
+    repository = Mock()
+    repository.name = name
+    repository.check_manifest.side_effect = lambda tag, **kwargs: digests.get(tag)
+    return repository
+
+
+class LowestRandom(random.Random):
+    # Makes the first poll of every tag due straight away.
+    def uniform(self, a: float, b: float) -> float:
+        return a
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def watcher(clock: FakeClock) -> TagWatcher:
+    return TagWatcher(
+        min_interval=10,
+        max_interval=80,
+        backoff=2,
+        jitter=0,
+        max_concurrency=2,
+        clock=clock,
+        rng=LowestRandom(),
+    )
+
+
+def test_first_poll_establishes_digest(watcher: TagWatcher):
+    digests = {"latest": "sha256:a"}
+    repository = make_repository("testrepo", digests)
+    watcher.watch(repository, "latest")
+
+    assert watcher.next_poll_in() == 0
+    assert watcher.poll() == []
+    assert watcher.digest(repository, "latest") == "sha256:a"
+    assert watcher.next_poll_in() == 10
+
+
+def test_changes_are_reported(watcher: TagWatcher, clock: FakeClock):
+    digests: Dict[str, Optional[str]] = {"latest": "sha256:a", "stable": "sha256:b"}
+    repository = make_repository("testrepo", digests)
+    watcher.watch(repository, "latest")
+    watcher.watch(repository, "stable")
+    watcher.poll()
+
+    digests["latest"] = "sha256:c"
+    del digests["stable"]
+    clock.now += 10
+    changes = watcher.poll()
+
+    assert sorted(changes, key=lambda change: change.tag) == [
+        TagChange("testrepo", "latest", "sha256:a", "sha256:c"),
+        TagChange("testrepo", "stable", "sha256:b", None),
+    ]
+    assert repository.check_manifest.call_count == 4
+
+
+def test_backoff(watcher: TagWatcher, clock: FakeClock):
+    digests = {"latest": "sha256:a"}
+    repository = make_repository("testrepo", digests)
+    watcher.watch(repository, "latest", digest="sha256:a")
+
+    intervals: List[float] = []
+    for _ in range(6):
+        wait_for = watcher.next_poll_in()
+        assert wait_for is not None
+        clock.now += wait_for
+        assert watcher.poll() == []
+        intervals.append(watcher.next_poll_in() or 0)
+    assert intervals == pytest.approx([20, 40, 80, 80, 80, 80])
+
+    digests["latest"] = "sha256:b"
+    clock.now += 80
+    assert len(watcher.poll()) == 1
+    assert watcher.next_poll_in() == 10
+
+
+def test_nothing_polled_before_due(watcher: TagWatcher, clock: FakeClock):
+    repository = make_repository("testrepo", {"latest": "sha256:a"})
+    watcher.watch(repository, "latest")
+    watcher.poll()
+
+    clock.now += 9
+    assert watcher.poll() == []
+    assert repository.check_manifest.call_count == 1
+
+
+def test_known_digests_are_spread_out(clock: FakeClock):
+    watcher = TagWatcher(min_interval=60, clock=clock, rng=random.Random(1))
+    repository = make_repository("testrepo", {})
+    for index in range(100):
+        watcher.watch(repository, f"tag-{index}", digest="sha256:a")
+
+    assert len(watcher) == 100
+    first = watcher.next_poll_in()
+    assert first is not None
+    assert 0 < first < 60
+    clock.now += 30
+    watcher.poll()
+    assert 20 < repository.check_manifest.call_count < 80
+
+
+def test_unknown_digests_are_spread_out(clock: FakeClock):
+    watcher = TagWatcher(min_interval=60, clock=clock, rng=random.Random(1))
+    repository = make_repository("testrepo", {})
+    for index in range(100):
+        watcher.watch(repository, f"tag-{index}")
+
+    first = watcher.next_poll_in()
+    assert first is not None
+    assert 0 < first < 60
+    clock.now += 30
+    watcher.poll()
+    assert 20 < repository.check_manifest.call_count < 80
+
+
+def test_missing_digest_header_backs_off(watcher: TagWatcher, clock: FakeClock):
+    url = "https://registry.example.com:5000/v2/testrepo/manifests/latest"
+    client = Client.build_with_session("https://registry.example.com:5000/v2/")
+    repository = Repository(client, "testrepo")
+    watcher.watch(repository, "latest", digest="sha256:a")
+
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.HEAD, url)
+        assert watcher.poll() == []
+    assert watcher.digest(repository, "latest") == "sha256:a"
+    assert watcher.next_poll_in() == 20
+
+    clock.now += 20
+    with responses.RequestsMock() as rsps:
+        rsps.add(rsps.HEAD, url, status=404)
+        assert watcher.poll() == [TagChange("testrepo", "latest", "sha256:a", None)]
+
+
+def test_failed_polls_back_off(watcher: TagWatcher, clock: FakeClock):
+    repository = make_repository("testrepo", {})
+    repository.check_manifest.side_effect = ConnectionError("Connection refused")
+    watcher.watch(repository, "latest")
+
+    assert watcher.poll() == []
+    assert watcher.digest(repository, "latest") is None
+    assert watcher.next_poll_in() == 20
+
+
+def test_auth_failures_keep_tags_scheduled(watcher: TagWatcher, clock: FakeClock):
+    digests = {"latest": "sha256:1", "stable": "sha256:2"}
+    repository = make_repository("testrepo", digests)
+    repository.check_manifest.side_effect = AuthServiceFailure()
+    watcher.watch(repository, "latest")
+    watcher.watch(repository, "stable")
+
+    assert watcher.poll() == []
+    assert watcher.next_poll_in() == 20
+
+    repository.check_manifest.side_effect = lambda tag, **kwargs: digests.get(tag)
+    clock.now += 20
+    assert watcher.poll() == []
+    assert repository.check_manifest.call_count == 4
+    assert watcher.digest(repository, "latest") == "sha256:1"
+
+
+def test_unwatch(watcher: TagWatcher):
+    repository = make_repository("testrepo", {"latest": "sha256:a"})
+    watcher.watch(repository, "latest")
+    watcher.unwatch(repository, "latest")
+
+    assert len(watcher) == 0
+    assert watcher.next_poll_in() is None
+    assert watcher.poll() == []
+    repository.check_manifest.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    (
+        {"min_interval": 0},
+        {"min_interval": 10, "max_interval": 5},
+        {"backoff": 0.5},
+        {"jitter": 1},
+    ),
+)
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):  # noqa: PT011
+        TagWatcher(**kwargs)
+
+
+def test_poll_async(watcher: TagWatcher, clock: FakeClock):
+    digests = {"latest": "sha256:a"}
+    repository = make_repository("testrepo", digests)
+    watcher.watch(repository, "latest")
+    assert asyncio.run(watcher.poll_async()) == []
+
+    digests["latest"] = "sha256:b"
+    clock.now += 10
+    changes = asyncio.run(watcher.poll_async())
+    assert changes == [TagChange("testrepo", "latest", "sha256:a", "sha256:b")]
+
+
+def test_run():
+    repository = make_repository("testrepo", {})
+    repository.check_manifest.side_effect = ["sha256:a", "sha256:b"]
+    watcher = TagWatcher(min_interval=0.01, max_interval=0.01, jitter=0)
+    watcher.watch(repository, "latest")
+    changes: List[TagChange] = []
+    stop = threading.Event()
+
+    def callback(change: TagChange) -> None:
+        changes.append(change)
+        stop.set()
+
+    thread = threading.Thread(target=watcher.run, args=(callback,), kwargs={"stop": stop})
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert changes == [TagChange("testrepo", "latest", "sha256:a", "sha256:b")]
+
+
+def test_run_async():
+    repository = make_repository("testrepo", {})
+    repository.check_manifest.side_effect = ["sha256:a", "sha256:b"]
+    watcher = TagWatcher(min_interval=0.01, max_interval=0.01, jitter=0)
+    watcher.watch(repository, "latest")
+    changes: List[TagChange] = []
+
+    async def main() -> None:
+        stop = asyncio.Event()
+
+        def callback(change: TagChange) -> None:
+            changes.append(change)
+            stop.set()
+
+        await asyncio.wait_for(watcher.run_async(callback, stop=stop), timeout=5)
+
+    asyncio.run(main())
+    assert changes == [TagChange("testrepo", "latest", "sha256:a", "sha256:b")]